@@ -1,6 +1,7 @@
 from fastapi import Header
-from typing import Optional
+from typing import Awaitable, Callable, Optional
 from app.config import get_settings
+from app.core.deadline import set_deadline
 
 settings = get_settings()
 
@@ -36,3 +37,30 @@ async def get_current_user(api_key: str = Header(None, alias="x-api-key")) -> di
     """
     # Placeholder implementation
     return {"id": "default_user", "api_key": api_key}
+
+
+def request_timeout(default: float) -> Callable[..., Awaitable[float]]:
+    """
+    Build a dependency that gives each request of a route its deadline
+
+    Args:
+        default: Budget in seconds when the client sends no X-Request-Timeout
+
+    Returns:
+        Dependency setting the deadline for the rest of the request
+    """
+
+    async def apply_deadline(
+        x_request_timeout: Optional[float] = Header(
+            None,
+            gt=0,
+            description="Seconds the client will wait; the request fails "
+            "with 504 instead of answering later",
+        ),
+    ) -> float:
+        # Async so it runs in the request's context, where the endpoint and
+        # the tasks it starts will see the deadline
+        seconds = min(x_request_timeout or default, settings.request_timeout_max)
+        return set_deadline(seconds)
+
+    return apply_deadline
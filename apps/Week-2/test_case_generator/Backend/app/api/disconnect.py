@@ -0,0 +1,76 @@
+"""
+Client disconnect detection: work is cancelled once nobody will read its answer
+"""
+
+import asyncio
+from typing import Awaitable, TypeVar
+
+from fastapi import Request
+
+from app.core.metrics import client_disconnects
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+# nginx's "client closed request"; seen only by the access log and metrics
+CLIENT_CLOSED_REQUEST = 499
+
+
+class ClientDisconnectedError(Exception):
+    """Raised when the client disconnected before the response was ready"""
+
+
+def record_disconnect(request: Request) -> None:
+    """
+    Count and log a request abandoned by its client
+    Args:
+        request: The abandoned request
+    """
+    # Labelled by route template, like http_request_duration
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+    client_disconnects.inc(route=route)
+    logger.info("Client disconnected from %s, cancelled its work", route)
+
+
+async def _wait_for_disconnect(request: Request) -> None:
+    while (await request.receive())["type"] != "http.disconnect":
+        pass
+
+
+async def run_until_disconnect(request: Request, work: Awaitable[T]) -> T:
+    """
+    Await work, cancelling it if the client disconnects first
+    Args:
+        request: Request whose body has already been read
+        work: Coroutine producing the route's result
+    Returns:
+        Result of work
+    Raises:
+        ClientDisconnectedError: If the client disconnected; work has been
+            cancelled and its cleanup has run
+        Exception: Whatever work raised
+    """
+    task = asyncio.ensure_future(work)
+    watcher = asyncio.create_task(_wait_for_disconnect(request))
+    try:
+        done, _ = await asyncio.wait(
+            {task, watcher}, return_when=asyncio.FIRST_COMPLETED
+        )
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+    finally:
+        watcher.cancel()
+
+    if task in done:
+        return task.result()
+
+    task.cancel()
+    try:
+        await task
+    except (asyncio.CancelledError, Exception):
+        pass  # nobody is left to report a failure to
+    record_disconnect(request)
+    raise ClientDisconnectedError()
@@ -0,0 +1,275 @@
+"""
+Pure ASGI middleware (no BaseHTTPMiddleware task or memory stream per request)
+"""
+
+import asyncio
+import functools
+import gzip
+import random
+import re
+import time
+import uuid
+import zlib
+from typing import Callable, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.api.disconnect import CLIENT_CLOSED_REQUEST
+from app.core.metrics import http_request_duration
+from app.utils.logger import get_logger, request_id
+
+logger = get_logger(__name__)
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is used without it
+    brotli = None
+
+# Media types worth compressing; SSE is left alone so proxies and clients
+# see every event as soon as it is sent
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "text/plain",
+    "text/html",
+)
+
+# Request ids accepted from clients; anything else is replaced
+REQUEST_ID_PATTERN = re.compile(r"[A-Za-z0-9._:-]{1,128}")
+
+# Bodies at least this large are compressed in a thread, off the event loop
+# (zlib and brotli release the GIL)
+THREAD_THRESHOLD = 256 * 1024
+
+
+class RequestContextMiddleware:
+    """
+    Request id, timing, duration metric and sampled access log per request
+
+    A valid client-sent id is kept, otherwise one is generated. Errors and
+    slow requests are always logged; other requests are sampled.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        header_name: str = "X-Request-ID",
+        sample_rate: float = 0.1,
+        slow_seconds: float = 1.0,
+    ):
+        self.app = app
+        self.header_name = header_name
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_seconds
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        incoming = Headers(scope=scope).get(self.header_name)
+        if incoming is None or not REQUEST_ID_PATTERN.fullmatch(incoming):
+            incoming = uuid.uuid4().hex
+        token = request_id.set(incoming)
+        # ServerErrorMiddleware sends the 500 for an exception outside this one
+        status_code = 500
+        started_response = False
+
+        async def send_with_context(message: Message) -> None:
+            nonlocal status_code, started_response
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                started_response = True
+                headers = MutableHeaders(scope=message)
+                headers.append(self.header_name, incoming)
+                headers.append("X-Process-Time", f"{time.perf_counter() - started:.6f}")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_context)
+            if not started_response:
+                # A streamed response cancelled because its client left
+                # before the first chunk
+                status_code = CLIENT_CLOSED_REQUEST
+        except Exception as e:
+            # Logged here, while the request id is still set
+            logger.error("Unhandled exception: %s", e, exc_info=True)
+            raise
+        finally:
+            duration = time.perf_counter() - started
+            # Label by route template rather than raw path to keep cardinality bounded
+            route = scope.get("route")
+            http_request_duration.observe(
+                duration,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=str(status_code),
+            )
+            if (
+                status_code >= 400
+                or duration >= self.slow_seconds
+                or random.random() < self.sample_rate
+            ):
+                logger.info(
+                    "%s %s %s %.3fs",
+                    scope["method"],
+                    scope["path"],
+                    status_code,
+                    duration,
+                )
+            request_id.reset(token)
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Pick the content coding to use from an Accept-Encoding header
+    Args:
+        accept_encoding: Header value, e.g. "gzip, deflate, br;q=0.9"
+    Returns:
+        "br" or "gzip", or None if the client accepts neither
+    """
+    available = ["br", "gzip"] if brotli is not None else ["gzip"]
+    weights = {}
+    for item in accept_encoding.lower().split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[coding.strip()] = quality
+
+    best, best_quality = None, 0.0
+    for coding in available:
+        quality = weights.get(coding, weights.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+class _Encoder:
+    """Incremental gzip or brotli encoder; every chunk is flushed"""
+
+    def __init__(self, coding: str, gzip_level: int, brotli_quality: int):
+        if coding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+            self._zlib = None
+        else:
+            self._brotli = None
+            # wbits=31 writes the gzip header and trailer
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        if self._brotli is not None:
+            out = self._brotli.process(data)
+            return out + (self._brotli.finish() if final else self._brotli.flush())
+        out = self._zlib.compress(data)
+        return out + self._zlib.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with brotli or gzip, as negotiated by Accept-Encoding
+
+    A complete body is compressed in one call when it is at least
+    minimum_size bytes. A streamed body is compressed chunk by chunk, each
+    flushed so NDJSON lines and input downloads still arrive incrementally.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 1,
+        brotli_quality: int = 4,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        coding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        encoder: Optional[_Encoder] = None
+        passthrough = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, encoder, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk shows what to do
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if encoder is None:
+                headers = MutableHeaders(raw=list(start.get("headers", [])))
+                start["headers"] = headers.raw
+                if not self._compressible(headers) or (
+                    not more_body and len(body) < self.minimum_size
+                ):
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+
+                encoder = _Encoder(coding, self.gzip_level, self.brotli_quality)
+                headers["Content-Encoding"] = coding
+                headers.add_vary_header("Accept-Encoding")
+                if more_body:
+                    del headers["Content-Length"]
+                    await send(start)
+                else:
+                    data = await self._compress_body(coding, body)
+                    headers["Content-Length"] = str(len(data))
+                    await send(start)
+                    await send({"type": "http.response.body", "body": data})
+                    return
+
+            data = await self._run(
+                functools.partial(encoder.compress, final=not more_body), body
+            )
+            await send(
+                {"type": "http.response.body", "body": data, "more_body": more_body}
+            )
+
+        await self.app(scope, receive, send_compressed)
+
+    @staticmethod
+    def _compressible(headers: MutableHeaders) -> bool:
+        if "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "")
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+
+    async def _compress_body(self, coding: str, body: bytes) -> bytes:
+        if coding == "br":
+            compress = functools.partial(brotli.compress, quality=self.brotli_quality)
+        else:
+            compress = functools.partial(gzip.compress, compresslevel=self.gzip_level)
+        return await self._run(compress, body)
+
+    @staticmethod
+    async def _run(compress: Callable[[bytes], bytes], body: bytes) -> bytes:
+        if len(body) >= THREAD_THRESHOLD:
+            return await asyncio.to_thread(compress, body)
+        return compress(body)
@@ -0,0 +1,27 @@
+"""
+JSON response class that serializes models once, in pydantic-core
+"""
+
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from app.core.metrics import stage_duration
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+
+class ModelJSONResponse(JSONResponse):
+    """JSON response rendered by pydantic-core or orjson"""
+
+    def render(self, content: Any) -> bytes:
+        with stage_duration.time(stage="serialization"):
+            if isinstance(content, BaseModel):
+                return content.__pydantic_serializer__.to_json(content)
+            if orjson is not None:
+                return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+            return super().render(content)
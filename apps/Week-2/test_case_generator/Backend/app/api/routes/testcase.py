@@ -1,16 +1,43 @@
-from fastapi import APIRouter, HTTPException, status
-from typing import Dict
+import asyncio
+import math
 
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import Response, StreamingResponse
+from typing import AsyncIterator, Dict
+
+from app.api.dependencies import request_timeout
+from app.api.disconnect import (
+    CLIENT_CLOSED_REQUEST,
+    ClientDisconnectedError,
+    record_disconnect,
+    run_until_disconnect,
+)
+from app.api.responses import ModelJSONResponse
+from app.config import get_settings
+from app.core.backends.router import get_llm_router
+from app.core.exceptions import UpstreamError
+from app.core.scheduler import upstream_scheduler
 from app.models.schemas import (
+    BatchTestCaseRequest,
+    BatchTestCaseResponse,
+    CacheMode,
+    JobResponse,
     TestCaseRequest,
     TestCaseResponse,
     ErrorResponse,
     HealthResponse,
 )
+from app.services.cache import response_cache
+from app.services.jobs import JobQueueFullError, job_queue
+from app.services.reuse import semantic_store
+from app.services.stress import stress_inputs
 from app.services.testcase_service import testcase_service
+from app.utils import input_generator
 from app.utils.logger import get_logger
+from app.utils.sse import format_sse
 
 logger = get_logger(__name__)
+settings = get_settings()
 
 router = APIRouter(prefix="/testcases", tags=["testcases"])
 
@@ -29,34 +56,336 @@ router = APIRouter(prefix="/testcases", tags=["testcases"])
             "model": ErrorResponse,
         },
         500: {"description": "Internal server error", "model": ErrorResponse},
+        502: {"description": "Upstream LLM error", "model": ErrorResponse},
+        503: {
+            "description": "Upstream capacity exhausted; retry after the Retry-After delay",
+            "model": ErrorResponse,
+        },
+        504: {
+            "description": "Upstream LLM timed out or the request deadline passed",
+            "model": ErrorResponse,
+        },
     },
+    dependencies=[Depends(request_timeout(settings.request_timeout_default))],
     summary="Generate Test Cases",
     description="Generate test cases for a coding problem using AI",
 )
-async def generate_test_cases(request: TestCaseRequest) -> TestCaseResponse:
+async def generate_test_cases(
+    request: TestCaseRequest,
+    http_request: Request,
+    cache_mode: CacheMode = Query(
+        default=CacheMode.USE,
+        description="Use, bypass or refresh the response cache for this request",
+    ),
+) -> ModelJSONResponse:
     try:
         logger.info(
-            f"Received request to generate test cases for {request.problem_type} problem"
+            "Received request to generate test cases for %s problem",
+            request.problem_type,
         )
 
-        result = await testcase_service.generate_test_cases(request)
+        # Cancelled, releasing its upstream call, if the client goes away
+        result = await run_until_disconnect(
+            http_request, testcase_service.generate_test_cases(request, cache_mode)
+        )
 
-        logger.info(f"Successfully generated {len(result.test_cases)} test cases")
-        return result
+        logger.info("Successfully generated %s test cases", len(result.test_cases))
+        # Already validated; returned as a response so it is serialized only once
+        return ModelJSONResponse(result)
 
+    except ClientDisconnectedError:
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
     except ValueError as e:
-        logger.error(f"Validation error: {str(e)}")
+        logger.error("Validation error: %s", e)
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e)
         )
+    except UpstreamError as e:
+        logger.error("Upstream error: %s", e)
+        headers = None
+        if e.retry_after is not None:
+            headers = {"Retry-After": str(math.ceil(e.retry_after))}
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers=headers)
     except Exception as e:
-        logger.error(f"Internal error: {str(e)}", exc_info=True)
+        logger.error("Internal error: %s", e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Internal server error: {str(e)}",
         )
 
 
+@router.post(
+    "/generate/stream",
+    status_code=status.HTTP_200_OK,
+    responses={
+        200: {
+            "description": "Server-Sent Events stream of test_case, stress_case, summary and done events",
+            "content": {"text/event-stream": {}},
+        },
+        422: {"description": "Validation error", "model": ErrorResponse},
+    },
+    dependencies=[Depends(request_timeout(settings.request_timeout_stream))],
+    summary="Stream Test Cases",
+    description="Generate test cases and stream each one over SSE as soon as it is complete",
+)
+async def stream_test_cases(
+    request: TestCaseRequest,
+    http_request: Request,
+    cache_mode: CacheMode = Query(
+        default=CacheMode.USE,
+        description="Use, bypass or refresh the response cache for this request",
+    ),
+) -> StreamingResponse:
+    logger.info(
+        "Received request to stream test cases for %s problem", request.problem_type
+    )
+
+    async def event_stream() -> AsyncIterator[str]:
+        try:
+            async for event, data in testcase_service.stream_test_cases(
+                request, cache_mode
+            ):
+                yield format_sse(event, data)
+        except asyncio.CancelledError:
+            # Starlette cancels the stream when the client disconnects
+            record_disconnect(http_request)
+            raise
+        except ValueError as e:
+            logger.error("Validation error: %s", e)
+            yield format_sse("error", {"detail": str(e), "error_type": "ValueError"})
+        except UpstreamError as e:
+            # Includes a request deadline running out mid-stream (504)
+            logger.error("Upstream error while streaming: %s", e)
+            yield format_sse(
+                "error",
+                {
+                    "detail": str(e),
+                    "error_type": type(e).__name__,
+                    "status_code": e.status_code,
+                },
+            )
+        except Exception as e:
+            logger.error("Internal error while streaming: %s", e, exc_info=True)
+            yield format_sse(
+                "error",
+                {
+                    "detail": f"Internal server error: {str(e)}",
+                    "error_type": type(e).__name__,
+                },
+            )
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post(
+    "/generate/batch",
+    response_model=BatchTestCaseResponse,
+    status_code=status.HTTP_200_OK,
+    responses={
+        200: {
+            "description": "Per-item results; with stream=true, one NDJSON line per item as it finishes",
+            "model": BatchTestCaseResponse,
+            "content": {"application/x-ndjson": {}},
+        },
+        422: {"description": "Validation error", "model": ErrorResponse},
+    },
+    dependencies=[Depends(request_timeout(settings.request_timeout_batch))],
+    summary="Generate Test Cases in Batch",
+    description="Generate test cases for many problems concurrently; failed items do not fail the batch",
+)
+async def generate_batch(
+    batch: BatchTestCaseRequest,
+    http_request: Request,
+    stream: bool = Query(
+        default=False,
+        description="Stream results as NDJSON in completion order instead of one JSON body",
+    ),
+    cache_mode: CacheMode = Query(
+        default=CacheMode.USE,
+        description="Use, bypass or refresh the response cache for every item",
+    ),
+):
+    logger.info("Received batch request with %s items", len(batch.requests))
+
+    results = testcase_service.generate_batch(
+        batch.requests, batch.max_concurrency, cache_mode
+    )
+
+    if stream:
+
+        async def ndjson_stream() -> AsyncIterator[str]:
+            try:
+                async for item in results:
+                    yield item.model_dump_json() + "\n"
+            except asyncio.CancelledError:
+                record_disconnect(http_request)
+                raise
+
+        return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+
+    async def collect():
+        return [item async for item in results]
+
+    try:
+        items = await run_until_disconnect(http_request, collect())
+    except ClientDisconnectedError:
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+    items.sort(key=lambda item: item.index)
+    succeeded = sum(1 for item in items if item.status == "ok")
+
+    logger.info(
+        "Batch finished: %s succeeded, %s failed", succeeded, len(items) - succeeded
+    )
+    return ModelJSONResponse(
+        BatchTestCaseResponse(
+            results=items, succeeded=succeeded, failed=len(items) - succeeded
+        )
+    )
+
+
+def _require_jobs() -> None:
+    if not settings.jobs_enabled:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="The job queue is disabled on this server",
+        )
+
+
+@router.post(
+    "/jobs",
+    response_model=JobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    responses={
+        202: {"description": "Job queued", "model": JobResponse},
+        422: {"description": "Validation error", "model": ErrorResponse},
+        503: {
+            "description": "Job queue disabled or full; retry after the Retry-After delay",
+            "model": ErrorResponse,
+        },
+    },
+    summary="Submit Generation Job",
+    description="Queue a generation and return its job id at once; poll GET /testcases/jobs/{job_id} for the result",
+)
+async def submit_job(
+    request: TestCaseRequest,
+    cache_mode: CacheMode = Query(
+        default=CacheMode.USE,
+        description="Use, bypass or refresh the response cache for this job",
+    ),
+) -> ModelJSONResponse:
+    _require_jobs()
+    try:
+        testcase_service.check_request(request)
+        job = await job_queue.submit(request, cache_mode)
+    except ValueError as e:
+        logger.error("Validation error: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e)
+        )
+    except JobQueueFullError as e:
+        logger.warning("Rejected job: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(math.ceil(settings.jobs_max_wait))},
+        )
+
+    logger.info("Queued job %s for %s problem", job.job_id, request.problem_type)
+    return ModelJSONResponse(
+        job,
+        status_code=status.HTTP_202_ACCEPTED,
+        headers={
+            "Location": f"{settings.api_v1_prefix}{router.prefix}/jobs/{job.job_id}"
+        },
+    )
+
+
+@router.get(
+    "/jobs/stats",
+    response_model=Dict[str, object],
+    status_code=status.HTTP_200_OK,
+    summary="Job Queue Statistics",
+    description="Get queue depth, wait time and outcome counters of the job queue",
+)
+async def get_job_stats() -> Dict[str, object]:
+    return job_queue.stats()
+
+
+@router.get(
+    "/jobs/{job_id}",
+    response_model=JobResponse,
+    status_code=status.HTTP_200_OK,
+    responses={
+        404: {"description": "Unknown or expired job", "model": ErrorResponse},
+        503: {"description": "Job queue disabled", "model": ErrorResponse},
+    },
+    summary="Get Generation Job",
+    description="Get the state of a job, optionally waiting for it to finish",
+)
+async def get_job(
+    job_id: str,
+    http_request: Request,
+    wait: float = Query(
+        default=0.0,
+        ge=0.0,
+        description="Seconds to wait for the job to finish before answering "
+        "(capped by the server's jobs_max_wait)",
+    ),
+) -> ModelJSONResponse:
+    _require_jobs()
+    if wait > 0:
+        # Stop holding the long poll open once its client has gone
+        try:
+            job = await run_until_disconnect(
+                http_request,
+                job_queue.wait(job_id, min(wait, settings.jobs_max_wait)),
+            )
+        except ClientDisconnectedError:
+            return Response(status_code=CLIENT_CLOSED_REQUEST)
+    else:
+        job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=f"Unknown job {job_id}"
+        )
+    return ModelJSONResponse(job)
+
+
+@router.get(
+    "/inputs/{input_ref}",
+    response_class=StreamingResponse,
+    status_code=status.HTTP_200_OK,
+    responses={
+        200: {
+            "description": "Input text, e.g. 'nums = [...], target = 5'",
+            "content": {"text/plain": {}},
+        },
+        404: {
+            "description": "Unknown or invalid input reference",
+            "model": ErrorResponse,
+        },
+    },
+    summary="Download Stress Input",
+    description="Stream a large stress input referenced by a stress case's input_ref",
+)
+async def get_stress_input(input_ref: str) -> StreamingResponse:
+    try:
+        spec = stress_inputs.decode_ref(input_ref)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+    # A plain iterator is consumed in the threadpool, off the event loop
+    return StreamingResponse(
+        input_generator.iter_input_text(spec.model_dump(mode="json")),
+        media_type="text/plain; charset=utf-8",
+        headers={"Cache-Control": "public, max-age=86400"},
+    )
+
+
 @router.get(
     "/health",
     response_model=HealthResponse,
@@ -69,6 +398,50 @@ async def health_check() -> HealthResponse:
     return HealthResponse(status="healthy", service="testcase-generator")
 
 
+@router.get(
+    "/cache/stats",
+    response_model=Dict[str, object],
+    status_code=status.HTTP_200_OK,
+    summary="Cache Statistics",
+    description="Get hit/miss counters for the response cache",
+)
+async def get_cache_stats() -> Dict[str, object]:
+    return response_cache.stats()
+
+
+@router.get(
+    "/reuse/stats",
+    response_model=Dict[str, object],
+    status_code=status.HTTP_200_OK,
+    summary="Semantic Reuse Statistics",
+    description="Get hit rate and size of the store of past generations reused for similar problems",
+)
+async def get_reuse_stats() -> Dict[str, object]:
+    return semantic_store.stats()
+
+
+@router.get(
+    "/scheduler/stats",
+    response_model=Dict[str, object],
+    status_code=status.HTTP_200_OK,
+    summary="Upstream Scheduler Statistics",
+    description="Get queue depth and rate-limit window usage for upstream calls",
+)
+async def get_scheduler_stats() -> Dict[str, object]:
+    return upstream_scheduler.stats()
+
+
+@router.get(
+    "/backends/stats",
+    response_model=Dict[str, object],
+    status_code=status.HTTP_200_OK,
+    summary="LLM Backend Statistics",
+    description="Get latency, error rate and load of each LLM backend, in routing order",
+)
+async def get_backend_stats() -> Dict[str, object]:
+    return get_llm_router().stats()
+
+
 @router.get(
     "/supported-types",
     response_model=Dict[str, list],
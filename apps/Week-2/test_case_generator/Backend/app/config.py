@@ -1,6 +1,6 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
-from typing import List
+from typing import List, Optional
 
 
 class Settings(BaseSettings):
@@ -15,9 +15,19 @@ class Settings(BaseSettings):
     debug: bool = True
 
     openai_api_key: str
+    openai_base_url: Optional[str] = None  # OpenAI-compatible endpoint override
     openai_model: str = "gpt-4o-mini"
     openai_temperature: float = 0.7
     openai_max_tokens: int = 2000
+    openai_structured_output: bool = True  # enforce the response JSON schema (strict)
+
+    # Token budgeting (openai_max_tokens is used when disabled)
+    token_budget_enabled: bool = True
+    model_context_window: int = 128_000
+    model_max_output_tokens: int = 16_384
+    token_budget_headroom: float = 1.5  # multiplier on the expected output size
+    token_budget_ewma_alpha: float = 0.2  # weight of each observed generation
+    truncation_continuation_enabled: bool = True  # top up cut-off responses once
 
     cors_origins: List[str] = [
         "http://localhost:3000",
@@ -28,13 +38,83 @@ class Settings(BaseSettings):
     cors_allow_methods: List[str] = ["*"]
     cors_allow_headers: List[str] = ["*"]
 
-    # Rate Limiting (for future implementation)
+    # Upstream rate limiting (per worker, over rate_limit_period)
     rate_limit_enabled: bool = False
     rate_limit_requests: int = 100
     rate_limit_period: int = 3600  # 1 hour in seconds
+    rate_limit_tokens: int = 1_000_000
+    rate_limit_max_queue: int = 1000  # calls waiting for capacity before shedding
+    rate_limit_max_wait: float = 30.0  # seconds a call may wait for capacity
+
+    # Response cache (in-memory LRU, optionally backed by SQLite shared by all workers)
+    cache_enabled: bool = True
+    cache_ttl_seconds: int = 3600
+    cache_max_entries: int = 1024
+    cache_sqlite_path: Optional[str] = None  # e.g. "cache/responses.sqlite3"
+
+    # Sharded generation: large requests split by test case category, in parallel
+    shard_generation_enabled: bool = False
+    shard_min_cases: int = 8  # smallest request that is sharded
+    shard_max_topups: int = 1  # extra calls to fill a shortfall after dedup
+
+    # Reference solution sandbox (resource limits only; for trusted callers)
+    sandbox_enabled: bool = False
+    sandbox_workers: int = 0  # 0 = one per CPU
+    sandbox_cpu_seconds: float = 2.0  # CPU time per run
+    sandbox_memory_mb: int = 256  # address space per worker
+    sandbox_wall_timeout: float = 5.0  # seconds before a hung worker is killed
+
+    # Stress inputs: generated on the server from model-written specs
+    stress_max_values: int = 1_000_000  # integers and characters per input
+    stress_inline_max_values: int = 1000  # larger inputs are returned by reference
+    stress_max_output_chars: int = 100_000  # longer reference outputs are omitted
+
+    # Semantic reuse of past test cases (only with a reference solution)
+    reuse_enabled: bool = False
+    reuse_sqlite_path: str = "cache/reuse.sqlite3"
+    reuse_similarity_threshold: float = 0.9  # cosine similarity needed to reuse
+    reuse_max_entries: int = 10_000  # problems held in the in-memory index
+    reuse_embedding_backend: str = "hashing"  # "hashing" (local) or "openai"
+    reuse_embedding_model: str = "text-embedding-3-small"  # openai backend only
+    reuse_embedding_dim: int = 512
+
+    # Startup warm-up (upstream connections, Ollama model load, cached prompts)
+    warmup_enabled: bool = True
+    warmup_timeout: float = 10.0  # seconds per backend; a failure only logs
+
+    # Job queue (SQLite, shared by every worker process on the host)
+    jobs_enabled: bool = False
+    jobs_sqlite_path: str = "cache/jobs.sqlite3"
+    jobs_workers: int = 4  # concurrent jobs per process
+    jobs_max_queued: int = 10_000  # submissions beyond this are rejected with 503
+    jobs_max_attempts: int = 3  # tries per job (crashes and 503/504 upstream errors)
+    jobs_lease_seconds: float = 60.0  # renewed while running; lapses if the worker dies
+    jobs_poll_interval: float = 1.0  # seconds between checks for other processes' jobs
+    jobs_max_wait: float = 30.0  # longest long-poll; keep below the proxy idle timeout
+    jobs_ttl_seconds: int = 86400  # finished jobs are deleted after this long
 
-    log_level: str = "INFO"
+    # Response compression (brotli when installed, else gzip; never SSE)
+    compression_enabled: bool = True
+    compression_min_size: int = 1024  # bytes; smaller bodies are sent as they are
+    # 1-9; on number-heavy inputs level 5 costs 4x the CPU for ~3% smaller bodies
+    compression_gzip_level: int = 1
+    compression_brotli_quality: int = 4  # 0-11; 11 is far too slow for live responses
+
+    # Batch generation
+    batch_max_concurrency: int = 8  # upstream calls in flight per batch request
+
+    # Logging (written by a background listener thread; empty log_file disables it)
+    log_level: str = "INFO"  # console
     log_file: str = "logs/app.log"
+    log_file_level: str = "DEBUG"
+    log_max_bytes: int = 10 * 1024 * 1024  # rotate the log file at this size
+    log_backup_count: int = 5
+    log_json: bool = False  # one JSON object per line instead of plain text
+
+    # Access log (errors and slow requests always, others sampled) and request ids
+    access_log_sample_rate: float = 0.1  # share of fast successful requests logged
+    access_log_slow_seconds: float = 1.0
+    request_id_header: str = "X-Request-ID"  # taken from the client or generated
 
     # Test Case Generation Limits
     max_test_cases_per_request: int = 20
@@ -43,6 +123,46 @@ class Settings(BaseSettings):
 
     # Request timeouts
     openai_timeout: int = 30  # seconds
+    openai_connect_timeout: float = 5.0  # seconds
+    openai_total_timeout: float = 60.0  # seconds for a completion incl. retries/hedges
+
+    # Request deadlines (X-Request-Timeout header, else the route's default)
+    request_timeout_default: float = 60.0  # /generate
+    request_timeout_stream: float = 120.0  # /generate/stream
+    request_timeout_batch: float = 300.0  # /generate/batch, for the whole batch
+    request_timeout_job: float = 300.0  # each attempt of a queued job
+    request_timeout_max: float = 600.0  # upper bound on the header value
+
+    # Upstream retries (transient errors only) and hedged requests
+    openai_max_retries: int = 3
+    openai_retry_backoff: float = 0.5  # jittered exponential backoff multiplier
+    openai_retry_max_backoff: float = 8.0  # seconds
+    openai_hedge_enabled: bool = False
+    openai_hedge_percentile: float = 0.95  # hedge once an attempt is slower than this
+    openai_hedge_min_delay: float = 1.0  # seconds
+    openai_hedge_min_samples: int = 20  # latencies observed before hedging starts
+
+    # Upstream HTTP connection pool (shared by all requests in a worker)
+    openai_max_connections: int = 100
+    openai_max_keepalive_connections: int = 20
+    openai_keepalive_expiry: float = 30.0  # seconds
+    openai_http2: bool = True  # only used when the 'h2' package is installed
+
+    # LLM backends in preference order (latency-aware routing with failover)
+    llm_backends: List[str] = ["openai"]  # "openai" and/or "ollama"
+    router_preference_factor: float = 2.0  # latency penalty per preference rank
+    router_ewma_alpha: float = 0.2  # weight of each observed latency and error
+    router_error_threshold: float = 0.5  # error rate that marks a backend degraded
+    router_cooldown_seconds: float = 30.0  # how long a degraded backend is skipped
+    router_probe_rate: float = 0.05  # share of calls sent to another healthy backend
+
+    # Ollama backend (see apps/Week-2/01_run_llm_locally)
+    ollama_base_url: str = "http://localhost:11434"
+    ollama_model: str = "llama3.2:1b"
+    ollama_timeout: float = 120.0  # seconds; local models decode slowly
+    ollama_connect_timeout: float = 2.0  # seconds
+    ollama_num_parallel: int = 1  # match OLLAMA_NUM_PARALLEL on the server
+    ollama_num_ctx: int = 8192  # context window requested per call
 
     class Config:
         env_file = ".env"
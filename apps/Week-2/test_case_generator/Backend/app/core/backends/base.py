@@ -0,0 +1,85 @@
+"""
+Interface shared by the LLM backends
+"""
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+
+@dataclass
+class Usage:
+    """Token usage of one completion, for backends without an SDK usage object"""
+
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    prompt_tokens_details: Any = None
+
+
+@dataclass
+class Completion:
+    """Text and metadata of a finished chat completion"""
+
+    content: str
+    finish_reason: Optional[str] = None  # "length" when cut off at max_tokens
+    usage: Any = None  # CompletionUsage or Usage, when the backend reported it
+    backend: Optional[str] = None  # name of the backend that produced it
+
+    @property
+    def truncated(self) -> bool:
+        return self.finish_reason == "length"
+
+    @property
+    def completion_tokens(self) -> Optional[int]:
+        return getattr(self.usage, "completion_tokens", None)
+
+
+class LLMBackend(ABC):
+    """
+    A chat completion provider
+
+    Implementations raise UpstreamError for failed calls (with the status
+    code the API should return) and ValueError when the model refuses to
+    answer in the requested format.
+    """
+
+    name: str = ""
+
+    # Calls the provider serves at once; more than this queue up
+    parallelism: int = 1
+
+    @abstractmethod
+    async def startup(self) -> None:
+        """Open connection pools; safe to call more than once"""
+
+    @abstractmethod
+    async def aclose(self) -> None:
+        """Close connection pools"""
+
+    @abstractmethod
+    async def generate_completion(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = None,
+        max_tokens: int = None,
+        response_format: Optional[Dict[str, Any]] = None,
+    ) -> Completion:
+        """Generate a complete chat completion"""
+
+    @abstractmethod
+    def stream_completion(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = None,
+        max_tokens: int = None,
+        response_format: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[str]:
+        """Stream a chat completion as text deltas"""
+
+    async def warm_up(self) -> None:
+        """Do the provider's first-call work (connections, model loading) early"""
+
+    def queue_depth(self) -> int:
+        """Calls waiting for this backend beyond those it is serving"""
+        return 0
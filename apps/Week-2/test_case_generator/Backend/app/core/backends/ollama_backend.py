@@ -0,0 +1,254 @@
+"""
+Ollama chat backend (/api/chat over httpx)
+"""
+
+import json
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+
+from app.config import get_settings
+from app.core.backends.base import Completion, LLMBackend, Usage
+from app.core.exceptions import UpstreamError
+from app.core.metrics import llm_tokens, stage_duration, upstream_attempts
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+
+class OllamaBackend(LLMBackend):
+    """Backend for an Ollama server"""
+
+    name = "ollama"
+
+    def __init__(self):
+        """Initialize client configuration; the HTTP pool is opened in startup()"""
+        self.client: Optional[httpx.AsyncClient] = None
+        self.model = settings.ollama_model
+        self.temperature = settings.openai_temperature
+        self.max_tokens = settings.openai_max_tokens
+        # Ollama runs OLLAMA_NUM_PARALLEL requests per model and queues the rest
+        self.parallelism = settings.ollama_num_parallel
+
+    async def startup(self) -> None:
+        """Open the HTTP connection pool; safe to call more than once"""
+        if self.client is not None:
+            return
+
+        self.client = httpx.AsyncClient(
+            base_url=settings.ollama_base_url,
+            timeout=httpx.Timeout(
+                settings.ollama_timeout, connect=settings.ollama_connect_timeout
+            ),
+        )
+        logger.info(
+            "Ollama client initialized with model: %s at %s",
+            self.model,
+            settings.ollama_base_url,
+        )
+
+    async def warm_up(self) -> None:
+        """
+        Load the model into memory ahead of the first call
+        Ollama loads a model on its first request, which can take seconds;
+        a chat request without messages loads it and returns immediately.
+        """
+        if self.client is None:
+            await self.startup()
+        response = await self.client.post(
+            "/api/chat", json={"model": self.model, "messages": []}
+        )
+        response.raise_for_status()
+
+    async def aclose(self) -> None:
+        """Close the HTTP connection pool"""
+        if self.client is None:
+            return
+
+        await self.client.aclose()
+        self.client = None
+        logger.info("Ollama client closed")
+
+    def _build_payload(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        response_format: Optional[Dict[str, Any]],
+        stream: bool,
+    ) -> Dict[str, Any]:
+        """
+        Build an /api/chat request body
+        Args:
+            messages: List of message dictionaries with role and content
+            temperature: Sampling temperature, or None for the default
+            max_tokens: Maximum tokens to generate, or None for the default
+            response_format: Optional OpenAI-style structured-output format
+            stream: Whether to stream the response
+        Returns:
+            Request body
+        """
+        # Ollama constrains output with a JSON schema, or to any JSON with "json"
+        output_format: Any = "json"
+        if response_format is not None and response_format.get("json_schema"):
+            output_format = response_format["json_schema"]["schema"]
+
+        return {
+            "model": self.model,
+            "messages": messages,
+            "stream": stream,
+            "format": output_format,
+            "options": {
+                "temperature": (
+                    temperature if temperature is not None else self.temperature
+                ),
+                "num_predict": (
+                    max_tokens if max_tokens is not None else self.max_tokens
+                ),
+                "num_ctx": settings.ollama_num_ctx,
+            },
+        }
+
+    async def generate_completion(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = None,
+        max_tokens: int = None,
+        response_format: Optional[Dict[str, Any]] = None,
+    ) -> Completion:
+        """
+        Generate a completion from Ollama
+        Args:
+            messages: List of message dictionaries with role and content
+            temperature: Sampling temperature
+            max_tokens: Maximum tokens to generate
+            response_format: Optional structured-output format (JSON schema)
+        Returns:
+            Completion with the generated text, finish reason and usage
+        Raises:
+            UpstreamError: If the Ollama call fails
+        """
+        if self.client is None:
+            await self.startup()
+
+        logger.info("Sending request to Ollama with %s messages", len(messages))
+        payload = self._build_payload(
+            messages, temperature, max_tokens, response_format, stream=False
+        )
+        sent_at = time.perf_counter()
+        try:
+            async with self.client.stream(
+                "POST", "/api/chat", json=payload
+            ) as response:
+                first_byte_at = time.perf_counter()
+                response.raise_for_status()
+                await response.aread()
+            data = response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            upstream_attempts.inc(outcome="error")
+            logger.error("Ollama API error: %s", e)
+            raise self._to_upstream_error(e)
+        upstream_attempts.inc(outcome="success")
+        stage_duration.observe(first_byte_at - sent_at, stage="time_to_first_byte")
+
+        usage = self._record_usage(data)
+        return Completion(
+            content=(data.get("message") or {}).get("content") or "",
+            finish_reason=data.get("done_reason"),
+            usage=usage,
+            backend=self.name,
+        )
+
+    async def stream_completion(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = None,
+        max_tokens: int = None,
+        response_format: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Stream a completion from Ollama
+        Args:
+            messages: List of message dictionaries with role and content
+            temperature: Sampling temperature
+            max_tokens: Maximum tokens to generate
+            response_format: Optional structured-output format (JSON schema)
+        Yields:
+            Text deltas as they arrive
+        Raises:
+            UpstreamError: If the Ollama call fails
+        """
+        if self.client is None:
+            await self.startup()
+
+        logger.info("Streaming request to Ollama with %s messages", len(messages))
+        payload = self._build_payload(
+            messages, temperature, max_tokens, response_format, stream=True
+        )
+        try:
+            async with self.client.stream(
+                "POST", "/api/chat", json=payload
+            ) as response:
+                response.raise_for_status()
+                upstream_attempts.inc(outcome="success")
+                # One JSON object per line; the last one carries the usage
+                async for line in response.aiter_lines():
+                    if not line.strip():
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        raise UpstreamError(f"Ollama API error: {chunk['error']}")
+                    delta = (chunk.get("message") or {}).get("content")
+                    if delta:
+                        yield delta
+                    if chunk.get("done"):
+                        self._record_usage(chunk)
+        except (httpx.HTTPError, ValueError) as e:
+            upstream_attempts.inc(outcome="error")
+            logger.error("Ollama streaming error: %s", e)
+            raise self._to_upstream_error(e)
+
+    @staticmethod
+    def _record_usage(data: Dict[str, Any]) -> Usage:
+        """
+        Add the token counts of a finished response to the token counters
+        Args:
+            data: Final /api/chat response object
+        Returns:
+            Usage built from prompt_eval_count and eval_count
+        """
+        prompt_tokens = data.get("prompt_eval_count") or 0
+        completion_tokens = data.get("eval_count") or 0
+        llm_tokens.inc(prompt_tokens, kind="prompt")
+        llm_tokens.inc(completion_tokens, kind="completion")
+        logger.info(
+            "Ollama usage - Prompt tokens: %s, Completion tokens: %s",
+            prompt_tokens,
+            completion_tokens,
+        )
+        return Usage(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens,
+        )
+
+    @staticmethod
+    def _to_upstream_error(error: Exception) -> UpstreamError:
+        """
+        Map an httpx error onto the status code the API should return
+        Args:
+            error: Error raised by the request
+        Returns:
+            UpstreamError with 504 for timeouts, 503 when Ollama is busy, else 502
+        """
+        message = f"Ollama API error: {str(error)}"
+        if isinstance(error, httpx.TimeoutException):
+            return UpstreamError(message, status_code=504)
+        if isinstance(error, httpx.HTTPStatusError) and error.response.status_code in (
+            429,
+            503,
+        ):
+            return UpstreamError(message, status_code=503)
+        return UpstreamError(message, status_code=502)
@@ -0,0 +1,518 @@
+"""
+OpenAI (and OpenAI-compatible) chat completions backend
+"""
+
+import asyncio
+import importlib.util
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Dict, Optional, Tuple
+
+import httpx
+from openai import (
+    APIConnectionError,
+    APIStatusError,
+    APITimeoutError,
+    AsyncOpenAI,
+    OpenAIError,
+    RateLimitError,
+)
+from tenacity import AsyncRetrying, RetryCallState, retry_if_exception
+from tenacity.wait import wait_random_exponential
+
+from app.config import get_settings
+from app.core.backends.base import Completion, LLMBackend
+from app.core.deadline import cap_deadline
+from app.core.exceptions import UpstreamError
+from app.core.metrics import llm_tokens, stage_duration, upstream_attempts
+from app.core.scheduler import Grant, upstream_scheduler
+from app.core.tokens import token_budget
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+# Status codes worth retrying besides 5xx: request timeout, conflict, rate limit
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+
+# time.perf_counter() when the current attempt's response headers arrived
+_first_byte_at: ContextVar[Optional[float]] = ContextVar("first_byte_at", default=None)
+
+
+async def _stamp_first_byte(response: httpx.Response) -> None:
+    """httpx response hook, run when the headers arrive and before the body"""
+    _first_byte_at.set(time.perf_counter())
+
+
+class OpenAIBackend(LLMBackend):
+    """Backend for the OpenAI API or an OpenAI-compatible endpoint"""
+
+    name = "openai"
+
+    def __init__(self):
+        """Initialize client configuration; the HTTP pool is opened in startup()"""
+        self.client: Optional[AsyncOpenAI] = None
+        self.model = settings.openai_model
+        self.temperature = settings.openai_temperature
+        self.max_tokens = settings.openai_max_tokens
+        self.parallelism = settings.openai_max_connections
+
+        # Recent successful attempt latencies, used to pick the hedge delay
+        self._latencies: deque = deque(maxlen=200)
+
+    async def startup(self) -> None:
+        """
+        Open the shared HTTP connection pool and the AsyncOpenAI client.
+        Called once from the FastAPI lifespan; safe to call more than once.
+        """
+        if self.client is not None:
+            return
+
+        http2 = settings.openai_http2 and importlib.util.find_spec("h2") is not None
+        http_client = httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=settings.openai_max_connections,
+                max_keepalive_connections=settings.openai_max_keepalive_connections,
+                keepalive_expiry=settings.openai_keepalive_expiry,
+            ),
+            timeout=self._build_timeout(),
+            event_hooks={"response": [_stamp_first_byte]},
+        )
+
+        # Retries are handled by _with_retries (classified, deadline-bounded)
+        self.client = AsyncOpenAI(
+            api_key=settings.openai_api_key,
+            base_url=settings.openai_base_url,
+            http_client=http_client,
+            timeout=self._build_timeout(),
+            max_retries=0,
+        )
+        logger.info(
+            "OpenAI client initialized with model: %s (max_connections=%s, http2=%s)",
+            self.model,
+            settings.openai_max_connections,
+            http2,
+        )
+
+    async def warm_up(self) -> None:
+        """
+        Open a pooled connection (DNS, TCP and TLS) ahead of the first call
+        Looking up the configured model also confirms the key can use it.
+        """
+        if self.client is None:
+            await self.startup()
+        await self.client.models.retrieve(self.model)
+
+    async def aclose(self) -> None:
+        """Close the AsyncOpenAI client and its connection pool"""
+        if self.client is None:
+            return
+
+        await self.client.close()
+        self.client = None
+        logger.info("OpenAI client closed")
+
+    @staticmethod
+    def _build_timeout(remaining: Optional[float] = None) -> httpx.Timeout:
+        """
+        Build the upstream timeout from settings
+        Args:
+            remaining: Optional tighter bound, e.g. the time left before a deadline
+        Returns:
+            httpx.Timeout bounded by openai_timeout
+        """
+        timeout = float(settings.openai_timeout)
+        if remaining is not None:
+            timeout = min(timeout, remaining)
+        return httpx.Timeout(
+            timeout, connect=min(settings.openai_connect_timeout, timeout)
+        )
+
+    @staticmethod
+    def _estimate_tokens(messages: List[Dict[str, str]], max_tokens: int) -> int:
+        """
+        Upper bound on the tokens a call will consume
+        Args:
+            messages: Chat messages to send
+            max_tokens: Completion token limit for the call
+        Returns:
+            Prompt tokens plus max_tokens
+        """
+        return token_budget.count_messages(messages) + max_tokens
+
+    async def generate_completion(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = None,
+        max_tokens: int = None,
+        response_format: Optional[Dict[str, Any]] = None,
+    ) -> Completion:
+        """
+        Generate completion from OpenAI
+        Transient failures are retried with jittered backoff and slow attempts
+        may be hedged, all within openai_total_timeout and the request deadline.
+        Args:
+            messages: List of message dictionaries with role and content
+            temperature: Sampling temperature (0-2). Higher = more random
+            max_tokens: Maximum tokens to generate
+            response_format: Optional structured-output format (JSON schema)
+        Returns:
+            Completion with the generated text, finish reason and usage
+        Raises:
+            UpstreamError: If the OpenAI API call fails
+            ValueError: If the model refused to answer in the requested format
+        """
+        # Lazily open the pool when used outside the app lifespan (scripts, tests)
+        if self.client is None:
+            await self.startup()
+
+        # Use provided parameters or fall back to defaults
+        temp = temperature if temperature is not None else self.temperature
+        tokens = max_tokens if max_tokens is not None else self.max_tokens
+        deadline = cap_deadline(time.monotonic() + settings.openai_total_timeout)
+
+        logger.info("Sending request to OpenAI with %s messages", len(messages))
+        logger.debug(
+            "Parameters: model=%s, temp=%s, max_tokens=%s", self.model, temp, tokens
+        )
+
+        params = {"messages": messages, "temperature": temp, "max_tokens": tokens}
+        if response_format is not None:
+            params["response_format"] = response_format
+
+        async def attempt() -> Tuple[Any, Grant]:
+            return await self._create(deadline, **params)
+
+        try:
+            response, _ = await self._with_retries(
+                lambda: self._hedged(attempt, deadline), deadline
+            )
+        except OpenAIError as e:
+            logger.error("OpenAI API error: %s", e)
+            raise self._to_upstream_error(e)
+
+        choice = response.choices[0]
+        message = choice.message
+
+        # Log usage statistics
+        if getattr(response, "usage", None):
+            self._record_usage(response.usage)
+
+        # With structured output the model declines through a refusal message
+        if message.content is None and getattr(message, "refusal", None):
+            logger.warning("OpenAI refused the request: %s", message.refusal)
+            raise ValueError(f"Model refused the request: {message.refusal}")
+        if choice.finish_reason == "length":
+            logger.warning("OpenAI response truncated at max_tokens=%s", tokens)
+
+        logger.info("Successfully received response from OpenAI")
+        return Completion(
+            content=message.content or "",
+            finish_reason=choice.finish_reason,
+            usage=getattr(response, "usage", None),
+            backend=self.name,
+        )
+
+    async def stream_completion(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = None,
+        max_tokens: int = None,
+        response_format: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Stream a completion from OpenAI token by token
+        Opening the stream is retried like generate_completion; a failure
+        after tokens have been yielded is raised to the caller.
+        Args:
+            messages: List of message dictionaries with role and content
+            temperature: Sampling temperature (0-2). Higher = more random
+            max_tokens: Maximum tokens to generate
+            response_format: Optional structured-output format (JSON schema)
+        Yields:
+            Text deltas as they arrive
+        Raises:
+            UpstreamError: If the OpenAI API call fails
+        """
+        if self.client is None:
+            await self.startup()
+
+        temp = temperature if temperature is not None else self.temperature
+        tokens = max_tokens if max_tokens is not None else self.max_tokens
+        deadline = cap_deadline(time.monotonic() + settings.openai_total_timeout)
+
+        logger.info("Streaming request to OpenAI with %s messages", len(messages))
+
+        params = {
+            "messages": messages,
+            "temperature": temp,
+            "max_tokens": tokens,
+            "stream": True,
+            "stream_options": {"include_usage": True},
+        }
+        if response_format is not None:
+            params["response_format"] = response_format
+
+        async def attempt() -> Tuple[Any, Grant]:
+            return await self._create(deadline, **params)
+
+        try:
+            stream, grant = await self._with_retries(attempt, deadline)
+        except OpenAIError as e:
+            logger.error("OpenAI API error: %s", e)
+            raise self._to_upstream_error(e)
+
+        try:
+            async for chunk in stream:
+                if chunk.choices:
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        yield delta
+                if getattr(chunk, "usage", None):
+                    grant.reconcile(chunk.usage.total_tokens)
+                    self._record_usage(chunk.usage)
+        except OpenAIError as e:
+            logger.error("OpenAI streaming error: %s", e)
+            raise self._to_upstream_error(e)
+        finally:
+            # Closing the stream releases the pooled connection early
+            await stream.close()
+
+    def queue_depth(self) -> int:
+        """Calls waiting for rate-limit capacity"""
+        return upstream_scheduler.queue_depth
+
+    async def _create(self, deadline: float, **params: Any) -> Tuple[Any, Grant]:
+        """
+        Make one chat completion attempt through the upstream scheduler
+        Args:
+            deadline: time.monotonic() by which the attempt must finish
+            **params: Arguments for chat.completions.create
+        Returns:
+            (ChatCompletion or AsyncStream, scheduler grant) tuple
+        Raises:
+            UpstreamError: If no time is left before the deadline
+        """
+        grant = await upstream_scheduler.acquire(
+            self._estimate_tokens(params["messages"], params["max_tokens"]),
+            deadline=deadline,
+        )
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise UpstreamError("Upstream deadline exceeded", status_code=504)
+
+        started = time.monotonic()
+        sent_at = time.perf_counter()
+        # The SDK sends from this task, so the response hook's stamp shows here
+        token = _first_byte_at.set(None)
+        try:
+            response = await self.client.chat.completions.create(
+                model=self.model, timeout=self._build_timeout(remaining), **params
+            )
+            first_byte_at = _first_byte_at.get()
+        except OpenAIError:
+            upstream_attempts.inc(outcome="error")
+            raise
+        finally:
+            _first_byte_at.reset(token)
+        upstream_attempts.inc(outcome="success")
+
+        if not params.get("stream"):
+            self._latencies.append(time.monotonic() - started)
+            if first_byte_at is not None:
+                stage_duration.observe(
+                    first_byte_at - sent_at, stage="time_to_first_byte"
+                )
+            if getattr(response, "usage", None):
+                grant.reconcile(response.usage.total_tokens)
+        return response, grant
+
+    async def _with_retries(
+        self, call: Callable[[], Awaitable[Any]], deadline: float
+    ) -> Any:
+        """
+        Retry transient upstream failures with jittered exponential backoff
+        Args:
+            call: Zero-argument coroutine function making one attempt
+            deadline: time.monotonic() after which no further attempt starts
+        Returns:
+            Result of the first successful attempt
+        Raises:
+            The last error if it is not retryable or the retry budget is spent
+        """
+        backoff = wait_random_exponential(
+            multiplier=settings.openai_retry_backoff,
+            max=settings.openai_retry_max_backoff,
+        )
+
+        def wait(retry_state: RetryCallState) -> float:
+            # Never retry sooner than the server asked us to
+            retry_after = self._retry_after(retry_state.outcome.exception())
+            return max(backoff(retry_state), retry_after or 0.0)
+
+        def stop(retry_state: RetryCallState) -> bool:
+            out_of_attempts = retry_state.attempt_number > settings.openai_max_retries
+            out_of_time = time.monotonic() + retry_state.upcoming_sleep >= deadline
+            return out_of_attempts or out_of_time
+
+        def before_sleep(retry_state: RetryCallState) -> None:
+            upstream_attempts.inc(outcome="retry")
+            logger.warning(
+                "OpenAI attempt %s failed (%s), retrying in %.2fs",
+                retry_state.attempt_number,
+                type(retry_state.outcome.exception()).__name__,
+                retry_state.upcoming_sleep,
+            )
+
+        async for attempt in AsyncRetrying(
+            retry=retry_if_exception(self._is_retryable),
+            wait=wait,
+            stop=stop,
+            before_sleep=before_sleep,
+            reraise=True,
+        ):
+            with attempt:
+                return await call()
+
+    async def _hedged(
+        self, call: Callable[[], Awaitable[Tuple[Any, Grant]]], deadline: float
+    ) -> Tuple[Any, Grant]:
+        """
+        Run an attempt, firing a duplicate if it is slower than usual
+        The duplicate starts once the attempt has run longer than the observed
+        latency percentile; the first response with content or a refusal wins
+        and the other attempt is cancelled.
+        Args:
+            call: Zero-argument coroutine function making one attempt
+            deadline: time.monotonic() by which the call must finish
+        Returns:
+            Result of the winning attempt
+        """
+        delay = self._hedge_delay()
+        if delay is None or time.monotonic() + delay >= deadline:
+            return await call()
+
+        primary = asyncio.create_task(call())
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        logger.info("Hedging OpenAI request after %.2fs", delay)
+        upstream_attempts.inc(outcome="hedge")
+        pending = {primary, asyncio.create_task(call())}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    response, grant = task.result()
+                    if not response.choices:
+                        continue
+                    # A refusal is a final answer; generate_completion raises it
+                    message = response.choices[0].message
+                    if message.content or getattr(message, "refusal", None):
+                        return response, grant
+            raise error or UpstreamError("Empty response from OpenAI")
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _hedge_delay(self) -> Optional[float]:
+        """
+        Get the delay before hedging
+        Returns:
+            Observed latency percentile (at least openai_hedge_min_delay), or
+            None when hedging is disabled or too few samples have been seen
+        """
+        if not settings.openai_hedge_enabled:
+            return None
+        if len(self._latencies) < settings.openai_hedge_min_samples:
+            return None
+
+        ordered = sorted(self._latencies)
+        index = min(
+            len(ordered) - 1, int(len(ordered) * settings.openai_hedge_percentile)
+        )
+        return max(ordered[index], settings.openai_hedge_min_delay)
+
+    @staticmethod
+    def _record_usage(usage: Any) -> None:
+        """
+        Log token usage and add it to the token counters
+        Args:
+            usage: CompletionUsage from a response or the final stream chunk
+        """
+        # Prompt tokens served from the provider's prefix cache, when reported
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", None) or 0
+
+        llm_tokens.inc(usage.prompt_tokens, kind="prompt")
+        llm_tokens.inc(cached, kind="prompt_cached")
+        llm_tokens.inc(usage.completion_tokens, kind="completion")
+        logger.info(
+            "OpenAI usage - Prompt tokens: %s (cached: %s), Completion tokens: %s, "
+            "Total: %s",
+            usage.prompt_tokens,
+            cached,
+            usage.completion_tokens,
+            usage.total_tokens,
+        )
+
+    @staticmethod
+    def _is_retryable(error: BaseException) -> bool:
+        """
+        Classify an upstream error as transient
+        Args:
+            error: Exception raised by an attempt
+        Returns:
+            True for timeouts, connection errors, 408/409/429 and 5xx responses
+        """
+        if isinstance(error, (APITimeoutError, APIConnectionError)):
+            return True
+        if isinstance(error, APIStatusError):
+            return (
+                error.status_code in RETRYABLE_STATUS_CODES or error.status_code >= 500
+            )
+        return False
+
+    @staticmethod
+    def _retry_after(error: Optional[BaseException]) -> Optional[float]:
+        """
+        Read the Retry-After header from an upstream error response
+        Args:
+            error: Exception raised by an attempt
+        Returns:
+            Seconds to wait, or None if the server did not say
+        """
+        response = getattr(error, "response", None)
+        if response is None:
+            return None
+        try:
+            return float(response.headers.get("retry-after"))
+        except (TypeError, ValueError):
+            return None
+
+    def _to_upstream_error(self, error: OpenAIError) -> UpstreamError:
+        """
+        Map an OpenAI SDK error onto the status code the API should return
+        Args:
+            error: Final error after retries
+        Returns:
+            UpstreamError with 503 for rate limits, 504 for timeouts, else 502
+        """
+        message = f"OpenAI API error: {str(error)}"
+        if isinstance(error, RateLimitError):
+            return UpstreamError(
+                message, status_code=503, retry_after=self._retry_after(error)
+            )
+        if isinstance(error, APITimeoutError):
+            return UpstreamError(message, status_code=504)
+        return UpstreamError(message, status_code=502)
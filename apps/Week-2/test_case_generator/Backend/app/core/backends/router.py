@@ -0,0 +1,388 @@
+"""
+Latency-aware routing across LLM backends, with failover
+"""
+
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from app.config import get_settings
+from app.core.backends.base import Completion, LLMBackend
+from app.core.deadline import check_deadline, iter_with_deadline, with_deadline
+from app.core.exceptions import (
+    DeadlineExceededError,
+    UpstreamError,
+    UpstreamOverloadedError,
+)
+from app.core.metrics import backend_calls, registry
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+# Failures worth trying on another backend: upstream errors, overload, timeouts
+FAILOVER_STATUS_CODES = {502, 503, 504}
+
+
+@dataclass
+class BackendHealth:
+    """Live statistics the router keeps for one backend"""
+
+    latency: Optional[float] = None  # EWMA of completion latency, seconds
+    error_rate: float = 0.0  # EWMA of failures (1) and successes (0)
+    in_flight: int = 0
+    degraded_until: float = 0.0  # time.monotonic() until which it is skipped
+
+    def degraded(self, now: float) -> bool:
+        return now < self.degraded_until
+
+
+class BackendRouter(LLMBackend):
+    """
+    Route chat completions to one of several backends
+
+    The router is itself an LLMBackend, so callers are unaware of how many
+    backends sit behind it.
+    """
+
+    name = "router"
+
+    def __init__(
+        self,
+        backends: List[LLMBackend],
+        preference_factor: float = 2.0,
+        ewma_alpha: float = 0.2,
+        error_threshold: float = 0.5,
+        cooldown: float = 30.0,
+        probe_rate: float = 0.05,
+    ):
+        if not backends:
+            raise ValueError("At least one LLM backend is required")
+        self.backends = backends
+        self.preference_factor = preference_factor
+        self.ewma_alpha = ewma_alpha
+        self.error_threshold = error_threshold
+        self.cooldown = cooldown
+        self.probe_rate = probe_rate
+        self.health: Dict[str, BackendHealth] = {
+            backend.name: BackendHealth() for backend in backends
+        }
+
+    async def startup(self) -> None:
+        """Open every backend's connection pool"""
+        for backend in self.backends:
+            await backend.startup()
+
+    async def aclose(self) -> None:
+        """Close every backend's connection pool"""
+        for backend in self.backends:
+            await backend.aclose()
+
+    async def warm_up(self, timeout: float = 10.0) -> None:
+        """
+        Warm up every backend concurrently
+        A backend that fails or times out is only logged; it is still used.
+        Args:
+            timeout: Seconds to allow each backend
+        """
+
+        async def warm(backend: LLMBackend) -> None:
+            started = time.perf_counter()
+            try:
+                await asyncio.wait_for(backend.warm_up(), timeout)
+            except Exception as e:
+                logger.warning("Warm-up of backend %s failed: %r", backend.name, e)
+                return
+            logger.info(
+                "Backend %s warmed up in %.3fs",
+                backend.name,
+                time.perf_counter() - started,
+            )
+
+        await asyncio.gather(*(warm(backend) for backend in self.backends))
+
+    def rank(self) -> List[LLMBackend]:
+        """
+        Order the backends by expected latency, best first
+        Healthy backends come before degraded ones. A backend with no
+        latency samples yet is assumed to be as fast as the fastest known
+        one until a probe measures it.
+        Returns:
+            All backends, in the order calls should try them
+        """
+        now = time.monotonic()
+        known = [h.latency for h in self.health.values() if h.latency is not None]
+        default_latency = min(known) if known else 1.0
+
+        def expected(index: int, backend: LLMBackend) -> float:
+            health = self.health[backend.name]
+            latency = health.latency if health.latency is not None else default_latency
+            # Calls beyond the backend's parallelism wait for earlier ones
+            waiting = health.in_flight + backend.queue_depth()
+            pressure = 1 + waiting / max(1, backend.parallelism)
+            # A later backend has to be this much faster to be preferred
+            return latency * pressure * self.preference_factor**index
+
+        ranked = [
+            backend
+            for _, backend in sorted(
+                enumerate(self.backends),
+                key=lambda item: (
+                    self.health[item[1].name].degraded(now),
+                    expected(*item),
+                ),
+            )
+        ]
+
+        # Occasionally try another healthy backend first to keep measuring it
+        others = [b for b in ranked[1:] if not self.health[b.name].degraded(now)]
+        if others and random.random() < self.probe_rate:
+            probe = random.choice(others)
+            ranked.remove(probe)
+            ranked.insert(0, probe)
+        return ranked
+
+    async def generate_completion(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = None,
+        max_tokens: int = None,
+        response_format: Optional[Dict[str, Any]] = None,
+    ) -> Completion:
+        """
+        Generate a completion on the best backend, failing over on errors
+        Args:
+            messages: List of message dictionaries with role and content
+            temperature: Sampling temperature (0-2). Higher = more random
+            max_tokens: Maximum tokens to generate
+            response_format: Optional structured-output format (JSON schema)
+        Returns:
+            Completion from the first backend that succeeded
+        Raises:
+            UpstreamError: If every backend failed
+            ValueError: If the model refused to answer in the requested format
+        """
+        error: Optional[UpstreamError] = None
+        for backend in self.rank():
+            health = self.health[backend.name]
+            health.in_flight += 1
+            started = time.monotonic()
+            try:
+                completion = await with_deadline(
+                    backend.generate_completion(
+                        messages,
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        response_format=response_format,
+                    ),
+                    "upstream",
+                )
+            except asyncio.CancelledError:
+                # The caller went away; not held against the backend
+                backend_calls.inc(backend=backend.name, outcome="cancelled")
+                raise
+            except DeadlineExceededError:
+                raise
+            except UpstreamOverloadedError as e:
+                # Shed locally by the scheduler; the backend itself is healthy
+                error = e
+                continue
+            except UpstreamError as e:
+                # A timeout cut short by the request deadline is not the
+                # backend's fault, and no other backend has time left either
+                check_deadline("upstream")
+                self._record_failure(backend, e)
+                if e.status_code not in FAILOVER_STATUS_CODES:
+                    raise
+                error = e
+                continue
+            finally:
+                health.in_flight -= 1
+            self._record_success(backend, time.monotonic() - started)
+            return completion
+        raise error
+
+    async def stream_completion(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = None,
+        max_tokens: int = None,
+        response_format: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Stream a completion from the best backend
+        A backend that fails before sending any text is replaced by the
+        next one; a failure after text has been yielded is raised.
+        Args:
+            messages: List of message dictionaries with role and content
+            temperature: Sampling temperature (0-2). Higher = more random
+            max_tokens: Maximum tokens to generate
+            response_format: Optional structured-output format (JSON schema)
+        Yields:
+            Text deltas as they arrive
+        Raises:
+            UpstreamError: If every backend failed
+        """
+        error: Optional[UpstreamError] = None
+        for backend in self.rank():
+            health = self.health[backend.name]
+            health.in_flight += 1
+            started = time.monotonic()
+            yielded = False
+            try:
+                async for delta in iter_with_deadline(
+                    backend.stream_completion(
+                        messages,
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        response_format=response_format,
+                    ),
+                    "upstream",
+                ):
+                    yielded = True
+                    yield delta
+            except (asyncio.CancelledError, GeneratorExit):
+                # Cancelled, or closed by a consumer that stopped reading
+                backend_calls.inc(backend=backend.name, outcome="cancelled")
+                raise
+            except DeadlineExceededError:
+                raise
+            except UpstreamOverloadedError as e:
+                # Shed locally by the scheduler; the backend itself is healthy
+                if yielded:
+                    raise
+                error = e
+                continue
+            except UpstreamError as e:
+                # A timeout cut short by the request deadline is not the
+                # backend's fault, and no other backend has time left either
+                check_deadline("upstream")
+                self._record_failure(backend, e)
+                if yielded or e.status_code not in FAILOVER_STATUS_CODES:
+                    raise
+                error = e
+                continue
+            finally:
+                health.in_flight -= 1
+            self._record_success(backend, time.monotonic() - started)
+            return
+        raise error
+
+    def _record_success(self, backend: LLMBackend, latency: float) -> None:
+        health = self.health[backend.name]
+        if health.latency is None:
+            health.latency = latency
+        else:
+            health.latency += self.ewma_alpha * (latency - health.latency)
+        health.error_rate *= 1 - self.ewma_alpha
+        backend_calls.inc(backend=backend.name, outcome="success")
+
+    def _record_failure(self, backend: LLMBackend, error: UpstreamError) -> None:
+        health = self.health[backend.name]
+        health.error_rate += self.ewma_alpha * (1 - health.error_rate)
+        backend_calls.inc(backend=backend.name, outcome="error")
+
+        if health.error_rate >= self.error_threshold and len(self.backends) > 1:
+            now = time.monotonic()
+            if not health.degraded(now):
+                logger.warning(
+                    "Backend %s degraded (error rate %.2f), skipping it for %.0fs",
+                    backend.name,
+                    health.error_rate,
+                    self.cooldown,
+                )
+            health.degraded_until = now + self.cooldown
+            # Come back on probation rather than straight into the cooldown again
+            health.error_rate = self.error_threshold / 2
+        else:
+            logger.warning("Backend %s failed: %s", backend.name, error)
+
+    def stats(self) -> Dict[str, object]:
+        """
+        Get routing statistics for every backend
+        Returns:
+            Dictionary of per-backend health, in current routing order
+        """
+        now = time.monotonic()
+        return {
+            backend.name: {
+                "latency_ewma": self.health[backend.name].latency,
+                "error_rate_ewma": round(self.health[backend.name].error_rate, 4),
+                "in_flight": self.health[backend.name].in_flight,
+                "queue_depth": backend.queue_depth(),
+                "degraded": self.health[backend.name].degraded(now),
+            }
+            for backend in self.rank()
+        }
+
+
+def create_router() -> BackendRouter:
+    """
+    Build the router for the backends named in settings.llm_backends
+    Returns:
+        BackendRouter over the configured backends, in preference order
+    Raises:
+        ValueError: If a backend name is unknown
+    """
+    from app.core.backends.ollama_backend import OllamaBackend
+    from app.core.backends.openai_backend import OpenAIBackend
+
+    available = {"openai": OpenAIBackend, "ollama": OllamaBackend}
+    backends = []
+    for name in settings.llm_backends:
+        if name not in available:
+            raise ValueError(
+                f"Unknown LLM backend {name!r}; expected one of {sorted(available)}"
+            )
+        backends.append(available[name]())
+
+    return BackendRouter(
+        backends,
+        preference_factor=settings.router_preference_factor,
+        ewma_alpha=settings.router_ewma_alpha,
+        error_threshold=settings.router_error_threshold,
+        cooldown=settings.router_cooldown_seconds,
+        probe_rate=settings.router_probe_rate,
+    )
+
+
+_router: Optional[BackendRouter] = None
+
+
+def get_llm_router() -> BackendRouter:
+    """
+    Get the process-wide router, building it on first use
+    Building it imports the backend SDKs, so this is left to the app's
+    lifespan rather than done when the module is imported.
+    Returns:
+        BackendRouter instance
+    """
+    global _router
+    if _router is None:
+        _router = create_router()
+    return _router
+
+
+registry.callback(
+    "testcase_backend_latency_seconds",
+    "Moving average of completion latency per LLM backend",
+    "gauge",
+    lambda: {
+        (name,): health.latency
+        for name, health in (_router.health.items() if _router else [])
+        if health.latency is not None
+    },
+    ["backend"],
+)
+registry.callback(
+    "testcase_backend_degraded",
+    "1 while an LLM backend is skipped after repeated failures",
+    "gauge",
+    lambda: {
+        (name,): int(health.degraded(time.monotonic()))
+        for name, health in (_router.health.items() if _router else [])
+    },
+    ["backend"],
+)
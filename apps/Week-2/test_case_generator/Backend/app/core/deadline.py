@@ -0,0 +1,144 @@
+"""
+End-to-end request deadlines, inherited through a context variable by the
+work started on a request's behalf; each waiting stage gets only the time left
+"""
+
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Awaitable, Iterator, Optional, TypeVar
+
+from app.core.exceptions import DeadlineExceededError
+from app.core.metrics import deadline_exceeded
+
+T = TypeVar("T")
+
+# time.monotonic() by which the current request must finish, if it has one
+request_deadline: ContextVar[Optional[float]] = ContextVar(
+    "request_deadline", default=None
+)
+
+
+def set_deadline(seconds: float) -> float:
+    """
+    Give the current context a deadline, never later than one it already has
+    Args:
+        seconds: Budget from now
+    Returns:
+        The deadline now in effect, as a time.monotonic() value
+    """
+    deadline = cap_deadline(time.monotonic() + seconds)
+    request_deadline.set(deadline)
+    return deadline
+
+
+@contextmanager
+def deadline_scope(seconds: float) -> Iterator[float]:
+    """
+    Apply a deadline inside a with block, restoring the previous one after
+    Args:
+        seconds: Budget from now
+    Yields:
+        The deadline in effect inside the block
+    """
+    deadline = cap_deadline(time.monotonic() + seconds)
+    token = request_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        request_deadline.reset(token)
+
+
+def time_remaining() -> Optional[float]:
+    """Seconds left before the current deadline (may be negative), or None"""
+    deadline = request_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def cap_deadline(deadline: float) -> float:
+    """Bring a time.monotonic() deadline forward to the request deadline"""
+    current = request_deadline.get()
+    return deadline if current is None else min(deadline, current)
+
+
+def cap_timeout(timeout: float) -> float:
+    """Shorten a timeout in seconds to the time left before the deadline"""
+    remaining = time_remaining()
+    return timeout if remaining is None else max(0.0, min(timeout, remaining))
+
+
+def check_deadline(stage: str) -> None:
+    """
+    Fail fast before a stage if the request is already out of time
+    Args:
+        stage: Stage about to start, for the error and the metric
+    Raises:
+        DeadlineExceededError: If the deadline has passed
+    """
+    remaining = time_remaining()
+    if remaining is not None and remaining <= 0:
+        raise _exceeded(stage)
+
+
+async def with_deadline(awaitable: Awaitable[T], stage: str) -> T:
+    """
+    Await something within the time left, cancelling it when time runs out
+    Args:
+        awaitable: Coroutine or future to await
+        stage: Stage being awaited, for the error and the metric
+    Returns:
+        Result of awaitable
+    Raises:
+        DeadlineExceededError: If the deadline passed first
+    """
+    remaining = time_remaining()
+    if remaining is None:
+        return await awaitable
+    if remaining <= 0:
+        # Close the coroutine so it is not reported as never awaited
+        getattr(awaitable, "close", lambda: None)()
+        raise _exceeded(stage)
+    # Runs in the calling task, so it is cancelled where it is awaited
+    timeout = asyncio.timeout(remaining)
+    try:
+        async with timeout:
+            return await awaitable
+    except TimeoutError:
+        if not timeout.expired():
+            raise
+        raise _exceeded(stage) from None
+
+
+async def iter_with_deadline(
+    iterator: AsyncIterator[T], stage: str
+) -> AsyncIterator[T]:
+    """
+    Relay an async iterator, failing once the deadline passes between items
+    A read timeout alone cannot bound a stream that keeps trickling in.
+    Args:
+        iterator: Async iterator to relay, closed when relaying stops
+        stage: Stage being read, for the error and the metric
+    Yields:
+        Items of iterator
+    Raises:
+        DeadlineExceededError: If the deadline passed before the next item
+    """
+    try:
+        while True:
+            try:
+                item = await with_deadline(iterator.__anext__(), stage)
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+def _exceeded(stage: str) -> DeadlineExceededError:
+    deadline_exceeded.inc(stage=stage)
+    return DeadlineExceededError(f"Request deadline exceeded during {stage}")
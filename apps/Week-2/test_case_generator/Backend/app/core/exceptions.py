@@ -0,0 +1,37 @@
+"""
+Exceptions raised by the upstream request path
+"""
+
+from typing import Optional
+
+
+class UpstreamError(Exception):
+    """Raised when the upstream LLM call fails and should not be retried further"""
+
+    def __init__(
+        self,
+        message: str,
+        status_code: int = 502,
+        retry_after: Optional[float] = None,
+    ):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class UpstreamOverloadedError(UpstreamError):
+    """Raised when upstream capacity cannot be granted before the request deadline"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message, status_code=503, retry_after=retry_after)
+
+
+class DeadlineExceededError(UpstreamError):
+    """Raised when a request runs out of its end-to-end deadline"""
+
+    def __init__(self, message: str):
+        super().__init__(message, status_code=504)
+
+
+class TokenBudgetError(ValueError):
+    """Raised before any upstream call when a request cannot fit the model's limits"""
@@ -0,0 +1,313 @@
+"""
+In-process metrics exposed in the Prometheus text format
+"""
+
+import bisect
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+# Latency buckets in seconds, from sub-millisecond CPU stages to slow LLM calls
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Base class for a named metric family with optional labels"""
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """Monotonically increasing counter"""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in self._values.items()
+        ]
+
+
+class Histogram(Metric):
+    """Cumulative histogram of observed values"""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        counts = self._counts.get(key)
+        if counts is None:
+            counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+            self._sums[key] = 0.0
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        self._sums[key] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe the wall-clock duration of the enclosed block"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, counts in self._counts.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} "
+                    f"{cumulative}"
+                )
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(self._sums[key])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class CallbackMetric(Metric):
+    """Metric whose values are read from a callback at scrape time"""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        type_name: str,
+        callback: Callable[[], Dict[LabelValues, float]],
+        labelnames: Sequence[str] = (),
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.type_name = type_name
+        self.callback = callback
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in self.callback().items()
+        ]
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(
+        self,
+        name: str,
+        documentation: str,
+        type_name: str,
+        callback: Callable[[], Dict[LabelValues, float]],
+        labelnames: Sequence[str] = (),
+    ) -> CallbackMetric:
+        return self.register(
+            CallbackMetric(name, documentation, type_name, callback, labelnames)
+        )
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format
+        Returns:
+            Exposition text ending with a newline
+        """
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# Generation pipeline
+stage_duration = registry.histogram(
+    "testcase_stage_duration_seconds",
+    "Duration of each stage of test case generation",
+    ["stage"],
+)
+generation_duration = registry.histogram(
+    "testcase_generation_duration_seconds",
+    "End-to-end duration of uncached test case generation",
+    ["mode"],
+)
+llm_tokens = registry.counter(
+    "testcase_llm_tokens_total", "Tokens reported by the upstream usage", ["kind"]
+)
+parse_fallbacks = registry.counter(
+    "testcase_parse_fallbacks_total",
+    "Responses that only parsed after repair, by repair method",
+    ["method"],
+)
+completion_truncations = registry.counter(
+    "testcase_truncated_completions_total",
+    "Completions cut off at max_tokens, by how they were recovered",
+    ["outcome"],
+)
+duplicate_cases = registry.counter(
+    "testcase_duplicate_cases_total",
+    "Generated test cases dropped because their input repeated an earlier one",
+)
+invalid_cases = registry.counter(
+    "testcase_invalid_cases_total", "Generated test cases dropped by validation"
+)
+stress_inputs_generated = registry.counter(
+    "testcase_stress_inputs_total",
+    "Stress inputs generated from model specs, by how they were returned",
+    ["delivery"],
+)
+
+# Upstream client
+upstream_attempts = registry.counter(
+    "testcase_upstream_attempts_total",
+    "Upstream completion attempts by outcome",
+    ["outcome"],
+)
+upstream_queue_wait = registry.histogram(
+    "testcase_upstream_queue_wait_seconds",
+    "Time spent waiting for upstream rate-limit capacity",
+)
+backend_calls = registry.counter(
+    "testcase_backend_requests_total",
+    "Completions routed to each LLM backend, by outcome",
+    ["backend", "outcome"],
+)
+
+# Reference solution sandbox
+sandbox_duration = registry.histogram(
+    "testcase_sandbox_run_duration_seconds",
+    "Duration of one reference solution run in a worker",
+)
+verification_results = registry.counter(
+    "testcase_verifications_total",
+    "Test cases checked against a reference solution, by status",
+    ["status"],
+)
+
+# Job queue
+job_queue_wait = registry.histogram(
+    "testcase_job_queue_wait_seconds",
+    "Time a job waited in the queue before a worker started it",
+    buckets=(0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0),
+)
+
+# Request deadlines
+deadline_exceeded = registry.counter(
+    "testcase_deadline_exceeded_total",
+    "Requests that ran out of their deadline, by the stage that noticed",
+    ["stage"],
+)
+
+# HTTP layer
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds",
+    "HTTP request duration by route and status",
+    ["method", "route", "status"],
+)
+client_disconnects = registry.counter(
+    "http_client_disconnects_total",
+    "Requests abandoned by the client before the response finished, by route",
+    ["route"],
+)
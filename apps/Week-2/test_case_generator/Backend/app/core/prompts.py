@@ -1,33 +1,47 @@
-from typing import Optional
+import json
+from functools import lru_cache
+from typing import Any, Dict, Optional, Set
 
+from app.models.schemas import DifficultyLevel, StressSpecResponse, TestCaseResponse
 
-def get_testcase_generation_prompt(
-    problem_description: str,
-    difficulty: str,
-    problem_type: str,
-    num_cases: int,
-    constraints: Optional[str] = None,
-    include_edge_cases: bool = True,
-) -> str:
-    """
-    Generate a detailed prompt for OpenAI to create test cases
+# Fields filled in by the server, not the model
+SERVER_FIELDS = {
+    "generated_at",
+    "verification",
+    "verification_detail",
+    "stress_cases",
+    "reuse",
+}
 
-    Args:
-        problem_description: Description of the coding problem
-        difficulty: Problem difficulty (easy/medium/hard)
-        problem_type: Type of problem (array, string, tree, etc.)
-        num_cases: Number of test cases to generate
-        constraints: Optional constraints for the problem
-        include_edge_cases: Whether to include edge cases
+# JSON Schema keywords kept in the structured-output schema
+SCHEMA_KEYWORDS = {
+    "type",
+    "properties",
+    "items",
+    "anyOf",
+    "$ref",
+    "$defs",
+    "description",
+    "enum",
+}
 
-    Returns:
-        Formatted prompt string
-    """
 
-    # Build edge case instruction
-    edge_case_instruction = ""
-    if include_edge_cases:
-        edge_case_instruction = """
+SYSTEM_PROMPT = """You are an expert coding interview test case generator. You specialize in creating comprehensive, diverse, and well-explained test cases for algorithmic problems similar to those found on LeetCode, HackerRank, and other competitive programming platforms.
+
+Your test cases should:
+- Be clear and unambiguous
+- Cover various scenarios (basic, complex, edge cases)
+- Include helpful explanations
+- Follow proper formatting conventions
+- Always return valid JSON without any markdown formatting
+
+You have deep knowledge of:
+- Data structures (arrays, trees, graphs, linked lists, etc.)
+- Algorithms (sorting, searching, dynamic programming, etc.)
+- Edge cases and boundary conditions
+- Time and space complexity considerations"""
+
+EDGE_CASE_INSTRUCTION = """
 - Include edge cases such as:
   * Empty inputs (when applicable)
   * Single element inputs
@@ -38,34 +52,20 @@ def get_testcase_generation_prompt(
   * All same values
 - Include corner cases specific to the problem type"""
 
-    # Build constraints section
-    constraint_section = ""
-    if constraints:
-        constraint_section = f"""
-
-**Constraints:**
-{constraints}"""
-
-    # Difficulty-specific guidance
-    difficulty_guidance = {
-        "easy": "Focus on straightforward test cases that verify basic functionality. Include simple happy paths.",
-        "medium": "Include a mix of basic and complex scenarios. Test multiple edge cases and algorithmic correctness.",
-        "hard": "Create challenging test cases that stress-test the algorithm. Include maximum constraints and tricky edge cases.",
-    }
-
-    difficulty_note = difficulty_guidance.get(difficulty.lower(), "")
-
-    prompt = f"""You are an expert test case generator for coding interview problems, similar to LeetCode.
-
-**Problem Description:**
-{problem_description}
+# Difficulty-specific guidance
+DIFFICULTY_GUIDANCE = {
+    "easy": "Focus on straightforward test cases that verify basic functionality. Include simple happy paths.",
+    "medium": "Include a mix of basic and complex scenarios. Test multiple edge cases and algorithmic correctness.",
+    "hard": "Create challenging test cases that stress-test the algorithm. Include maximum constraints and tricky edge cases.",
+}
 
-**Problem Details:**
-- Difficulty Level: {difficulty.upper()}
-- Problem Type: {problem_type.replace('_', ' ').title()}{constraint_section}
+# Static instructions; everything that varies per request is in PROBLEM_TEMPLATE
+INSTRUCTIONS_TEMPLATE = """
 
 **Your Task:**
-Generate exactly {num_cases} diverse and comprehensive test cases for this problem.
+You will be given a coding problem. Generate the requested number of diverse and comprehensive test cases for it.
+
+**Difficulty Level:** {difficulty}
 
 **Requirements:**
 1. **Diversity**: Each test case should test different aspects of the problem
@@ -95,29 +95,267 @@ You MUST return ONLY a valid JSON object with this EXACT structure (no markdown,
 - Do NOT include ```json or ``` markers
 - Do NOT include any additional text before or after the JSON
 - Ensure all JSON is properly formatted and valid
-- Generate exactly {num_cases} test cases"""
+- Generate exactly the requested number of test cases"""
+
+PROBLEM_TEMPLATE = """**Problem Description:**
+{problem_description}
+
+**Problem Details:**
+- Problem Type: {problem_type}{constraint_section}
+
+Generate exactly {num_cases} test cases for this problem.{focus_section}"""
+
+# Focus of each shard when a large request is generated in parallel
+CATEGORY_FOCUS = {
+    "basic": "typical inputs that verify the main behaviour (happy paths and ordinary mixed scenarios)",
+    "edge": "edge cases such as empty or single-element inputs, duplicates, all-equal values and negative numbers",
+    "boundary": "boundary cases at the minimum and maximum of every constraint, including the largest allowed inputs",
+    "problem_specific": "tricky corner cases specific to this problem type that a plausible but wrong solution would fail",
+}
+
+STRESS_SYSTEM_PROMPT = """You design stress tests for coding problems. Instead of writing large inputs out, you describe each one as a generator spec that a program expands into an input at the maximum constraints.
 
-    return prompt
+Each stress case has:
+- params: the arguments in the order the function takes them, each with
+  * name: argument name as used in the problem (e.g. "nums")
+  * kind: "int" (one integer in [min_value, max_value]), "int_array" (length integers in [min_value, max_value]) or "string" (length characters from alphabet)
+  * length: number of elements or characters (1 for "int")
+  * min_value, max_value: integer value range (0 for strings)
+  * alphabet: characters a string is drawn from, or null for lowercase letters
+  * distribution: "uniform", "sorted", "reverse_sorted", "distinct" or "constant"
+- seed: any integer
+- explanation: what the input stresses (e.g. the worst case of a quadratic solution)
 
+**Rules:**
+- Use the largest sizes and value ranges the constraints allow, with at most {max_values} values per input in total
+- Make the stress cases differ in size, distribution or value range
+- Never write out input values
 
-def get_system_prompt() -> str:
+**Output Format:**
+Return ONLY a JSON object of the form {{"stress_cases": [...]}} with no markdown and no extra text."""
+
+STRESS_PROBLEM_TEMPLATE = """**Problem Description:**
+{problem_description}
+
+**Problem Details:**
+- Problem Type: {problem_type}{constraint_section}
+
+Describe exactly {num_cases} stress inputs for this problem."""
+
+
+@lru_cache()
+def get_system_prompt(
+    difficulty: str = "medium", include_edge_cases: bool = True
+) -> str:
     """
     Get the system prompt for OpenAI
+    Holds every static instruction, so it is a cacheable prompt prefix.
+
+    Args:
+        difficulty: Problem difficulty (easy/medium/hard)
+        include_edge_cases: Whether to include edge cases
 
     Returns:
         System prompt string
     """
-    return """You are an expert coding interview test case generator. You specialize in creating comprehensive, diverse, and well-explained test cases for algorithmic problems similar to those found on LeetCode, HackerRank, and other competitive programming platforms.
+    instructions = INSTRUCTIONS_TEMPLATE.format(
+        difficulty=difficulty.upper(),
+        edge_case_instruction=EDGE_CASE_INSTRUCTION if include_edge_cases else "",
+        difficulty_note=DIFFICULTY_GUIDANCE.get(difficulty.lower(), ""),
+    )
+    return SYSTEM_PROMPT + instructions
 
-Your test cases should:
-- Be clear and unambiguous
-- Cover various scenarios (basic, complex, edge cases)
-- Include helpful explanations
-- Follow proper formatting conventions
-- Always return valid JSON without any markdown formatting
 
-You have deep knowledge of:
-- Data structures (arrays, trees, graphs, linked lists, etc.)
-- Algorithms (sorting, searching, dynamic programming, etc.)
-- Edge cases and boundary conditions
-- Time and space complexity considerations"""
+def get_testcase_generation_prompt(
+    problem_description: str,
+    problem_type: str,
+    num_cases: int,
+    constraints: Optional[str] = None,
+    category: Optional[str] = None,
+) -> str:
+    """
+    Generate the per-request part of the prompt, sent after the system prompt
+
+    Args:
+        problem_description: Description of the coding problem
+        problem_type: Type of problem (array, string, tree, etc.)
+        num_cases: Number of test cases to generate
+        constraints: Optional constraints for the problem
+        category: Optional kind of test case to focus on (see CATEGORY_FOCUS)
+
+    Returns:
+        Formatted prompt string
+    """
+    constraint_section = ""
+    if constraints:
+        constraint_section = f"\n\n**Constraints:**\n{constraints}"
+
+    focus_section = ""
+    if category:
+        focus_section = f"\nFocus only on {CATEGORY_FOCUS[category]}."
+
+    return PROBLEM_TEMPLATE.format(
+        problem_description=problem_description,
+        problem_type=problem_type.replace("_", " ").title(),
+        constraint_section=constraint_section,
+        num_cases=num_cases,
+        focus_section=focus_section,
+    )
+
+
+@lru_cache()
+def get_stress_system_prompt(max_values: int) -> str:
+    """
+    Get the system prompt for stress input specs
+    Args:
+        max_values: Largest number of values one generated input may hold
+    Returns:
+        System prompt string
+    """
+    return STRESS_SYSTEM_PROMPT.format(max_values=f"{max_values:,}")
+
+
+def get_stress_prompt(
+    problem_description: str,
+    problem_type: str,
+    num_cases: int,
+    constraints: Optional[str] = None,
+) -> str:
+    """
+    Generate the per-request prompt for stress input specs
+    Args:
+        problem_description: Description of the coding problem
+        problem_type: Type of problem (array, string, tree, etc.)
+        num_cases: Number of stress inputs to describe
+        constraints: Optional constraints for the problem
+    Returns:
+        Formatted prompt string
+    """
+    constraint_section = ""
+    if constraints:
+        constraint_section = f"\n\n**Constraints:**\n{constraints}"
+
+    return STRESS_PROBLEM_TEMPLATE.format(
+        problem_description=problem_description,
+        problem_type=problem_type.replace("_", " ").title(),
+        constraint_section=constraint_section,
+        num_cases=num_cases,
+    )
+
+
+@lru_cache()
+def get_response_format() -> Dict[str, Any]:
+    """
+    Get the strict structured-output format built from TestCaseResponse
+
+    Returns:
+        response_format argument for chat.completions.create
+    """
+    return _json_schema_format(
+        "test_case_response", TestCaseResponse.model_json_schema(), SERVER_FIELDS
+    )
+
+
+@lru_cache()
+def get_stress_response_format() -> Dict[str, Any]:
+    """
+    Get the structured-output response format for stress input specs
+    Returns:
+        response_format argument for chat.completions.create
+    """
+    return _json_schema_format(
+        "stress_input_specs", StressSpecResponse.model_json_schema(), set()
+    )
+
+
+def precompute_prompts(max_stress_values: int) -> None:
+    """
+    Build every cached prompt and response format ahead of the first request
+    Args:
+        max_stress_values: Value limit the stress system prompt is built for
+    """
+    for difficulty in DifficultyLevel:
+        for include_edge_cases in (True, False):
+            # Same keyword form as the service, since lru_cache keys on it
+            get_system_prompt(
+                difficulty=difficulty.value, include_edge_cases=include_edge_cases
+            )
+    get_response_format()
+    get_stress_response_format()
+    get_stress_system_prompt(max_stress_values)
+
+
+def _json_schema_format(
+    name: str, schema: Dict[str, Any], server_fields: Set[str]
+) -> Dict[str, Any]:
+    """
+    Build a strict json_schema response format from a pydantic schema
+    Args:
+        name: Schema name sent to the provider
+        schema: Output of model_json_schema()
+        server_fields: Properties filled in by the server, removed from the schema
+    Returns:
+        response_format argument for chat.completions.create
+    """
+    for node in [schema, *schema.get("$defs", {}).values()]:
+        for field in server_fields:
+            node.get("properties", {}).pop(field, None)
+
+    # Drop definitions only the server fields used (e.g. their enums)
+    definitions = schema.get("$defs", {})
+    reachable: Set[str] = set()
+    pending = [schema["properties"]]
+    while pending:
+        text = json.dumps(pending.pop())
+        for def_name, node in definitions.items():
+            if def_name not in reachable and f'"#/$defs/{def_name}"' in text:
+                reachable.add(def_name)
+                pending.append(node)
+    schema["$defs"] = {
+        def_name: node
+        for def_name, node in definitions.items()
+        if def_name in reachable
+    }
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": name,
+            "strict": True,
+            "schema": _strict_schema(schema),
+        },
+    }
+
+
+def _strict_schema(node: Any) -> Any:
+    """
+    Reduce a pydantic JSON schema to what strict structured output accepts
+    Every object requires all of its properties and forbids any others, and a
+    $ref is left on its own, since strict mode rejects keywords next to it.
+
+    Args:
+        node: Schema node produced by model_json_schema()
+
+    Returns:
+        Cleaned copy of the node
+    """
+    if isinstance(node, list):
+        return [_strict_schema(item) for item in node]
+    if not isinstance(node, dict):
+        return node
+
+    if "$ref" in node:
+        return {"$ref": node["$ref"]}
+
+    cleaned = {}
+    for key, value in node.items():
+        if key not in SCHEMA_KEYWORDS:
+            continue
+        if key in ("properties", "$defs"):
+            cleaned[key] = {name: _strict_schema(sub) for name, sub in value.items()}
+        else:
+            cleaned[key] = _strict_schema(value)
+
+    if cleaned.get("type") == "object" and "properties" in cleaned:
+        cleaned["required"] = list(cleaned["properties"])
+        cleaned["additionalProperties"] = False
+    return cleaned
@@ -0,0 +1,298 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from collections import deque
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Deque, Dict, List, Optional, Tuple
+
+from app.config import get_settings
+from app.core.deadline import cap_deadline, check_deadline
+from app.core.exceptions import UpstreamOverloadedError
+from app.core.metrics import registry, upstream_queue_wait
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+
+class Priority(IntEnum):
+    """Scheduling priority for upstream calls (lower runs first)"""
+
+    INTERACTIVE = 0
+    BATCH = 10
+
+
+# Priority of upstream calls made from the current task; batch work lowers it
+upstream_priority: ContextVar[int] = ContextVar(
+    "upstream_priority", default=Priority.INTERACTIVE
+)
+
+
+class Grant:
+    """Capacity granted to one upstream call inside the rate window"""
+
+    __slots__ = ("timestamp", "tokens", "_scheduler")
+
+    def __init__(self, timestamp: float, tokens: int, scheduler: "UpstreamScheduler"):
+        self.timestamp = timestamp
+        self.tokens = tokens
+        self._scheduler = scheduler
+
+    def reconcile(self, actual_tokens: Optional[int]) -> None:
+        """
+        Replace the estimated token cost with the real usage
+        Args:
+            actual_tokens: total_tokens reported by the API, if any
+        """
+        if actual_tokens is None or self._scheduler is None:
+            return
+        self._scheduler._reconcile(self, actual_tokens)
+
+
+class _Waiter:
+    __slots__ = ("tokens", "future")
+
+    def __init__(self, tokens: int, future: asyncio.Future):
+        self.tokens = tokens
+        self.future = future
+
+
+class UpstreamScheduler:
+    """
+    Admission control for upstream LLM calls
+
+    Enforces request and token budgets over a sliding window, per worker.
+    Calls that do not fit queue by priority; calls that cannot be admitted
+    before their deadline are rejected with UpstreamOverloadedError.
+    """
+
+    def __init__(
+        self,
+        enabled: bool,
+        max_requests: int,
+        max_tokens: int,
+        period: float,
+        max_queue: int,
+        max_wait: float,
+    ):
+        self.enabled = enabled
+        self.max_requests = max_requests
+        self.max_tokens = max_tokens
+        self.period = period
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+
+        self._window: Deque[Grant] = deque()
+        self._window_tokens = 0
+        self._queue: List[Tuple[int, int, _Waiter]] = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+        self.admitted = 0
+        self.queued = 0
+        self.shed = 0
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of calls currently waiting for capacity"""
+        return sum(1 for _, _, waiter in self._queue if not waiter.future.done())
+
+    async def acquire(
+        self,
+        estimated_tokens: int,
+        priority: Optional[int] = None,
+        deadline: Optional[float] = None,
+    ) -> Grant:
+        """
+        Wait for capacity for one upstream call
+        Args:
+            estimated_tokens: Prompt tokens plus max_tokens for the call
+            priority: Scheduling priority; defaults to the task's upstream_priority
+            deadline: time.monotonic() by which the call must be admitted
+        Returns:
+            Grant to reconcile with the actual usage
+        Raises:
+            UpstreamOverloadedError: If the call cannot be admitted in time
+            DeadlineExceededError: If the request deadline passed while queued
+        """
+        now = time.monotonic()
+        if not self.enabled:
+            return Grant(now, estimated_tokens, None)
+
+        if priority is None:
+            priority = upstream_priority.get()
+        if deadline is None:
+            deadline = cap_deadline(now + self.max_wait)
+
+        self._expire(now)
+        if not self._queue and self._has_capacity(estimated_tokens):
+            return self._admit(estimated_tokens, now)
+
+        if self.queue_depth >= self.max_queue:
+            self._reject(
+                "Upstream queue is full", self._estimate_wait(1, estimated_tokens, now)
+            )
+
+        ahead = [w for p, _, w in self._queue if p <= priority and not w.future.done()]
+        wait = self._estimate_wait(
+            len(ahead) + 1, sum(w.tokens for w in ahead) + estimated_tokens, now
+        )
+        if now + wait > deadline:
+            self._reject("Upstream rate limit reached", wait)
+
+        waiter = _Waiter(estimated_tokens, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._queue, (priority, next(self._seq), waiter))
+        self.queued += 1
+        self._pump()
+
+        try:
+            grant = await asyncio.wait_for(waiter.future, timeout=deadline - now)
+            upstream_queue_wait.observe(time.monotonic() - now)
+            return grant
+        except asyncio.TimeoutError:
+            check_deadline("upstream_queue")
+            self._reject(
+                "Timed out waiting for upstream capacity",
+                self._estimate_wait(1, estimated_tokens, time.monotonic()),
+            )
+        finally:
+            if not waiter.future.done():
+                waiter.future.cancel()
+            self._pump()
+
+    def stats(self) -> Dict[str, object]:
+        """
+        Get scheduler counters and current window usage
+        Returns:
+            Dictionary of scheduler statistics
+        """
+        self._expire(time.monotonic())
+        return {
+            "enabled": self.enabled,
+            "queue_depth": self.queue_depth,
+            "window_requests": len(self._window),
+            "window_tokens": self._window_tokens,
+            "max_requests": self.max_requests,
+            "max_tokens": self.max_tokens,
+            "period_seconds": self.period,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "shed": self.shed,
+        }
+
+    def _reject(self, reason: str, retry_after: float) -> None:
+        self.shed += 1
+        logger.warning("%s; shedding request (retry after %.1fs)", reason, retry_after)
+        raise UpstreamOverloadedError(reason, retry_after=retry_after)
+
+    def _has_capacity(self, tokens: int) -> bool:
+        if len(self._window) >= self.max_requests:
+            return False
+        # A single call larger than the whole budget may run on an empty window
+        return not self._window or self._window_tokens + tokens <= self.max_tokens
+
+    def _admit(self, tokens: int, now: float) -> Grant:
+        grant = Grant(now, tokens, self)
+        self._window.append(grant)
+        self._window_tokens += tokens
+        self.admitted += 1
+        return grant
+
+    def _expire(self, now: float) -> None:
+        horizon = now - self.period
+        while self._window and self._window[0].timestamp <= horizon:
+            self._window_tokens -= self._window.popleft().tokens
+
+    def _reconcile(self, grant: Grant, actual_tokens: int) -> None:
+        if grant in self._window:
+            self._window_tokens += actual_tokens - grant.tokens
+        grant.tokens = actual_tokens
+        self._pump()
+
+    def _estimate_wait(self, requests: int, tokens: int, now: float) -> float:
+        """Seconds until the window can absorb this many more requests and tokens"""
+        wait = 0.0
+
+        excess_requests = len(self._window) + requests - self.max_requests
+        if excess_requests > 0:
+            wait = max(wait, self._time_to_free(excess_requests, None, now))
+
+        excess_tokens = self._window_tokens + tokens - self.max_tokens
+        if excess_tokens > 0:
+            wait = max(wait, self._time_to_free(None, excess_tokens, now))
+
+        return wait
+
+    def _time_to_free(
+        self, requests: Optional[int], tokens: Optional[int], now: float
+    ) -> float:
+        freed_requests = 0
+        freed_tokens = 0
+        for grant in self._window:
+            freed_requests += 1
+            freed_tokens += grant.tokens
+            if (requests is not None and freed_requests >= requests) or (
+                tokens is not None and freed_tokens >= tokens
+            ):
+                return max(0.0, grant.timestamp + self.period - now)
+
+        # More than the current window must drain: extrapolate whole periods
+        if requests is not None:
+            backlog = (requests - freed_requests) / self.max_requests
+        else:
+            backlog = (tokens - freed_tokens) / self.max_tokens
+        return self.period * (1 + math.ceil(backlog))
+
+    def _pump(self) -> None:
+        """Admit queued calls in priority order while capacity allows"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        now = time.monotonic()
+        self._expire(now)
+
+        while self._queue:
+            waiter = self._queue[0][2]
+            if waiter.future.done():
+                heapq.heappop(self._queue)
+                continue
+            if not self._has_capacity(waiter.tokens):
+                delay = self._estimate_wait(1, waiter.tokens, now)
+                self._timer = asyncio.get_running_loop().call_later(
+                    max(delay, 0.01), self._pump
+                )
+                return
+            heapq.heappop(self._queue)
+            waiter.future.set_result(self._admit(waiter.tokens, now))
+
+
+upstream_scheduler = UpstreamScheduler(
+    enabled=settings.rate_limit_enabled,
+    max_requests=settings.rate_limit_requests,
+    max_tokens=settings.rate_limit_tokens,
+    period=settings.rate_limit_period,
+    max_queue=settings.rate_limit_max_queue,
+    max_wait=settings.rate_limit_max_wait,
+)
+
+registry.callback(
+    "testcase_upstream_admissions_total",
+    "Upstream calls admitted immediately or after queueing, and calls shed",
+    "counter",
+    lambda: {
+        ("admitted",): upstream_scheduler.admitted,
+        ("queued",): upstream_scheduler.queued,
+        ("shed",): upstream_scheduler.shed,
+    },
+    ["result"],
+)
+registry.callback(
+    "testcase_upstream_queue_depth",
+    "Upstream calls waiting for rate-limit capacity",
+    "gauge",
+    lambda: {(): upstream_scheduler.queue_depth},
+)
@@ -0,0 +1,212 @@
+"""
+Token accounting and completion budgets for upstream calls
+"""
+
+import math
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from app.config import get_settings
+from app.core.exceptions import TokenBudgetError
+from app.core.metrics import registry
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+# Chat formatting overhead per message and for priming the reply
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+
+# Completion tokens per test case before anything has been observed
+DEFAULT_TOKENS_PER_CASE = {"easy": 60.0, "medium": 80.0, "hard": 110.0}
+
+# Tokens outside the test cases: braces, keys and the problem summary
+RESPONSE_OVERHEAD_TOKENS = 60
+
+
+@dataclass
+class TokenPlan:
+    """How a generation request is spent upstream"""
+
+    prompt_tokens: int
+    max_tokens: int  # completion limit for each call
+    shards: List[int]  # test cases per upstream call
+
+    @property
+    def is_split(self) -> bool:
+        return len(self.shards) > 1
+
+
+class TokenBudget:
+    """
+    Count prompt tokens and size completion limits
+    Counts are estimated from the text length until load() has run.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        context_window: int,
+        max_output_tokens: int,
+        headroom: float = 1.5,
+        ewma_alpha: float = 0.2,
+    ):
+        self.model = model
+        self.context_window = context_window
+        self.max_output_tokens = max_output_tokens
+        self.headroom = headroom
+        self.ewma_alpha = ewma_alpha
+
+        self._encoding: Any = None
+        self._load_lock = threading.Lock()
+        self._loaded = False
+        self._tokens_per_case: Dict[str, float] = dict(DEFAULT_TOKENS_PER_CASE)
+
+    @property
+    def exact(self) -> bool:
+        """Whether counts come from tiktoken rather than the estimate"""
+        return self._encoding is not None
+
+    def load(self) -> None:
+        """Load the tiktoken encoding for the model; safe to call more than once"""
+        with self._load_lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            try:
+                import tiktoken
+
+                try:
+                    self._encoding = tiktoken.encoding_for_model(self.model)
+                except KeyError:
+                    self._encoding = tiktoken.get_encoding("o200k_base")
+                logger.info("Loaded tiktoken encoding %s", self._encoding.name)
+            except Exception as e:
+                logger.warning(
+                    "tiktoken encoding unavailable (%s), estimating token counts", e
+                )
+
+    def count_text(self, text: str) -> int:
+        """
+        Count the tokens in a piece of text
+        Args:
+            text: Text to count
+        Returns:
+            Token count (estimated at 4 characters per token without tiktoken)
+        """
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return math.ceil(len(text) / 4)
+
+    def count_messages(self, messages: List[Dict[str, str]]) -> int:
+        """
+        Count the prompt tokens of a chat request
+        Args:
+            messages: Chat messages to send
+        Returns:
+            Prompt token count including chat formatting overhead
+        """
+        tokens = TOKENS_PER_REPLY
+        for message in messages:
+            tokens += TOKENS_PER_MESSAGE + self.count_text(message["content"])
+        return tokens
+
+    def tokens_per_case(self, difficulty: str) -> float:
+        """Current estimate of completion tokens for one test case"""
+        return self._tokens_per_case.get(difficulty, DEFAULT_TOKENS_PER_CASE["medium"])
+
+    def completion_budget(self, num_cases: int, difficulty: str) -> int:
+        """
+        Size the completion limit for a number of test cases
+        Args:
+            num_cases: Test cases requested from one call
+            difficulty: Problem difficulty
+        Returns:
+            max_tokens with headroom, capped at the model's output limit
+        """
+        estimate = num_cases * self.tokens_per_case(difficulty) * self.headroom
+        return min(
+            self.max_output_tokens, RESPONSE_OVERHEAD_TOKENS + math.ceil(estimate)
+        )
+
+    def plan(
+        self, messages: List[Dict[str, str]], num_cases: int, difficulty: str
+    ) -> TokenPlan:
+        """
+        Decide the completion limit and how many calls a request needs
+        Args:
+            messages: Chat messages for the full request
+            num_cases: Test cases requested
+            difficulty: Problem difficulty
+        Returns:
+            TokenPlan with the prompt size, max_tokens and per-call case counts
+        Raises:
+            TokenBudgetError: If the prompt leaves no room for even one test case
+        """
+        prompt_tokens = self.count_messages(messages)
+        one_case = self.completion_budget(1, difficulty)
+        if prompt_tokens + one_case > self.context_window:
+            raise TokenBudgetError(
+                f"Prompt is too long: {prompt_tokens} tokens leaves no room for "
+                f"output in the {self.context_window}-token context window"
+            )
+
+        # Output room per call is bounded by both the model and the context
+        room = min(self.max_output_tokens, self.context_window - prompt_tokens)
+        per_case = self.tokens_per_case(difficulty) * self.headroom
+        cases_per_call = max(1, int((room - RESPONSE_OVERHEAD_TOKENS) // per_case))
+
+        shards = []
+        remaining = num_cases
+        while remaining > 0:
+            shards.append(min(cases_per_call, remaining))
+            remaining -= shards[-1]
+
+        # Spread cases evenly so no call is much larger than the others
+        if len(shards) > 1:
+            base, extra = divmod(num_cases, len(shards))
+            shards = [base + (1 if i < extra else 0) for i in range(len(shards))]
+
+        return TokenPlan(
+            prompt_tokens=prompt_tokens,
+            max_tokens=min(room, self.completion_budget(max(shards), difficulty)),
+            shards=shards,
+        )
+
+    def observe(self, difficulty: str, num_cases: int, completion_tokens: int) -> None:
+        """
+        Update the per-case estimate from a completed generation
+        Args:
+            difficulty: Problem difficulty
+            num_cases: Test cases in the completion
+            completion_tokens: Completion tokens the call used
+        """
+        if num_cases <= 0 or completion_tokens <= 0:
+            return
+        sample = max(1.0, (completion_tokens - RESPONSE_OVERHEAD_TOKENS) / num_cases)
+        current = self.tokens_per_case(difficulty)
+        self._tokens_per_case[difficulty] = (
+            1 - self.ewma_alpha
+        ) * current + self.ewma_alpha * sample
+
+
+token_budget = TokenBudget(
+    model=settings.openai_model,
+    context_window=settings.model_context_window,
+    max_output_tokens=settings.model_max_output_tokens,
+    headroom=settings.token_budget_headroom,
+    ewma_alpha=settings.token_budget_ewma_alpha,
+)
+
+registry.callback(
+    "testcase_tokens_per_case",
+    "Running estimate of completion tokens per generated test case",
+    "gauge",
+    lambda: {
+        (difficulty,): round(token_budget.tokens_per_case(difficulty), 2)
+        for difficulty in DEFAULT_TOKENS_PER_CASE
+    },
+    ["difficulty"],
+)
@@ -1,92 +1,124 @@
-from fastapi import FastAPI, Request
+"""
+FastAPI application factory; clients and log handlers start in the lifespan
+
+Run with either of:
+    uvicorn app.main:app
+    uvicorn --factory app.main:create_app
+"""
+
+from fastapi import APIRouter, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager
+import asyncio
+import importlib.util
 import time
 
 from app.config import get_settings
+from app.api.middleware import CompressionMiddleware, RequestContextMiddleware
+from app.api.responses import ModelJSONResponse
 from app.api.routes import testcase
-from app.utils.logger import get_logger
+from app.core.metrics import registry
+from app.core.backends.router import get_llm_router
+from app.core.prompts import precompute_prompts
+from app.core.tokens import token_budget
+from app.services.cache import response_cache
+from app.services.jobs import job_queue
+from app.services.reuse import semantic_store
+from app.services.sandbox import sandbox
+from app.utils.logger import get_logger, setup_logging, shutdown_logging
 
 logger = get_logger(__name__)
 settings = get_settings()
 
+# Packages in Requirements.txt that the code can run without, and what it
+# falls back to when one is missing
+OPTIONAL_PACKAGES = {
+    "h2": "HTTP/1.1 is used for the OpenAI API even with openai_http2 enabled",
+    "orjson": "model output is parsed and dict responses encoded with json",
+    "numpy": "stress inputs and reuse similarity are computed in pure Python",
+    "brotli": "responses are compressed with gzip only",
+}
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    logger.info(f"Starting {settings.project_name} v{settings.version}")
-    logger.info(f"Environment: {settings.environment}")
-    logger.info(f"OpenAI Model: {settings.openai_model}")
+    setup_logging()
+    started = time.perf_counter()
+    logger.info("Starting %s v%s", settings.project_name, settings.version)
+    logger.info("Environment: %s", settings.environment)
+    logger.info("OpenAI Model: %s", settings.openai_model)
+    logger.info("LLM backends: %s", ", ".join(settings.llm_backends))
+    log_missing_packages()
+
+    llm_router = get_llm_router()
+    await llm_router.startup()
+    # tiktoken may fetch its encoding on first load; keep that off the loop
+    await asyncio.to_thread(token_budget.load)
+    if settings.sandbox_enabled:
+        await asyncio.to_thread(sandbox.start)
+    if settings.reuse_enabled:
+        await semantic_store.startup()
+    if settings.warmup_enabled:
+        await warm_up()
+    # Workers may claim a job at once, so they start after the warm-up
+    if settings.jobs_enabled:
+        await job_queue.start()
+    logger.info("Startup finished in %.3fs", time.perf_counter() - started)
 
     yield
 
     # Shutdown
-    logger.info(f"Shutting down {settings.project_name}")
-
-
-# Create FastAPI app
-app = FastAPI(
-    title=settings.project_name,
-    description=settings.description,
-    version=settings.version,
-    lifespan=lifespan,
-    docs_url="/docs",
-    redoc_url="/redoc",
-    openapi_url="/openapi.json",
-)
-
-
-# Add CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=settings.cors_origins,
-    allow_credentials=settings.cors_allow_credentials,
-    allow_methods=settings.cors_allow_methods,
-    allow_headers=settings.cors_allow_headers,
-)
-
-
-# Request logging middleware
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    start_time = time.time()
-    logger.info(f"Incoming request: {request.method} {request.url.path}")
-
-    response = await call_next(request)
-
-    process_time = time.time() - start_time
-    logger.info(
-        f"Completed {request.method} {request.url.path} - "
-        f"Status: {response.status_code} - "
-        f"Time: {process_time:.3f}s"
-    )
-
-    response.headers["X-Process-Time"] = str(process_time)
-
-    return response
+    logger.info("Shutting down %s", settings.project_name)
+    # Running jobs go back to the queue before the clients they use close
+    await job_queue.stop()
+    await llm_router.aclose()
+    response_cache.close()
+    sandbox.close()
+    await semantic_store.aclose()
+    shutdown_logging()
+
+
+def log_missing_packages() -> None:
+    """Warn once about every optional package whose fallback is in use"""
+    for package, fallback in OPTIONAL_PACKAGES.items():
+        if importlib.util.find_spec(package) is None:
+            logger.warning(
+                "Optional package '%s' is not installed: %s", package, fallback
+            )
+
+
+async def warm_up() -> None:
+    """
+    Do the work that would otherwise slow down the first requests
+    Connects to every LLM backend, builds the cached prompts and response
+    formats and opens the cache database. A failing backend is only logged.
+    """
+    started = time.perf_counter()
+    precompute_prompts(settings.stress_max_values)
+    await asyncio.to_thread(response_cache.open)
+    await get_llm_router().warm_up(settings.warmup_timeout)
+    logger.info("Warm-up finished in %.3fs", time.perf_counter() - started)
 
 
 # Global exception handler
-@app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     """
     Handle uncaught exceptions
+    The traceback is logged by RequestContextMiddleware, with the request id.
     """
-    logger.error(f"Unhandled exception: {str(exc)}", exc_info=True)
-
     return JSONResponse(
         status_code=500,
         content={"detail": "Internal server error", "error_type": type(exc).__name__},
     )
 
 
-# Include routers
-app.include_router(testcase.router, prefix=settings.api_v1_prefix)
+root_router = APIRouter(tags=["root"])
 
 
 # Root endpoint
-@app.get("/", tags=["root"], summary="Root Endpoint", description="Get API information")
+@root_router.get("/", summary="Root Endpoint", description="Get API information")
 async def root():
     """
     Root endpoint returning API information
@@ -100,8 +132,23 @@ async def root():
     }
 
 
+# Prometheus metrics
+@root_router.get(
+    "/metrics",
+    summary="Prometheus Metrics",
+    response_class=PlainTextResponse,
+)
+async def metrics():
+    """
+    Expose pipeline, cache, queue and HTTP metrics in Prometheus text format
+    """
+    return PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 # Health check at root level
-@app.get("/health", tags=["root"], summary="Global Health Check")
+@root_router.get("/health", summary="Global Health Check")
 async def global_health():
     """
     Global health check endpoint
@@ -113,11 +160,61 @@ async def global_health():
     }
 
 
+def create_app() -> FastAPI:
+    """
+    Build the FastAPI application
+    Returns:
+        App with middleware, exception handler and routes registered; its
+        lifespan starts the upstream clients, caches and log handlers
+    """
+    app = FastAPI(
+        title=settings.project_name,
+        description=settings.description,
+        version=settings.version,
+        lifespan=lifespan,
+        docs_url="/docs",
+        redoc_url="/redoc",
+        openapi_url="/openapi.json",
+        default_response_class=ModelJSONResponse,
+    )
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=settings.cors_origins,
+        allow_credentials=settings.cors_allow_credentials,
+        allow_methods=settings.cors_allow_methods,
+        allow_headers=settings.cors_allow_headers,
+    )
+    if settings.compression_enabled:
+        app.add_middleware(
+            CompressionMiddleware,
+            minimum_size=settings.compression_min_size,
+            gzip_level=settings.compression_gzip_level,
+            brotli_quality=settings.compression_brotli_quality,
+        )
+    # Added last, so it is the outermost and times the others
+    app.add_middleware(
+        RequestContextMiddleware,
+        header_name=settings.request_id_header,
+        sample_rate=settings.access_log_sample_rate,
+        slow_seconds=settings.access_log_slow_seconds,
+    )
+    app.add_exception_handler(Exception, global_exception_handler)
+
+    app.include_router(testcase.router, prefix=settings.api_v1_prefix)
+    app.include_router(root_router)
+    return app
+
+
+app = create_app()
+
+
 if __name__ == "__main__":
     import uvicorn
 
     uvicorn.run(
-        "app.main:app",
+        "app.main:create_app",
+        factory=True,
         host="0.0.0.0",
         port=8000,
         reload=settings.debug,
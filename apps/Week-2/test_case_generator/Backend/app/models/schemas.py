@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, field_validator, model_validator
 from typing import List, Optional
 from datetime import datetime
 from enum import Enum
@@ -35,6 +35,66 @@ class ProblemType(str, Enum):
     BIT_MANIPULATION = "bit_manipulation"
 
 
+class TestCaseCategory(str, Enum):
+    """Kinds of test cases a sharded generation request is split into"""
+
+    BASIC = "basic"
+    EDGE = "edge"
+    BOUNDARY = "boundary"
+    PROBLEM_SPECIFIC = "problem_specific"
+
+
+class VerificationMode(str, Enum):
+    """What to do with test cases whose expected output the reference solution disputes"""
+
+    FLAG = "flag"  # keep the model's expected output and mark the case
+    CORRECT = "correct"  # replace expected output with the solution's output
+
+
+class VerificationStatus(str, Enum):
+    """Result of checking a test case against the reference solution"""
+
+    PASSED = "passed"
+    MISMATCH = "mismatch"
+    CORRECTED = "corrected"
+    ERROR = "error"
+
+
+class StressValueKind(str, Enum):
+    """Kinds of value a stress input generator can produce"""
+
+    INT = "int"
+    INT_ARRAY = "int_array"
+    STRING = "string"
+
+
+class StressDistribution(str, Enum):
+    """How the values of a generated array or string are arranged"""
+
+    UNIFORM = "uniform"
+    SORTED = "sorted"
+    REVERSE_SORTED = "reverse_sorted"
+    DISTINCT = "distinct"
+    CONSTANT = "constant"
+
+
+class CacheMode(str, Enum):
+    """How a generation request interacts with the response cache"""
+
+    USE = "use"  # serve from cache when possible, store fresh results
+    BYPASS = "bypass"  # skip the cache entirely
+    REFRESH = "refresh"  # always regenerate, then overwrite the cached entry
+
+
+class JobStatus(str, Enum):
+    """Lifecycle of an asynchronous generation job"""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
 class TestCaseRequest(BaseModel):
     """Request model for test case generation"""
 
@@ -59,6 +119,26 @@ class TestCaseRequest(BaseModel):
     include_edge_cases: bool = Field(
         default=True, description="Whether to include edge cases in test generation"
     )
+    reference_solution: Optional[str] = Field(
+        default=None,
+        max_length=20000,
+        description="Optional Python solution used to verify expected outputs",
+    )
+    entry_point: Optional[str] = Field(
+        default=None,
+        max_length=100,
+        description="Function or Solution method to call (detected when omitted)",
+    )
+    verification_mode: VerificationMode = Field(
+        default=VerificationMode.FLAG,
+        description="Flag or correct test cases the reference solution disagrees with",
+    )
+    stress_cases: int = Field(
+        default=0,
+        ge=0,
+        le=5,
+        description="Number of maximum-constraint inputs to generate on the server",
+    )
 
     @field_validator("problem_description")
     @classmethod
@@ -101,6 +181,13 @@ class TestCase(BaseModel):
     explanation: Optional[str] = Field(
         default=None, description="Explanation of what this test case validates"
     )
+    verification: Optional[VerificationStatus] = Field(
+        default=None, description="Result of the reference solution check, if any"
+    )
+    verification_detail: Optional[str] = Field(
+        default=None,
+        description="Reference solution output on a mismatch, or the error message",
+    )
 
     class Config:
         json_schema_extra = {
@@ -112,6 +199,111 @@ class TestCase(BaseModel):
         }
 
 
+class StressParam(BaseModel):
+    """One argument of a generated stress input"""
+
+    name: str = Field(
+        ..., min_length=1, max_length=64, description="Argument name, e.g. 'nums'"
+    )
+    kind: StressValueKind = Field(..., description="Kind of value")
+    length: int = Field(
+        default=1,
+        ge=0,
+        description="Elements of an int_array or characters of a string",
+    )
+    min_value: int = Field(
+        default=0, ge=-(10**18), le=10**18, description="Smallest integer value"
+    )
+    max_value: int = Field(
+        default=0, ge=-(10**18), le=10**18, description="Largest integer value"
+    )
+    alphabet: Optional[str] = Field(
+        default=None,
+        max_length=256,
+        description="Characters a string is drawn from (lowercase letters if null)",
+    )
+    distribution: StressDistribution = Field(
+        default=StressDistribution.UNIFORM,
+        description="Arrangement of array elements or string characters",
+    )
+
+    @model_validator(mode="after")
+    def validate_ranges(self) -> "StressParam":
+        """Check that the value range and distribution can be satisfied"""
+        if self.min_value > self.max_value:
+            raise ValueError(f"{self.name}: min_value is greater than max_value")
+        if self.alphabet == "":
+            raise ValueError(f"{self.name}: alphabet cannot be empty")
+        if self.distribution == StressDistribution.DISTINCT:
+            if self.kind == StressValueKind.STRING:
+                available = len(set(self.alphabet or "abcdefghijklmnopqrstuvwxyz"))
+            else:
+                available = self.max_value - self.min_value + 1
+            if self.length > available:
+                raise ValueError(
+                    f"{self.name}: {self.length} distinct values requested "
+                    f"but only {available} exist"
+                )
+        return self
+
+
+class StressSpec(BaseModel):
+    """Compact description of a large input, materialized on the server"""
+
+    params: List[StressParam] = Field(
+        ..., min_length=1, max_length=8, description="Arguments in call order"
+    )
+    seed: int = Field(
+        ..., ge=0, lt=2**63, description="Random seed, so the input is reproducible"
+    )
+    explanation: Optional[str] = Field(
+        default=None, description="What this stress input exercises"
+    )
+
+
+class StressSpecResponse(BaseModel):
+    """Generator specs returned by the model for stress inputs"""
+
+    stress_cases: List[StressSpec] = Field(..., description="Stress input specs")
+
+
+class StressCase(BaseModel):
+    """Stress input generated on the server from a StressSpec"""
+
+    generator: StressSpec = Field(..., description="Spec the input was generated from")
+    input: Optional[str] = Field(
+        default=None, description="Input text, when small enough to inline"
+    )
+    input_ref: Optional[str] = Field(
+        default=None, description="URL that streams the input text, for large inputs"
+    )
+    input_values: int = Field(
+        ..., description="Number of integers and characters in the input"
+    )
+    expected_output: Optional[str] = Field(
+        default=None,
+        description="Reference solution output, when a solution was supplied",
+    )
+    verification_detail: Optional[str] = Field(
+        default=None,
+        description="Why expected_output is missing, if the reference run failed",
+    )
+
+
+class ReuseInfo(BaseModel):
+    """Where reused test cases came from"""
+
+    similarity: float = Field(
+        ..., description="Cosine similarity between the two problem descriptions"
+    )
+    source_problem: str = Field(
+        ..., description="Description of the past problem the cases came from"
+    )
+    reused_test_cases: int = Field(
+        ..., ge=0, description="Test cases taken from the past problem"
+    )
+
+
 class TestCaseResponse(BaseModel):
     """Response model for test case generation"""
 
@@ -121,6 +313,14 @@ class TestCaseResponse(BaseModel):
     problem_summary: str = Field(
         ..., min_length=1, description="Brief summary of the problem"
     )
+    stress_cases: List[StressCase] = Field(
+        default_factory=list,
+        description="Maximum-constraint inputs generated on the server",
+    )
+    reuse: Optional[ReuseInfo] = Field(
+        default=None,
+        description="Set when test cases were reused from a similar past problem",
+    )
     generated_at: str = Field(
         default_factory=lambda: datetime.utcnow().isoformat(),
         description="Timestamp when test cases were generated",
@@ -147,6 +347,75 @@ class TestCaseResponse(BaseModel):
         }
 
 
+class BatchTestCaseRequest(BaseModel):
+    """Request model for batch test case generation"""
+
+    requests: List[TestCaseRequest] = Field(
+        ...,
+        min_length=1,
+        max_length=500,
+        description="Problems to generate test cases for",
+    )
+    max_concurrency: Optional[int] = Field(
+        default=None,
+        ge=1,
+        le=64,
+        description="Maximum generations in flight at once (defaults to server setting)",
+    )
+
+
+class BatchItemResult(BaseModel):
+    """Result for a single item of a batch request"""
+
+    index: int = Field(..., description="Position of the item in the batch request")
+    status: str = Field(..., description="'ok' or 'error'")
+    result: Optional[TestCaseResponse] = Field(
+        default=None, description="Generated test cases when status is 'ok'"
+    )
+    error: Optional[str] = Field(
+        default=None, description="Error message when status is 'error'"
+    )
+    error_type: Optional[str] = Field(default=None, description="Type of error")
+
+
+class BatchTestCaseResponse(BaseModel):
+    """Response model for batch test case generation"""
+
+    results: List[BatchItemResult] = Field(
+        ..., description="Per-item results, in request order"
+    )
+    succeeded: int = Field(..., description="Number of items that succeeded")
+    failed: int = Field(..., description="Number of items that failed")
+
+
+class JobResponse(BaseModel):
+    """State of an asynchronous generation job"""
+
+    job_id: str = Field(..., description="Job identifier")
+    status: JobStatus = Field(..., description="Current state of the job")
+    attempts: int = Field(
+        ..., description="Times a worker has started the job (retries included)"
+    )
+    created_at: str = Field(..., description="Timestamp when the job was submitted")
+    started_at: Optional[str] = Field(
+        default=None, description="Timestamp when the latest attempt started"
+    )
+    finished_at: Optional[str] = Field(
+        default=None, description="Timestamp when the job succeeded or failed"
+    )
+    result: Optional[TestCaseResponse] = Field(
+        default=None, description="Generated test cases when status is 'succeeded'"
+    )
+    error: Optional[str] = Field(
+        default=None, description="Error message when status is 'failed'"
+    )
+    error_type: Optional[str] = Field(default=None, description="Type of error")
+    status_code: Optional[int] = Field(
+        default=None,
+        description="HTTP status the synchronous endpoint would have returned for the error",
+    )
+
+
 class ErrorResponse(BaseModel):
     """Error response model"""
 
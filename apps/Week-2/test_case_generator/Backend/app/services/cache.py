@@ -0,0 +1,226 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from app.config import get_settings
+from app.core.metrics import registry
+from app.models.schemas import TestCaseRequest, TestCaseResponse
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+
+class ResponseCache:
+    """
+    Two-tier cache for generated test cases
+
+    Tier 1 is a per-process LRU with TTL. Tier 2 is an optional SQLite
+    database that every uvicorn worker on the host can share.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: int = 3600,
+        sqlite_path: Optional[str] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.sqlite_path = sqlite_path
+
+        self._memory: "OrderedDict[str, Tuple[float, TestCaseResponse]]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.stores = 0
+
+    @staticmethod
+    def make_key(request: TestCaseRequest) -> str:
+        """
+        Build a stable cache key from the fields that affect generation
+        Args:
+            request: TestCaseRequest to key
+        Returns:
+            Hex SHA-256 digest of the normalized request
+        """
+        normalized = {
+            "problem_description": " ".join(request.problem_description.split()),
+            "difficulty": request.difficulty.value,
+            "problem_type": request.problem_type.value,
+            "num_test_cases": request.num_test_cases,
+            "constraints": (
+                " ".join(request.constraints.split()) if request.constraints else None
+            ),
+            "include_edge_cases": request.include_edge_cases,
+        }
+        if request.reference_solution:
+            normalized["reference_solution"] = request.reference_solution
+            normalized["entry_point"] = request.entry_point
+            normalized["verification_mode"] = request.verification_mode.value
+        if request.stress_cases:
+            normalized["stress_cases"] = request.stress_cases
+        raw = json.dumps(normalized, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[TestCaseResponse]:
+        """
+        Look up a cached response, checking memory first and then SQLite
+        Args:
+            key: Cache key from make_key()
+        Returns:
+            Cached TestCaseResponse or None on a miss
+        """
+        now = time.time()
+
+        entry = self._memory.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > now:
+                self._memory.move_to_end(key)
+                self.hits_memory += 1
+                return value
+            del self._memory[key]
+
+        if self.sqlite_path:
+            row = await asyncio.to_thread(self._db_get, key, now)
+            if row is not None:
+                expires_at, payload = row
+                value = TestCaseResponse.model_validate_json(payload)
+                self._remember(key, value, expires_at)
+                self.hits_disk += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: TestCaseResponse) -> None:
+        """
+        Store a response in both tiers
+        Args:
+            key: Cache key from make_key()
+            value: Response to cache
+        """
+        expires_at = time.time() + self.ttl_seconds
+        self._remember(key, value, expires_at)
+        self.stores += 1
+
+        if self.sqlite_path:
+            try:
+                await asyncio.to_thread(
+                    self._db_set, key, value.model_dump_json(), expires_at
+                )
+            except sqlite3.Error as e:
+                logger.warning("Failed to persist cache entry: %s", e)
+
+    def stats(self) -> Dict[str, object]:
+        """
+        Get hit/miss counters for the cache
+        Returns:
+            Dictionary of cache statistics
+        """
+        hits = self.hits_memory + self.hits_disk
+        lookups = hits + self.misses
+        return {
+            "enabled": settings.cache_enabled,
+            "entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "sqlite_enabled": bool(self.sqlite_path),
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "stores": self.stores,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def open(self) -> None:
+        """Open the SQLite tier now instead of on the first lookup"""
+        if self.sqlite_path:
+            with self._db_lock:
+                self._connect()
+
+    def close(self) -> None:
+        """Close the SQLite connection if one was opened"""
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _remember(self, key: str, value: TestCaseResponse, expires_at: float) -> None:
+        """Insert into the in-memory LRU, evicting the oldest entries"""
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the SQLite tier on first use (runs in a worker thread)"""
+        if self._db is None:
+            Path(self.sqlite_path).parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(self.sqlite_path, timeout=5, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache ("
+                "key TEXT PRIMARY KEY, payload TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            db.commit()
+            self._db = db
+        return self._db
+
+    def _db_get(self, key: str, now: float) -> Optional[Tuple[float, str]]:
+        with self._db_lock:
+            db = self._connect()
+            row = db.execute(
+                "SELECT expires_at, payload FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and row[0] <= now:
+                db.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                db.commit()
+                return None
+            return row
+
+    def _db_set(self, key: str, payload: str, expires_at: float) -> None:
+        with self._db_lock:
+            db = self._connect()
+            db.execute(
+                "INSERT OR REPLACE INTO response_cache (key, payload, expires_at) "
+                "VALUES (?, ?, ?)",
+                (key, payload, expires_at),
+            )
+            db.commit()
+
+
+response_cache = ResponseCache(
+    max_entries=settings.cache_max_entries,
+    ttl_seconds=settings.cache_ttl_seconds,
+    sqlite_path=settings.cache_sqlite_path,
+)
+
+registry.callback(
+    "testcase_cache_lookups_total",
+    "Response cache lookups by tier and result",
+    "counter",
+    lambda: {
+        ("memory", "hit"): response_cache.hits_memory,
+        ("disk", "hit"): response_cache.hits_disk,
+        ("any", "miss"): response_cache.misses,
+    },
+    ["tier", "result"],
+)
+registry.callback(
+    "testcase_cache_entries",
+    "Entries in the in-memory response cache",
+    "gauge",
+    lambda: {(): len(response_cache._memory)},
+)
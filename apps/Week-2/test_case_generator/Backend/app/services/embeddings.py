@@ -0,0 +1,138 @@
+"""
+Text embeddings for the semantic reuse store (local hashing or OpenAI)
+"""
+
+import hashlib
+import math
+import re
+from typing import Any, List, Optional
+
+from app.config import get_settings
+from app.core.deadline import cap_timeout
+from app.core.exceptions import UpstreamError
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+class HashingEmbedder:
+    """Feature-hashing embedder over word unigrams and bigrams"""
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    async def startup(self) -> None:
+        """Nothing to open"""
+
+    async def aclose(self) -> None:
+        """Nothing to close"""
+
+    async def embed(self, text: str) -> List[float]:
+        """
+        Embed a text
+        Args:
+            text: Text to embed
+        Returns:
+            Unit-length vector of self.dim floats (all zero for an empty text)
+        """
+        return self.embed_sync(text)
+
+    def embed_sync(self, text: str) -> List[float]:
+        words = WORD_PATTERN.findall(text.lower())
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+        counts = {}
+        for feature in features:
+            counts[feature] = counts.get(feature, 0) + 1
+
+        vector = [0.0] * self.dim
+        for feature, count in counts.items():
+            digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            # The sign bit keeps colliding features from only ever adding up
+            sign = 1.0 if value & 1 else -1.0
+            vector[(value >> 1) % self.dim] += sign * (1.0 + math.log(count))
+
+        norm = math.sqrt(sum(v * v for v in vector))
+        return [v / norm for v in vector] if norm else vector
+
+
+class OpenAIEmbedder:
+    """Embedder backed by the OpenAI embeddings API"""
+
+    def __init__(self, model: str = "text-embedding-3-small", dim: int = 512):
+        self.model = model
+        self.dim = dim
+        self.name = f"openai-{model}-{dim}"
+        self.client: Optional[Any] = None  # AsyncOpenAI, created in startup()
+
+    async def startup(self) -> None:
+        """Create the API client; safe to call more than once"""
+        if self.client is None:
+            from openai import AsyncOpenAI
+
+            self.client = AsyncOpenAI(
+                api_key=settings.openai_api_key,
+                base_url=settings.openai_base_url,
+                timeout=float(settings.openai_timeout),
+                max_retries=1,
+            )
+
+    async def aclose(self) -> None:
+        """Close the API client"""
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
+
+    async def embed(self, text: str) -> List[float]:
+        """
+        Embed a text
+        Args:
+            text: Text to embed
+        Returns:
+            Unit-length vector of self.dim floats
+        Raises:
+            UpstreamError: If the embeddings call fails
+        """
+        if self.client is None:
+            await self.startup()
+
+        from openai import OpenAIError
+
+        try:
+            response = await self.client.embeddings.create(
+                model=self.model,
+                input=text,
+                dimensions=self.dim,
+                timeout=cap_timeout(float(settings.openai_timeout)),
+            )
+        except OpenAIError as e:
+            raise UpstreamError(f"OpenAI embeddings error: {str(e)}")
+
+        vector = list(response.data[0].embedding)
+        norm = math.sqrt(sum(v * v for v in vector))
+        return [v / norm for v in vector] if norm else vector
+
+
+def create_embedder():
+    """
+    Build the embedder named in settings.reuse_embedding_backend
+    Returns:
+        HashingEmbedder or OpenAIEmbedder
+    Raises:
+        ValueError: If the backend name is unknown
+    """
+    backend = settings.reuse_embedding_backend
+    if backend == "hashing":
+        return HashingEmbedder(settings.reuse_embedding_dim)
+    if backend == "openai":
+        return OpenAIEmbedder(
+            settings.reuse_embedding_model, settings.reuse_embedding_dim
+        )
+    raise ValueError(
+        f"Unknown embedding backend {backend!r}; expected 'hashing' or 'openai'"
+    )
@@ -0,0 +1,619 @@
+"""
+Asynchronous generation jobs backed by SQLite
+
+Running jobs hold a lease their worker renews; a job whose worker dies is
+claimed again once the lease lapses, up to jobs_max_attempts times.
+"""
+
+import asyncio
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.config import get_settings
+from app.core.deadline import deadline_scope
+from app.core.exceptions import UpstreamError
+from app.core.metrics import job_queue_wait, registry
+from app.core.scheduler import Priority, upstream_priority
+from app.models.schemas import (
+    CacheMode,
+    JobResponse,
+    JobStatus,
+    TestCaseRequest,
+    TestCaseResponse,
+)
+from app.services.testcase_service import testcase_service
+from app.utils.logger import get_logger, request_id
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+TERMINAL_STATUSES = {JobStatus.SUCCEEDED, JobStatus.FAILED}
+
+# Upstream errors that are worth another attempt after a delay
+RETRYABLE_STATUS_CODES = {503, 504}
+
+# Longest delay before retrying a job after a retryable upstream error
+MAX_RETRY_DELAY = 60.0
+
+# How often finished jobs past their TTL are deleted
+PURGE_INTERVAL = 60.0
+
+
+class JobQueueFullError(Exception):
+    """Raised when a job is submitted while jobs_max_queued jobs are waiting"""
+
+
+@dataclass
+class ClaimedJob:
+    """A job a worker of this process is running"""
+
+    id: str
+    request: TestCaseRequest
+    cache_mode: CacheMode
+    attempts: int
+    created_at: float
+
+
+def _timestamp(value: Optional[float]) -> Optional[str]:
+    return datetime.utcfromtimestamp(value).isoformat() if value else None
+
+
+class JobQueue:
+    """SQLite job queue with a pool of in-process asyncio workers"""
+
+    def __init__(
+        self,
+        sqlite_path: str,
+        workers: int = 4,
+        max_queued: int = 10_000,
+        max_attempts: int = 3,
+        lease_seconds: float = 60.0,
+        poll_interval: float = 1.0,
+        ttl_seconds: int = 86400,
+    ):
+        self.sqlite_path = sqlite_path
+        self.workers = workers
+        self.max_queued = max_queued
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.ttl_seconds = ttl_seconds
+
+        self.owner = ""  # identifies this process's leases; set in start()
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._tasks: List[asyncio.Task] = []
+        # Set when a job is submitted here, so idle workers need not wait a poll
+        self._wakeup = asyncio.Event()
+        # Replaced every time a job of this process finishes, waking long-polls
+        self._changed = asyncio.Event()
+        self._last_purge = 0.0
+
+        # Queue-wide, refreshed every poll interval
+        self.queued = 0
+        self.running = 0
+        self.oldest_queued_seconds = 0.0
+
+        # This process only
+        self.busy = 0
+        self.submitted = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.retried = 0
+        self.abandoned = 0
+
+    async def start(self) -> None:
+        """Open the database and start the workers"""
+        self.owner = uuid.uuid4().hex
+        await asyncio.to_thread(self._refresh)
+        self._tasks = [
+            asyncio.create_task(self._work(), name=f"job-worker-{slot}")
+            for slot in range(self.workers)
+        ]
+        self._tasks.append(asyncio.create_task(self._maintain(), name="job-maintain"))
+        logger.info(
+            "Job queue started with %s workers (%s queued, %s running)",
+            self.workers,
+            self.queued,
+            self.running,
+        )
+
+    async def stop(self) -> None:
+        """Stop the workers, requeue the jobs they were running and close"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        with self._lock:
+            if self._db is None:
+                return
+            try:
+                released = self._db.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts - 1, "
+                    "lease_owner = NULL, lease_expires = NULL "
+                    "WHERE status = ? AND lease_owner = ?",
+                    (JobStatus.QUEUED.value, JobStatus.RUNNING.value, self.owner),
+                ).rowcount
+                if released:
+                    logger.info("Returned %s running jobs to the queue", released)
+            except sqlite3.Error as e:
+                logger.warning("Failed to requeue running jobs: %s", e)
+            self._db.close()
+            self._db = None
+
+    async def submit(
+        self, request: TestCaseRequest, cache_mode: CacheMode = CacheMode.USE
+    ) -> JobResponse:
+        """
+        Queue a generation
+        Args:
+            request: TestCaseRequest to generate
+            cache_mode: Cache mode the generation runs with
+        Returns:
+            JobResponse of the queued job
+        Raises:
+            JobQueueFullError: If jobs_max_queued jobs are already waiting
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        await asyncio.to_thread(
+            self._insert, job_id, request.model_dump_json(), cache_mode.value, now
+        )
+        self.submitted += 1
+        self.queued += 1
+        self._wakeup.set()
+        return JobResponse(
+            job_id=job_id,
+            status=JobStatus.QUEUED,
+            attempts=0,
+            created_at=_timestamp(now),
+        )
+
+    async def get(self, job_id: str) -> Optional[JobResponse]:
+        """
+        Look up a job
+        Args:
+            job_id: Id returned by submit()
+        Returns:
+            JobResponse, or None if the job is unknown or was purged
+        """
+        return await asyncio.to_thread(self._fetch, job_id)
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[JobResponse]:
+        """
+        Long-poll a job until it finishes or the timeout passes
+        Jobs run by this process wake the wait as soon as they finish; jobs
+        run by other processes are noticed within one poll interval.
+        Args:
+            job_id: Id returned by submit()
+            timeout: Longest time to wait, in seconds
+        Returns:
+            Latest JobResponse, or None if the job is unknown
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            # Taken before the read, so a job finishing in between still wakes us
+            changed = self._changed
+            job = await self.get(job_id)
+            remaining = deadline - loop.time()
+            if job is None or job.status in TERMINAL_STATUSES or remaining <= 0:
+                return job
+            try:
+                await asyncio.wait_for(
+                    changed.wait(), min(remaining, self.poll_interval)
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> Dict[str, object]:
+        """
+        Get queue depth and job counters
+        Returns:
+            Dictionary of job queue statistics
+        """
+        return {
+            "enabled": settings.jobs_enabled,
+            "queued": self.queued,
+            "running": self.running,
+            "oldest_queued_seconds": round(self.oldest_queued_seconds, 3),
+            "max_queued": self.max_queued,
+            "workers": self.workers,
+            "busy_workers": self.busy,
+            "submitted": self.submitted,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "retried": self.retried,
+            "abandoned": self.abandoned,
+        }
+
+    async def _work(self) -> None:
+        """Claim and run jobs until cancelled"""
+        while True:
+            self._wakeup.clear()
+            try:
+                job = await asyncio.to_thread(self._claim)
+                if job is not None:
+                    await self._run(job)
+                    continue
+            except sqlite3.Error as e:
+                logger.warning("Failed to claim a job: %s", e)
+            except Exception as e:
+                # Keep the worker alive; a lost job is recovered by its lease
+                logger.error("Job worker error: %s", e, exc_info=True)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run(self, job: ClaimedJob) -> None:
+        """Generate one claimed job and store its outcome"""
+        if job.attempts == 1:
+            job_queue_wait.observe(max(0.0, time.time() - job.created_at))
+        # The job's logs carry its id where a request's would carry the request id
+        id_token = request_id.set(f"job-{job.id}")
+        logger.info("Running job %s (attempt %s)", job.id, job.attempts)
+
+        self.busy += 1
+        heartbeat = asyncio.create_task(self._heartbeat(job.id))
+        token = upstream_priority.set(Priority.BATCH)
+        try:
+            # A timed-out attempt fails with 504 and is retried like one
+            with deadline_scope(settings.request_timeout_job):
+                result = await testcase_service.generate_test_cases(
+                    job.request, job.cache_mode
+                )
+        except UpstreamError as e:
+            if (
+                e.status_code in RETRYABLE_STATUS_CODES
+                and job.attempts < self.max_attempts
+            ):
+                delay = e.retry_after or min(MAX_RETRY_DELAY, 2.0**job.attempts)
+                logger.warning("Job %s will be retried in %.1fs: %s", job.id, delay, e)
+                self.retried += 1
+                await self._save(self._requeue, job.id, delay)
+            else:
+                logger.error("Job %s failed: %s", job.id, e)
+                self.failed += 1
+                await self._save(self._fail, job.id, e, e.status_code)
+        except Exception as e:
+            logger.error("Job %s failed: %s", job.id, e)
+            self.failed += 1
+            status_code = 422 if isinstance(e, ValueError) else 500
+            await self._save(self._fail, job.id, e, status_code)
+        else:
+            logger.info(
+                "Job %s succeeded with %s test cases", job.id, len(result.test_cases)
+            )
+            self.succeeded += 1
+            await self._save(self._succeed, job.id, result)
+        finally:
+            upstream_priority.reset(token)
+            heartbeat.cancel()
+            self.busy -= 1
+            request_id.reset(id_token)
+        self._notify()
+
+    async def _heartbeat(self, job_id: str) -> None:
+        """Renew the lease of a running job"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            await self._save(self._renew, job_id)
+
+    async def _maintain(self) -> None:
+        """Refresh the queue depth and purge expired jobs"""
+        while True:
+            try:
+                await asyncio.to_thread(self._refresh)
+            except sqlite3.Error as e:
+                logger.warning("Failed to refresh job queue stats: %s", e)
+            await asyncio.sleep(self.poll_interval)
+
+    async def _save(self, write, *args) -> None:
+        """Run a write in a thread; a failure only logs, the lease recovers the job"""
+        try:
+            await asyncio.to_thread(write, *args)
+        except sqlite3.Error as e:
+            logger.warning("Failed to update job %s: %s", args[0], e)
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database on first use (runs in a worker thread)"""
+        if self._db is None:
+            Path(self.sqlite_path).parent.mkdir(parents=True, exist_ok=True)
+            # Autocommit, so claims can take the write lock with BEGIN IMMEDIATE
+            db = sqlite3.connect(
+                self.sqlite_path,
+                timeout=5,
+                check_same_thread=False,
+                isolation_level=None,
+            )
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, status TEXT NOT NULL, request TEXT NOT NULL, "
+                "cache_mode TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, "
+                "created_at REAL NOT NULL, available_at REAL NOT NULL, "
+                "started_at REAL, finished_at REAL, "
+                "lease_owner TEXT, lease_expires REAL, "
+                "result TEXT, error TEXT, error_type TEXT, status_code INTEGER)"
+            )
+            db.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, available_at)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished_at)")
+            self._db = db
+        return self._db
+
+    def _insert(self, job_id: str, request: str, cache_mode: str, now: float) -> None:
+        with self._lock:
+            db = self._connect()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                (queued,) = db.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = ?",
+                    (JobStatus.QUEUED.value,),
+                ).fetchone()
+                if queued >= self.max_queued:
+                    raise JobQueueFullError(
+                        f"Job queue is full ({queued} jobs waiting)"
+                    )
+                db.execute(
+                    "INSERT INTO jobs (id, status, request, cache_mode, "
+                    "created_at, available_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (job_id, JobStatus.QUEUED.value, request, cache_mode, now, now),
+                )
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+
+    def _claim(self) -> Optional[ClaimedJob]:
+        """Take the oldest ready job, or one whose worker's lease expired"""
+        now = time.time()
+        with self._lock:
+            db = self._connect()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                abandoned = db.execute(
+                    "UPDATE jobs SET status = ?, finished_at = ?, error = ?, "
+                    "error_type = 'JobAbandoned', status_code = 500, "
+                    "lease_owner = NULL, lease_expires = NULL "
+                    "WHERE status = ? AND lease_expires < ? AND attempts >= ?",
+                    (
+                        JobStatus.FAILED.value,
+                        now,
+                        f"Job abandoned after {self.max_attempts} attempts "
+                        "whose workers stopped responding",
+                        JobStatus.RUNNING.value,
+                        now,
+                        self.max_attempts,
+                    ),
+                ).rowcount
+                row = db.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts + 1, "
+                    "started_at = ?, lease_owner = ?, lease_expires = ? "
+                    "WHERE id = (SELECT id FROM jobs "
+                    "WHERE (status = ? AND available_at <= ?) "
+                    "OR (status = ? AND lease_expires < ?) "
+                    "ORDER BY available_at LIMIT 1) "
+                    "RETURNING id, request, cache_mode, attempts, created_at",
+                    (
+                        JobStatus.RUNNING.value,
+                        now,
+                        self.owner,
+                        now + self.lease_seconds,
+                        JobStatus.QUEUED.value,
+                        now,
+                        JobStatus.RUNNING.value,
+                        now,
+                    ),
+                ).fetchone()
+                job, error = None, None
+                if row is not None:
+                    job_id, request, cache_mode, attempts, created_at = row
+                    try:
+                        job = ClaimedJob(
+                            id=job_id,
+                            request=TestCaseRequest.model_validate_json(request),
+                            cache_mode=CacheMode(cache_mode),
+                            attempts=attempts,
+                            created_at=created_at,
+                        )
+                    except ValueError as e:
+                        # Stored by an incompatible version; retrying cannot help
+                        error = e
+                        db.execute(
+                            "UPDATE jobs SET status = ?, finished_at = ?, error = ?, "
+                            "error_type = ?, status_code = 422, "
+                            "lease_owner = NULL, lease_expires = NULL WHERE id = ?",
+                            (
+                                JobStatus.FAILED.value,
+                                now,
+                                f"Stored job request is invalid: {e}",
+                                type(e).__name__,
+                                job_id,
+                            ),
+                        )
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+
+        if abandoned:
+            logger.error("Gave up on %s jobs whose workers kept dying", abandoned)
+            self.abandoned += abandoned
+        if error is not None:
+            logger.error("Job %s failed: %s", row[0], error)
+            self.failed += 1
+        return job
+
+    def _renew(self, job_id: str) -> None:
+        with self._lock:
+            renewed = (
+                self._connect()
+                .execute(
+                    "UPDATE jobs SET lease_expires = ? "
+                    "WHERE id = ? AND status = ? AND lease_owner = ?",
+                    (
+                        time.time() + self.lease_seconds,
+                        job_id,
+                        JobStatus.RUNNING.value,
+                        self.owner,
+                    ),
+                )
+                .rowcount
+            )
+        if not renewed:
+            logger.warning("Lost the lease on job %s to another worker", job_id)
+
+    def _finish(self, job_id: str, assignments: str, values: tuple) -> None:
+        """Apply a final update if this process still holds the job's lease"""
+        with self._lock:
+            updated = (
+                self._connect()
+                .execute(
+                    f"UPDATE jobs SET {assignments}, "
+                    "lease_owner = NULL, lease_expires = NULL "
+                    "WHERE id = ? AND status = ? AND lease_owner = ?",
+                    (*values, job_id, JobStatus.RUNNING.value, self.owner),
+                )
+                .rowcount
+            )
+        if not updated:
+            logger.warning("Discarding outcome of job %s: lease was lost", job_id)
+
+    def _succeed(self, job_id: str, result: TestCaseResponse) -> None:
+        self._finish(
+            job_id,
+            "status = ?, finished_at = ?, result = ?",
+            (JobStatus.SUCCEEDED.value, time.time(), result.model_dump_json()),
+        )
+
+    def _fail(self, job_id: str, error: Exception, status_code: int) -> None:
+        self._finish(
+            job_id,
+            "status = ?, finished_at = ?, error = ?, error_type = ?, status_code = ?",
+            (
+                JobStatus.FAILED.value,
+                time.time(),
+                str(error),
+                type(error).__name__,
+                status_code,
+            ),
+        )
+
+    def _requeue(self, job_id: str, delay: float) -> None:
+        self._finish(
+            job_id,
+            "status = ?, available_at = ?",
+            (JobStatus.QUEUED.value, time.time() + delay),
+        )
+
+    def _fetch(self, job_id: str) -> Optional[JobResponse]:
+        with self._lock:
+            row = (
+                self._connect()
+                .execute(
+                    "SELECT status, attempts, created_at, started_at, finished_at, "
+                    "result, error, error_type, status_code FROM jobs WHERE id = ?",
+                    (job_id,),
+                )
+                .fetchone()
+            )
+        if row is None:
+            return None
+        status, attempts, created_at, started_at, finished_at = row[:5]
+        result, error, error_type, status_code = row[5:]
+        return JobResponse(
+            job_id=job_id,
+            status=JobStatus(status),
+            attempts=attempts,
+            created_at=_timestamp(created_at),
+            started_at=_timestamp(started_at),
+            finished_at=_timestamp(finished_at),
+            result=(TestCaseResponse.model_validate_json(result) if result else None),
+            error=error,
+            error_type=error_type,
+            status_code=status_code,
+        )
+
+    def _refresh(self) -> None:
+        """Read the queue depth and delete finished jobs past their TTL"""
+        now = time.time()
+        with self._lock:
+            db = self._connect()
+            counts = dict(
+                db.execute(
+                    "SELECT status, COUNT(*) FROM jobs WHERE status IN (?, ?) "
+                    "GROUP BY status",
+                    (JobStatus.QUEUED.value, JobStatus.RUNNING.value),
+                ).fetchall()
+            )
+            (oldest,) = db.execute(
+                "SELECT MIN(available_at) FROM jobs WHERE status = ?",
+                (JobStatus.QUEUED.value,),
+            ).fetchone()
+            if now - self._last_purge >= PURGE_INTERVAL:
+                self._last_purge = now
+                purged = db.execute(
+                    "DELETE FROM jobs WHERE finished_at < ?",
+                    (now - self.ttl_seconds,),
+                ).rowcount
+                if purged:
+                    logger.info("Deleted %s expired jobs", purged)
+
+        self.queued = counts.get(JobStatus.QUEUED.value, 0)
+        self.running = counts.get(JobStatus.RUNNING.value, 0)
+        self.oldest_queued_seconds = max(0.0, now - oldest) if oldest else 0.0
+
+
+job_queue = JobQueue(
+    sqlite_path=settings.jobs_sqlite_path,
+    workers=settings.jobs_workers,
+    max_queued=settings.jobs_max_queued,
+    max_attempts=settings.jobs_max_attempts,
+    lease_seconds=settings.jobs_lease_seconds,
+    poll_interval=settings.jobs_poll_interval,
+    ttl_seconds=settings.jobs_ttl_seconds,
+)
+
+registry.callback(
+    "testcase_jobs",
+    "Jobs in the queue by status (queue-wide, so every worker reports the same)",
+    "gauge",
+    lambda: {
+        ("queued",): job_queue.queued,
+        ("running",): job_queue.running,
+    },
+    ["status"],
+)
+registry.callback(
+    "testcase_jobs_oldest_queued_seconds",
+    "How long the oldest ready job has been waiting",
+    "gauge",
+    lambda: {(): job_queue.oldest_queued_seconds},
+)
+registry.callback(
+    "testcase_jobs_finished_total",
+    "Jobs finished by this worker, by outcome",
+    "counter",
+    lambda: {
+        ("succeeded",): job_queue.succeeded,
+        ("failed",): job_queue.failed,
+        ("retried",): job_queue.retried,
+        ("abandoned",): job_queue.abandoned,
+    },
+    ["outcome"],
+)
@@ -0,0 +1,403 @@
+"""
+Semantic reuse store: past generations in SQLite, searched by embedding
+"""
+
+import array
+import asyncio
+import hashlib
+import operator
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from app.config import get_settings
+from app.core.exceptions import UpstreamError
+from app.core.metrics import registry
+from app.models.schemas import (
+    TestCaseRequest,
+    TestCaseResponse,
+    VerificationStatus,
+)
+from app.services.embeddings import create_embedder
+from app.utils.logger import get_logger
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+# Cases whose expected output a reference solution disputed are not reused
+UNRELIABLE_STATUSES = {VerificationStatus.MISMATCH, VerificationStatus.ERROR}
+
+
+@dataclass
+class ReuseCandidate:
+    """The closest past problem found for a request"""
+
+    key: str
+    similarity: float
+    problem_description: str
+    response: TestCaseResponse
+
+
+@dataclass
+class ReuseLookup:
+    """Outcome of a lookup; the vector is kept so recording need not re-embed"""
+
+    vector: Optional[List[float]]
+    match: Optional[ReuseCandidate] = None
+
+
+class VectorIndex:
+    """Brute-force cosine similarity index over unit-length vectors"""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.keys: List[str] = []
+        self._rows: Dict[str, int] = {}
+        if np is not None:
+            self._matrix = np.empty((16, dim), dtype=np.float32)
+        else:
+            self._vectors: List[array.array] = []
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._rows
+
+    def add(self, key: str, vector: List[float]) -> None:
+        """Insert a vector, replacing the one stored under the same key"""
+        row = self._rows.get(key)
+        if row is None:
+            row = len(self.keys)
+            self._rows[key] = row
+            self.keys.append(key)
+            if np is None:
+                self._vectors.append(array.array("f", vector))
+                return
+            if row == len(self._matrix):
+                grown = np.empty((2 * row, self.dim), dtype=np.float32)
+                grown[:row] = self._matrix
+                self._matrix = grown
+        if np is None:
+            self._vectors[row] = array.array("f", vector)
+        else:
+            self._matrix[row] = vector
+
+    def search(self, vector: List[float]) -> Optional[Tuple[float, str]]:
+        """
+        Find the most similar stored vector
+        Args:
+            vector: Unit-length query vector
+        Returns:
+            (cosine similarity, key) of the best match, or None if empty
+        """
+        if not self.keys:
+            return None
+        if np is not None:
+            scores = self._matrix[: len(self.keys)] @ np.asarray(
+                vector, dtype=np.float32
+            )
+            best = int(scores.argmax())
+            return float(scores[best]), self.keys[best]
+
+        best, best_score = 0, -2.0
+        for row, stored in enumerate(self._vectors):
+            score = sum(map(operator.mul, stored, vector))
+            if score > best_score:
+                best, best_score = row, score
+        return best_score, self.keys[best]
+
+
+class SemanticStore:
+    """Persistent store of past generations, searchable by problem similarity"""
+
+    def __init__(
+        self,
+        sqlite_path: str,
+        threshold: float = 0.9,
+        max_entries: int = 10_000,
+    ):
+        self.sqlite_path = sqlite_path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.embedder = create_embedder()
+
+        self._indexes: Dict[Tuple[str, str], VectorIndex] = {}
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.partial_hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.stores = 0
+
+    @property
+    def entries(self) -> int:
+        return sum(len(index) for index in self._indexes.values())
+
+    @staticmethod
+    def make_key(request: TestCaseRequest) -> str:
+        """
+        Identify a problem, so regenerating it replaces the stored entry
+        Args:
+            request: TestCaseRequest to key
+        Returns:
+            Hex SHA-256 digest of the normalized problem
+        """
+        raw = "\n".join(
+            [
+                " ".join(request.problem_description.split()).lower(),
+                request.problem_type.value,
+                request.difficulty.value,
+            ]
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def startup(self) -> None:
+        """Open the database and load the most recent entries into memory"""
+        await self.embedder.startup()
+        loaded = await asyncio.to_thread(self._load)
+        logger.info(
+            "Semantic reuse store loaded %s problems (embedder=%s, index=%s)",
+            loaded,
+            self.embedder.name,
+            "numpy" if np is not None else "python",
+        )
+
+    async def aclose(self) -> None:
+        """Close the embedder and the SQLite connection"""
+        await self.embedder.aclose()
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    async def lookup(self, request: TestCaseRequest) -> ReuseLookup:
+        """
+        Find a past problem similar enough to reuse its test cases
+        Never raises: embedding failures count as errors and return no match.
+        Args:
+            request: TestCaseRequest about to be generated
+        Returns:
+            ReuseLookup with the request's embedding and the match, if any
+        """
+        try:
+            vector = await self.embedder.embed(request.problem_description)
+        except UpstreamError as e:
+            logger.warning("Embedding failed, skipping reuse lookup: %s", e)
+            self.errors += 1
+            return ReuseLookup(vector=None)
+
+        match = await asyncio.to_thread(self._search, request, vector)
+        if match is None:
+            self.misses += 1
+        elif len(match.response.test_cases) >= request.num_test_cases:
+            self.hits += 1
+        else:
+            self.partial_hits += 1
+        return ReuseLookup(vector=vector, match=match)
+
+    async def record(
+        self,
+        request: TestCaseRequest,
+        response: TestCaseResponse,
+        vector: Optional[List[float]] = None,
+    ) -> None:
+        """
+        Store a successful generation
+        Verification results and stress cases are specific to the request,
+        so only the test cases and summary are kept; cases a reference
+        solution disputed are dropped.
+        Args:
+            request: TestCaseRequest that was generated
+            response: Its response
+            vector: Embedding from lookup(), if one was made
+        """
+        test_cases = [
+            test_case.model_copy(
+                update={"verification": None, "verification_detail": None}
+            )
+            for test_case in response.test_cases
+            if test_case.verification not in UNRELIABLE_STATUSES
+        ]
+        if not test_cases:
+            return
+        stored = TestCaseResponse(
+            test_cases=test_cases,
+            problem_summary=response.problem_summary,
+            generated_at=response.generated_at,
+        )
+
+        try:
+            if vector is None:
+                vector = await self.embedder.embed(request.problem_description)
+            await asyncio.to_thread(self._store, request, stored, vector)
+        except (UpstreamError, sqlite3.Error) as e:
+            logger.warning("Failed to record generation for reuse: %s", e)
+            return
+        self.stores += 1
+
+    def stats(self) -> Dict[str, object]:
+        """
+        Get lookup counters for the store
+        Returns:
+            Dictionary of reuse statistics
+        """
+        lookups = self.hits + self.partial_hits + self.misses + self.errors
+        return {
+            "enabled": settings.reuse_enabled,
+            "entries": self.entries,
+            "max_entries": self.max_entries,
+            "similarity_threshold": self.threshold,
+            "embedder": self.embedder.name,
+            "hits": self.hits,
+            "partial_hits": self.partial_hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "stores": self.stores,
+            "hit_rate": (
+                round((self.hits + self.partial_hits) / lookups, 4) if lookups else 0.0
+            ),
+        }
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database on first use (runs in a worker thread)"""
+        if self._db is None:
+            Path(self.sqlite_path).parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(self.sqlite_path, timeout=5, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS generations ("
+                "key TEXT PRIMARY KEY, embedder TEXT NOT NULL, "
+                "problem_type TEXT NOT NULL, difficulty TEXT NOT NULL, "
+                "problem_description TEXT NOT NULL, embedding BLOB NOT NULL, "
+                "payload TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            db.execute(
+                "CREATE INDEX IF NOT EXISTS generations_recent "
+                "ON generations (embedder, created_at)"
+            )
+            db.commit()
+            self._db = db
+        return self._db
+
+    def _load(self) -> int:
+        with self._lock:
+            rows = (
+                self._connect()
+                .execute(
+                    "SELECT key, problem_type, difficulty, embedding FROM generations "
+                    "WHERE embedder = ? ORDER BY created_at DESC LIMIT ?",
+                    (self.embedder.name, self.max_entries),
+                )
+                .fetchall()
+            )
+            for key, problem_type, difficulty, blob in rows:
+                vector = array.array("f")
+                vector.frombytes(blob)
+                self._index(problem_type, difficulty).add(key, vector.tolist())
+            return len(rows)
+
+    def _index(self, problem_type: str, difficulty: str) -> VectorIndex:
+        index = self._indexes.get((problem_type, difficulty))
+        if index is None:
+            index = VectorIndex(self.embedder.dim)
+            self._indexes[(problem_type, difficulty)] = index
+        return index
+
+    def _search(
+        self, request: TestCaseRequest, vector: List[float]
+    ) -> Optional[ReuseCandidate]:
+        with self._lock:
+            index = self._indexes.get(
+                (request.problem_type.value, request.difficulty.value)
+            )
+            best = index.search(vector) if index is not None else None
+            if best is None or best[0] < self.threshold:
+                return None
+            similarity, key = best
+            row = (
+                self._connect()
+                .execute(
+                    "SELECT problem_description, payload FROM generations WHERE key = ?",
+                    (key,),
+                )
+                .fetchone()
+            )
+        if row is None:
+            return None
+        return ReuseCandidate(
+            key=key,
+            similarity=round(similarity, 4),
+            problem_description=row[0],
+            response=TestCaseResponse.model_validate_json(row[1]),
+        )
+
+    def _store(
+        self,
+        request: TestCaseRequest,
+        response: TestCaseResponse,
+        vector: List[float],
+    ) -> None:
+        key = self.make_key(request)
+        problem_type = request.problem_type.value
+        difficulty = request.difficulty.value
+        with self._lock:
+            db = self._connect()
+            db.execute(
+                "INSERT OR REPLACE INTO generations (key, embedder, problem_type, "
+                "difficulty, problem_description, embedding, payload, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    self.embedder.name,
+                    problem_type,
+                    difficulty,
+                    request.problem_description,
+                    array.array("f", vector).tobytes(),
+                    response.model_dump_json(),
+                    time.time(),
+                ),
+            )
+            db.commit()
+            # Past max_entries the index only takes updates until a restart
+            # reloads the most recent problems
+            index = self._index(problem_type, difficulty)
+            if key in index or self.entries < self.max_entries:
+                index.add(key, vector)
+
+
+semantic_store = SemanticStore(
+    sqlite_path=settings.reuse_sqlite_path,
+    threshold=settings.reuse_similarity_threshold,
+    max_entries=settings.reuse_max_entries,
+)
+
+registry.callback(
+    "testcase_reuse_lookups_total",
+    "Semantic reuse lookups by result",
+    "counter",
+    lambda: {
+        ("hit",): semantic_store.hits,
+        ("partial",): semantic_store.partial_hits,
+        ("miss",): semantic_store.misses,
+        ("error",): semantic_store.errors,
+    },
+    ["result"],
+)
+registry.callback(
+    "testcase_reuse_entries",
+    "Problems in the semantic reuse index",
+    "gauge",
+    lambda: {(): semantic_store.entries},
+)
@@ -0,0 +1,220 @@
+"""
+Process pool that runs reference solutions against generated inputs
+
+Workers have CPU and memory limits and an empty environment, but run as the
+server user, so only enable the sandbox for trusted callers.
+"""
+
+import asyncio
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Union
+
+from app.config import get_settings
+from app.core.metrics import registry, sandbox_duration
+from app.utils import sandbox_worker
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+
+@dataclass
+class ExecutionResult:
+    """Outcome of running the reference solution on one input"""
+
+    ok: bool
+    output: Any = None
+    error: Optional[str] = None
+
+
+class ExecutionSandbox:
+    """
+    Warm pool of worker processes for running reference solutions
+
+    Workers are started in start(), called from the app lifespan, rather
+    than on the first request. They come from a forkserver so they do not
+    inherit the server's threads, sockets or open files.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        cpu_seconds: float = 2.0,
+        memory_mb: int = 256,
+        wall_timeout: float = 5.0,
+    ):
+        self.workers = workers or os.cpu_count() or 1
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.wall_timeout = wall_timeout
+
+        self._pool: Optional[ProcessPoolExecutor] = None
+        # One run per worker at a time, so the wall-clock limit covers only
+        # execution and not time spent queued behind other runs
+        self._slots = asyncio.Semaphore(self.workers)
+        self.runs = 0
+        self.failures = 0
+
+    def start(self) -> None:
+        """Start every worker process; safe to call more than once"""
+        if self._pool is not None:
+            return
+
+        self._create_pool()
+        # Workers are spawned lazily; one task each brings them all up now
+        for future in [
+            self._pool.submit(sandbox_worker.warm_up) for _ in range(self.workers)
+        ]:
+            future.result()
+        logger.info(
+            "Sandbox started with %s workers (cpu=%ss, memory=%sMB)",
+            self.workers,
+            self.cpu_seconds,
+            self.memory_mb,
+        )
+
+    def _create_pool(self) -> None:
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload([sandbox_worker.__name__])
+        else:
+            context = multiprocessing.get_context("spawn")
+
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=sandbox_worker.init_worker,
+            initargs=(self.memory_mb * 1024 * 1024,),
+        )
+
+    def close(self) -> None:
+        """Stop the worker processes"""
+        if self._pool is None:
+            return
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._pool = None
+
+    async def run_many(
+        self,
+        source: str,
+        entry_point: Optional[str],
+        inputs: List[Union[str, Dict[str, Any]]],
+    ) -> List[ExecutionResult]:
+        """
+        Run a solution against several inputs in parallel
+        Args:
+            source: Python source of the reference solution
+            entry_point: Function or Solution method to call, or None to detect it
+            inputs: Test case input texts or stress input generator specs
+        Returns:
+            ExecutionResult for every input, in order
+        """
+        if self._pool is None:
+            self._create_pool()
+        return list(
+            await asyncio.gather(
+                *(self._run(source, entry_point, text) for text in inputs)
+            )
+        )
+
+    async def _run(
+        self,
+        source: str,
+        entry_point: Optional[str],
+        test_input: Union[str, Dict[str, Any]],
+    ) -> ExecutionResult:
+        async with self._slots:
+            started = time.perf_counter()
+            self.runs += 1
+            loop = asyncio.get_running_loop()
+            pool = self._pool
+            try:
+                future = loop.run_in_executor(
+                    pool,
+                    sandbox_worker.execute,
+                    source,
+                    entry_point,
+                    test_input,
+                    self.cpu_seconds,
+                )
+                # Backstop for runs the CPU timer cannot interrupt (e.g. blocked in C)
+                outcome = await asyncio.wait_for(future, self.wall_timeout)
+            except asyncio.TimeoutError:
+                outcome = {"ok": False, "error": "Wall-clock time limit exceeded"}
+                self._restart(pool)
+            except BrokenProcessPool:
+                outcome = {"ok": False, "error": "Solution crashed the worker process"}
+                self._restart(pool)
+            except asyncio.CancelledError:
+                raise
+            except BaseException as e:
+                # Backstop for a SystemExit or similar escaping the worker;
+                # re-raised here it would stop the server
+                outcome = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            finally:
+                sandbox_duration.observe(time.perf_counter() - started)
+
+        if not outcome["ok"]:
+            self.failures += 1
+        return ExecutionResult(**outcome)
+
+    def _restart(self, pool: ProcessPoolExecutor) -> None:
+        """
+        Replace a pool whose worker hung or died
+        Runs that shared the pool fail too; only the first of them restarts it.
+        """
+        if self._pool is not pool:
+            return
+        logger.warning("Restarting sandbox worker pool")
+        # A hung worker never returns, so stop the processes outright
+        for process in list((getattr(pool, "_processes", None) or {}).values()):
+            process.kill()
+        pool.shutdown(wait=False, cancel_futures=True)
+        self._create_pool()
+
+
+sandbox = ExecutionSandbox(
+    workers=settings.sandbox_workers,
+    cpu_seconds=settings.sandbox_cpu_seconds,
+    memory_mb=settings.sandbox_memory_mb,
+    wall_timeout=settings.sandbox_wall_timeout,
+)
+
+registry.callback(
+    "testcase_sandbox_runs_total",
+    "Reference solution runs by result",
+    "counter",
+    lambda: {
+        ("ok",): sandbox.runs - sandbox.failures,
+        ("error",): sandbox.failures,
+    },
+    ["result"],
+)
+
+
+def outputs_match(expected: str, actual: Any) -> bool:
+    """
+    Compare a test case's expected output with a solution's result
+    Args:
+        expected: Expected output text, e.g. "[0,1]", "true" or "abc"
+        actual: Value returned by the solution
+    Returns:
+        True if they are equal as values (or as text when the expected
+        output is not a literal)
+    """
+    try:
+        value = sandbox_worker.parse_value(expected)
+    except Exception:
+        return expected.strip() in (str(actual), format_output(actual))
+    return sandbox_worker.values_equal(actual, sandbox_worker.normalize(value))
+
+
+def format_output(value: Any) -> str:
+    """Render a solution's result the way expected outputs are written"""
+    return json.dumps(value, separators=(",", ":"), default=str)
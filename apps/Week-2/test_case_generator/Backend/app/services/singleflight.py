@@ -0,0 +1,70 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class _Call:
+    """An in-flight call and the number of callers waiting on it"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into one execution
+
+    The shared call runs in its own task so a caller that is cancelled
+    (e.g. the client disconnected) does not cancel it for the others.
+    The call is only cancelled once every waiter has gone away.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    @property
+    def in_flight(self) -> int:
+        """Number of distinct keys currently executing"""
+        return len(self._calls)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run fn() once per key, sharing the result with concurrent callers
+        Args:
+            key: Key identifying equivalent calls
+            fn: Zero-argument coroutine function to execute
+        Returns:
+            The result of fn()
+        Raises:
+            Whatever fn() raised, re-raised in every waiter
+        """
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.create_task(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+            self.executions += 1
+        else:
+            self.coalesced += 1
+            logger.debug("Joining in-flight call (%s waiting)", call.waiters)
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Nobody is left to receive the result
+                self._forget(key, call)
+                call.task.cancel()
+
+    def _forget(self, key: str, call: _Call) -> None:
+        """Drop the call from the table unless a newer call replaced it"""
+        if self._calls.get(key) is call:
+            del self._calls[key]
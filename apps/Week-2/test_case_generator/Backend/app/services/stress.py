@@ -0,0 +1,164 @@
+"""
+Stress inputs materialized on the server from model-written generator specs
+
+Small inputs are rendered inline; large ones are returned as a reference to
+the inputs route, which regenerates and streams them on request.
+"""
+
+import asyncio
+import base64
+import binascii
+import zlib
+from typing import List, Optional
+
+from pydantic import ValidationError
+
+from app.config import get_settings
+from app.core.metrics import stage_duration, stress_inputs_generated
+from app.models.schemas import StressCase, StressSpec
+from app.services.sandbox import format_output, sandbox
+from app.utils import input_generator
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+settings = get_settings()
+
+# Upper bound on a decoded input reference, well above any valid spec
+MAX_REF_BYTES = 16 * 1024
+
+
+class StressInputs:
+    """
+    Turn generator specs into stress cases
+
+    Input references encode the spec itself rather than an id into server
+    state, so they stay valid across workers and restarts and for as long
+    as a cached response that contains them.
+    """
+
+    def __init__(
+        self,
+        max_values: int = 1_000_000,
+        inline_max_values: int = 1000,
+        max_output_chars: int = 100_000,
+    ):
+        self.max_values = max_values
+        self.inline_max_values = inline_max_values
+        self.max_output_chars = max_output_chars
+
+    def check(self, spec: StressSpec) -> None:
+        """
+        Check that a spec is within the server's size limit
+        Args:
+            spec: Generator spec
+        Raises:
+            ValueError: If the spec generates too many values
+        """
+        values = input_generator.count_values(spec.model_dump(mode="json"))
+        if values > self.max_values:
+            raise ValueError(
+                f"Stress input has {values:,} values, more than the "
+                f"{self.max_values:,} allowed"
+            )
+
+    @staticmethod
+    def encode_ref(spec: StressSpec) -> str:
+        """
+        Encode a spec as an input reference
+        Args:
+            spec: Generator spec
+        Returns:
+            URL-safe reference string
+        """
+        raw = spec.model_dump_json(exclude={"explanation"}).encode()
+        return base64.urlsafe_b64encode(zlib.compress(raw, 9)).rstrip(b"=").decode()
+
+    def decode_ref(self, ref: str) -> StressSpec:
+        """
+        Decode and check an input reference
+        Args:
+            ref: Reference produced by encode_ref()
+        Returns:
+            Generator spec
+        Raises:
+            ValueError: If the reference is malformed or over the size limit
+        """
+        try:
+            compressed = base64.urlsafe_b64decode(ref + "=" * (-len(ref) % 4))
+            decompressor = zlib.decompressobj()
+            raw = decompressor.decompress(compressed, MAX_REF_BYTES)
+            if decompressor.unconsumed_tail:
+                raise ValueError("reference too large")
+            spec = StressSpec.model_validate_json(raw)
+        except (binascii.Error, zlib.error, ValidationError, ValueError) as e:
+            raise ValueError(f"Invalid input reference: {e}")
+        self.check(spec)
+        return spec
+
+    async def build(
+        self,
+        specs: List[StressSpec],
+        reference_solution: Optional[str] = None,
+        entry_point: Optional[str] = None,
+    ) -> List[StressCase]:
+        """
+        Materialize stress cases, with reference outputs if a solution is given
+        Args:
+            specs: Generator specs, already checked
+            reference_solution: Optional Python solution to compute outputs with
+            entry_point: Function or Solution method to call
+        Returns:
+            StressCase for every spec, in order
+        """
+        dumped = [spec.model_dump(mode="json") for spec in specs]
+        with stage_duration.time(stage="stress_generation"):
+            cases = await asyncio.gather(
+                *(self._materialize(spec, raw) for spec, raw in zip(specs, dumped))
+            )
+
+        if not reference_solution:
+            return list(cases)
+
+        # Workers generate the inputs from the specs themselves
+        with stage_duration.time(stage="verification"):
+            results = await sandbox.run_many(reference_solution, entry_point, dumped)
+        completed = []
+        for case, result in zip(cases, results):
+            if not result.ok:
+                update = {"verification_detail": result.error}
+            else:
+                output = format_output(result.output)
+                if len(output) <= self.max_output_chars:
+                    update = {"expected_output": output}
+                else:
+                    update = {
+                        "verification_detail": (
+                            f"Reference output has {len(output):,} characters, "
+                            "too many to return"
+                        )
+                    }
+            completed.append(case.model_copy(update=update))
+        return completed
+
+    async def _materialize(self, spec: StressSpec, raw: dict) -> StressCase:
+        values = input_generator.count_values(raw)
+        if values > self.inline_max_values:
+            stress_inputs_generated.inc(delivery="reference")
+            return StressCase(
+                generator=spec,
+                input_ref=(
+                    f"{settings.api_v1_prefix}/testcases/inputs/{self.encode_ref(spec)}"
+                ),
+                input_values=values,
+            )
+
+        stress_inputs_generated.inc(delivery="inline")
+        text = await asyncio.to_thread(input_generator.render_input, raw)
+        return StressCase(generator=spec, input=text, input_values=values)
+
+
+stress_inputs = StressInputs(
+    max_values=settings.stress_max_values,
+    inline_max_values=settings.stress_inline_max_values,
+    max_output_chars=settings.stress_max_output_chars,
+)
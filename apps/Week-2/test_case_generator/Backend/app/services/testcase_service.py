@@ -1,97 +1,1158 @@
+import asyncio
+import hashlib
 import json
+import time
+from dataclasses import dataclass
 from datetime import datetime
-from typing import Dict, Any
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
-from app.core.openai_client import openai_client
-from app.core.prompts import get_testcase_generation_prompt, get_system_prompt
-from app.models.schemas import TestCaseRequest, TestCaseResponse, TestCase
+from pydantic import ValidationError
+
+from app.core.deadline import check_deadline, with_deadline
+from app.core.exceptions import UpstreamError
+from app.core.metrics import (
+    completion_truncations,
+    duplicate_cases,
+    generation_duration,
+    invalid_cases,
+    parse_fallbacks,
+    registry,
+    stage_duration,
+    verification_results,
+)
+from app.core.backends.base import Completion
+from app.core.backends.router import get_llm_router
+from app.core.scheduler import Priority, upstream_priority
+from app.core.tokens import TokenPlan, token_budget
+from app.core.prompts import (
+    get_response_format,
+    get_stress_prompt,
+    get_stress_response_format,
+    get_stress_system_prompt,
+    get_testcase_generation_prompt,
+    get_system_prompt,
+)
+from app.config import get_settings
+from app.models.schemas import (
+    BatchItemResult,
+    CacheMode,
+    ReuseInfo,
+    StressCase,
+    StressSpec,
+    TestCaseCategory,
+    TestCaseRequest,
+    TestCaseResponse,
+    TestCase,
+    VerificationMode,
+    VerificationStatus,
+)
+from app.services.cache import response_cache
+from app.services.reuse import ReuseLookup, semantic_store
+from app.services.sandbox import format_output, outputs_match, sandbox
+from app.services.singleflight import SingleFlight
+from app.services.stress import stress_inputs
 from app.services.validator import validator
+from app.utils import json_parse
+from app.utils.json_stream import TestCaseStreamParser
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
+settings = get_settings()
+
+# Completion tokens for one stress input spec (a few params and a sentence)
+STRESS_SPEC_TOKENS = 200
+
+
+@dataclass
+class _ShardCall:
+    """One upstream call of a generation request"""
+
+    request: TestCaseRequest
+    messages: List[Dict[str, str]]
+    max_tokens: int
+    category: Optional[TestCaseCategory] = None
 
 
 class TestCaseService:
     """Service for handling test case generation logic"""
 
-    async def generate_test_cases(self, request: TestCaseRequest) -> TestCaseResponse:
+    def __init__(self):
+        self._inflight = SingleFlight()
+
+    async def generate_test_cases(
+        self, request: TestCaseRequest, cache_mode: CacheMode = CacheMode.USE
+    ) -> TestCaseResponse:
         """
-        Generate test cases using OpenAI
+        Generate test cases, serving repeated requests from the response cache,
+        reusing the test cases of similar past problems and coalescing
+        identical concurrent requests into one upstream call
         Args:
             request: TestCaseRequest with problem details
+            cache_mode: Whether to use, bypass or refresh the cache
         Returns:
             TestCaseResponse with generated test cases
         Raises:
             ValueError: If response parsing fails or validation fails
+            DeadlineExceededError: If the request deadline passes first
             Exception: If OpenAI API call fails
         """
-        try:
-            logger.info(
-                f"Generating {request.num_test_cases} test cases for {request.problem_type} problem"
-            )
+        self.check_request(request)
+        key = response_cache.make_key(request)
+        use_cache = settings.cache_enabled and cache_mode != CacheMode.BYPASS
 
-            # Build the prompt
-            user_prompt = get_testcase_generation_prompt(
-                problem_description=request.problem_description,
-                difficulty=request.difficulty.value,
-                problem_type=request.problem_type.value,
-                num_cases=request.num_test_cases,
-                constraints=request.constraints,
-                include_edge_cases=request.include_edge_cases,
-            )
+        if use_cache and cache_mode == CacheMode.USE:
+            cached = await response_cache.get(key)
+            if cached is not None:
+                logger.info("Serving test cases from cache")
+                return cached
 
-            # Prepare messages for OpenAI
-            messages = [
-                {"role": "system", "content": get_system_prompt()},
-                {"role": "user", "content": user_prompt},
-            ]
+        async def generate_and_store() -> TestCaseResponse:
+            # Stress specs come from a separate small call made alongside
+            stress_task = self._start_stress_cases(request)
+            try:
+                lookup = None
+                if self._reuse_applies(request, cache_mode):
+                    lookup = await semantic_store.lookup(request)
+                result = await self._generate_reusing(request, lookup)
+                # Reused responses come back already verified
+                if request.reference_solution and result.reuse is None:
+                    with stage_duration.time(stage="verification"):
+                        verified = await with_deadline(
+                            self._verify(request, result.test_cases), "verification"
+                        )
+                    result = result.model_copy(update={"test_cases": verified})
+            except BaseException:
+                if stress_task is not None:
+                    stress_task.cancel()
+                raise
+            if stress_task is not None:
+                result = result.model_copy(update={"stress_cases": await stress_task})
+            # Keep a response missing stress cases out of the cache so a
+            # retry can fill them in
+            if use_cache and len(result.stress_cases) == request.stress_cases:
+                await response_cache.set(key, result)
+            if settings.reuse_enabled and self._has_new_cases(result):
+                await semantic_store.record(
+                    request, result, lookup.vector if lookup else None
+                )
+            return result
 
-            logger.debug(f"Prompt length: {len(user_prompt)} characters")
+        # Callers only share a flight when they treat the cache the same way.
+        # The shared call keeps the deadline of the caller that started it;
+        # a caller joining it still stops waiting at its own deadline
+        return await with_deadline(
+            self._inflight.do(f"{cache_mode.value}:{key}", generate_and_store),
+            "generation",
+        )
 
-            # Call OpenAI
-            response = await openai_client.generate_completion(messages)
+    async def generate_batch(
+        self,
+        requests: List[TestCaseRequest],
+        max_concurrency: Optional[int] = None,
+        cache_mode: CacheMode = CacheMode.USE,
+    ) -> AsyncIterator[BatchItemResult]:
+        """
+        Generate test cases for many problems with bounded concurrency
+        A failing item is reported in its own result and never fails the batch.
+        Args:
+            requests: TestCaseRequests to process
+            max_concurrency: Maximum generations in flight at once
+            cache_mode: Whether to use, bypass or refresh the cache
+        Yields:
+            BatchItemResult for each item, in completion order
+        """
+        limit = max_concurrency or settings.batch_max_concurrency
+        semaphore = asyncio.Semaphore(limit)
+
+        logger.info(
+            "Generating batch of %s requests (concurrency=%s)", len(requests), limit
+        )
+
+        async def run_one(index: int, request: TestCaseRequest) -> BatchItemResult:
+            async with semaphore:
+                try:
+                    # Items still waiting when the batch deadline passes fail fast
+                    check_deadline("batch_queue")
+                    result = await self.generate_test_cases(request, cache_mode)
+                    return BatchItemResult(index=index, status="ok", result=result)
+                except Exception as e:
+                    logger.warning("Batch item %s failed: %s", index, e)
+                    return BatchItemResult(
+                        index=index,
+                        status="error",
+                        error=str(e),
+                        error_type=type(e).__name__,
+                    )
+
+        # Interactive requests are admitted upstream ahead of batch items;
+        # tasks copy the context, so the priority applies only to them
+        token = upstream_priority.set(Priority.BATCH)
+        try:
+            tasks = [
+                asyncio.create_task(run_one(index, request))
+                for index, request in enumerate(requests)
+            ]
+        finally:
+            upstream_priority.reset(token)
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Stop outstanding work if the consumer goes away early
+            for task in tasks:
+                task.cancel()
+
+    async def stream_test_cases(
+        self, request: TestCaseRequest, cache_mode: CacheMode = CacheMode.USE
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Stream test cases as the model produces them
+        Each test case is validated and yielded as soon as its JSON object
+        closes, followed by any stress cases, the problem summary and a
+        final "done" event.
+        Args:
+            request: TestCaseRequest with problem details
+            cache_mode: Whether to use, bypass or refresh the cache
+        Yields:
+            (event, payload) tuples: "test_case", "stress_case", "summary"
+            and "done"
+        Raises:
+            ValueError: If no valid test cases were produced
+            Exception: If OpenAI API call fails
+        """
+        self.check_request(request)
+        key = response_cache.make_key(request)
+        use_cache = settings.cache_enabled and cache_mode != CacheMode.BYPASS
 
-            logger.debug(f"Received response of length: {len(response)} characters")
+        if use_cache and cache_mode == CacheMode.USE:
+            cached = await response_cache.get(key)
+            if cached is not None:
+                logger.info("Streaming test cases from cache")
+                for index, test_case in enumerate(cached.test_cases):
+                    yield "test_case", {
+                        "index": index,
+                        "test_case": test_case.model_dump(),
+                    }
+                for index, stress_case in enumerate(cached.stress_cases):
+                    yield "stress_case", {
+                        "index": index,
+                        "stress_case": stress_case.model_dump(),
+                    }
+                yield "summary", {"problem_summary": cached.problem_summary}
+                yield "done", {
+                    "count": len(cached.test_cases),
+                    "generated_at": cached.generated_at,
+                    "cached": True,
+                }
+                return
 
-            # Parse and validate response
-            parsed_data = self._parse_openai_response(response)
+        logger.info(
+            "Streaming %s test cases for %s problem",
+            request.num_test_cases,
+            request.problem_type,
+        )
 
-            # Validate structure
-            if not validator.validate_json_structure(parsed_data):
-                raise ValueError("Invalid JSON structure in OpenAI response")
+        # Stress specs come from a separate small call made alongside
+        stress_task = self._start_stress_cases(request)
+        try:
+            started = time.perf_counter()
+            lookup = None
+            if self._reuse_applies(request, cache_mode):
+                lookup = await semantic_store.lookup(request)
+            reused = await self._reusable_cases(request, lookup)
+            match = lookup.match if reused else None
 
-            # Validate individual test cases
             valid_test_cases = []
-            for test_case in parsed_data["test_cases"]:
-                if validator.validate_test_case_content(test_case):
-                    valid_test_cases.append(test_case)
-                else:
-                    logger.warning(f"Skipping invalid test case: {test_case}")
+            seen_inputs = set()
+            fields: Dict[str, Any] = {}
+            complete = True
+            first_token_at = None
+
+            for test_case in reused:
+                seen_inputs.add(self._input_key(test_case.input))
+                yield "test_case", {
+                    "index": len(valid_test_cases),
+                    "test_case": test_case.model_dump(),
+                }
+                valid_test_cases.append(test_case)
+
+            # Only the test cases a similar past problem did not cover are generated
+            calls = []
+            to_generate = request.num_test_cases - len(reused)
+            if to_generate > 0:
+                with stage_duration.time(stage="prompt_build"):
+                    target = request.model_copy(update={"num_test_cases": to_generate})
+                    if reused:
+                        messages = self._continuation_messages(
+                            request,
+                            to_generate,
+                            [case.model_dump() for case in reused],
+                        )
+                    else:
+                        messages = self._build_messages(request)
+                    plan = self._plan(target, messages)
+                calls = list(plan.shards)
+            continued = False
+
+            upstream_started = time.perf_counter()
+            while calls:
+                num_cases = calls.pop(0)
+                # Shards of a split request, and the top-up of a cut-off stream,
+                # run one after another, each told which inputs were already sent
+                call_messages = messages
+                if plan.is_split or continued:
+                    call_messages = self._continuation_messages(
+                        request,
+                        num_cases,
+                        [test_case.model_dump() for test_case in valid_test_cases],
+                    )
+                parser = TestCaseStreamParser()
+                received = []
+                async for delta in get_llm_router().stream_completion(
+                    call_messages,
+                    max_tokens=plan.max_tokens,
+                    response_format=self._response_format(),
+                ):
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                        stage_duration.observe(
+                            first_token_at - upstream_started,
+                            stage="time_to_first_token",
+                        )
+                    for raw_case in parser.feed(delta):
+                        received.append(raw_case)
+                        with stage_duration.time(stage="validation"):
+                            test_case = self._validate_streamed_case(raw_case)
+                        if test_case is None:
+                            invalid_cases.inc()
+                            continue
+                        input_key = self._input_key(test_case.input)
+                        if input_key in seen_inputs:
+                            duplicate_cases.inc()
+                            logger.debug("Skipping repeated input: %s", test_case.input)
+                            continue
+                        seen_inputs.add(input_key)
+                        if request.reference_solution:
+                            with stage_duration.time(stage="verification"):
+                                (test_case,) = await with_deadline(
+                                    self._verify(request, [test_case]),
+                                    "verification",
+                                )
+                        yield "test_case", {
+                            "index": len(valid_test_cases),
+                            "test_case": test_case.model_dump(),
+                        }
+                        valid_test_cases.append(test_case)
+
+                token_budget.observe(
+                    request.difficulty.value,
+                    len(received),
+                    token_budget.count_text(parser.buffer),
+                )
+                for name, value in parser.fields.items():
+                    fields.setdefault(name, value)
+                if parser.complete:
+                    continue
+
+                # The stream was cut off: top up the missing cases once at the end
+                complete = False
+                missing = request.num_test_cases - len(valid_test_cases)
+                if calls or continued or missing <= 0:
+                    continue
+                if not settings.truncation_continuation_enabled or not received:
+                    completion_truncations.inc(outcome="salvaged")
+                    continue
+                logger.warning(
+                    "Stream truncated after %s test cases, continuing for %s more",
+                    len(valid_test_cases),
+                    missing,
+                )
+                completion_truncations.inc(outcome="continued")
+                calls.append(missing)
+                continued = True
+
+            if to_generate > 0:
+                stage_duration.observe(
+                    time.perf_counter() - upstream_started, stage="upstream_wait"
+                )
 
             if not valid_test_cases:
                 raise ValueError("No valid test cases generated")
 
-            # Create response object
-            response_data = TestCaseResponse(
-                test_cases=[TestCase(**tc) for tc in valid_test_cases],
-                problem_summary=parsed_data["problem_summary"],
+            stress_cases: List[StressCase] = []
+            if stress_task is not None:
+                stress_cases = await stress_task
+                for index, stress_case in enumerate(stress_cases):
+                    yield "stress_case", {
+                        "index": index,
+                        "stress_case": stress_case.model_dump(),
+                    }
+
+            problem_summary = (
+                fields.get("problem_summary")
+                or (match.response.problem_summary if match else None)
+                or "Generated test cases"
+            )
+            yield "summary", {"problem_summary": problem_summary}
+
+            result = TestCaseResponse(
+                test_cases=valid_test_cases,
+                problem_summary=problem_summary,
+                stress_cases=stress_cases,
                 generated_at=datetime.utcnow().isoformat(),
+                reuse=(
+                    ReuseInfo(
+                        similarity=match.similarity,
+                        source_problem=match.problem_description,
+                        reused_test_cases=len(reused),
+                    )
+                    if match
+                    else None
+                ),
+            )
+            if (
+                use_cache
+                and (complete or len(valid_test_cases) >= request.num_test_cases)
+                and len(stress_cases) == request.stress_cases
+            ):
+                await response_cache.set(key, result)
+            if settings.reuse_enabled and self._has_new_cases(result):
+                await semantic_store.record(
+                    request, result, lookup.vector if lookup else None
+                )
+
+            generation_duration.observe(time.perf_counter() - started, mode="stream")
+            logger.info("Successfully streamed %s test cases", len(valid_test_cases))
+            yield "done", {
+                "count": len(valid_test_cases),
+                "generated_at": result.generated_at,
+                "cached": False,
+                "reused": len(reused),
+            }
+        finally:
+            # Stop the stress call if the stream fails or the client goes away
+            if stress_task is not None:
+                stress_task.cancel()
+
+    def _start_stress_cases(self, request: TestCaseRequest) -> Optional[asyncio.Task]:
+        """Start generating the request's stress cases, if it asked for any"""
+        if not request.stress_cases:
+            return None
+        return asyncio.create_task(self._generate_stress_cases(request))
+
+    async def _generate_stress_cases(
+        self, request: TestCaseRequest
+    ) -> List[StressCase]:
+        """
+        Ask the model for stress input specs and materialize them
+        The model only describes each input (sizes, value ranges,
+        distribution, seed); the values are generated on the server. A
+        failure here is logged and yields no stress cases rather than
+        failing the request.
+        Args:
+            request: TestCaseRequest with problem details
+        Returns:
+            Stress cases, possibly fewer than requested
+        """
+        messages = [
+            {
+                "role": "system",
+                "content": get_stress_system_prompt(settings.stress_max_values),
+            },
+            {
+                "role": "user",
+                "content": get_stress_prompt(
+                    problem_description=request.problem_description,
+                    problem_type=request.problem_type.value,
+                    num_cases=request.stress_cases,
+                    constraints=request.constraints,
+                ),
+            },
+        ]
+        try:
+            completion = await get_llm_router().generate_completion(
+                messages,
+                max_tokens=min(
+                    settings.model_max_output_tokens,
+                    STRESS_SPEC_TOKENS * request.stress_cases,
+                ),
+                response_format=(
+                    get_stress_response_format()
+                    if settings.openai_structured_output
+                    else None
+                ),
+            )
+            data = json_parse.loads(validator.clean_json_response(completion.content))
+        except (ValueError, UpstreamError) as e:
+            logger.warning("Stress input specs unavailable: %s", e)
+            return []
+
+        specs = []
+        for raw_spec in (data.get("stress_cases") or [])[: request.stress_cases]:
+            try:
+                spec = StressSpec.model_validate(raw_spec)
+                stress_inputs.check(spec)
+            except ValueError as e:
+                invalid_cases.inc()
+                logger.warning("Skipping invalid stress input spec: %s", e)
+                continue
+            specs.append(spec)
+
+        stress_cases = await stress_inputs.build(
+            specs, request.reference_solution, request.entry_point
+        )
+        logger.info("Generated %s stress inputs", len(stress_cases))
+        return stress_cases
+
+    @staticmethod
+    def check_request(request: TestCaseRequest) -> None:
+        """
+        Reject reference solutions up front when the sandbox is disabled
+        Also used by the job API, so a job that can never run fails at submission.
+        Raises:
+            ValueError: If the request has a reference solution that cannot be run
+        """
+        if request.reference_solution and not settings.sandbox_enabled:
+            raise ValueError(
+                "Reference solution verification is disabled on this server"
+            )
+
+    async def _verify(
+        self, request: TestCaseRequest, test_cases: List[TestCase]
+    ) -> List[TestCase]:
+        """
+        Check expected outputs by running the reference solution on every input
+        Args:
+            request: TestCaseRequest with the reference solution
+            test_cases: Test cases to check
+        Returns:
+            Test cases with their verification status; in correct mode the
+            expected output of a mismatching case is replaced
+        """
+        results = await sandbox.run_many(
+            request.reference_solution,
+            request.entry_point,
+            [test_case.input for test_case in test_cases],
+        )
+
+        verified = []
+        for test_case, result in zip(test_cases, results):
+            if not result.ok:
+                update = {
+                    "verification": VerificationStatus.ERROR,
+                    "verification_detail": result.error,
+                }
+            elif outputs_match(test_case.expected_output, result.output):
+                update = {"verification": VerificationStatus.PASSED}
+            elif request.verification_mode == VerificationMode.CORRECT:
+                update = {
+                    "expected_output": format_output(result.output),
+                    "verification": VerificationStatus.CORRECTED,
+                    "verification_detail": (
+                        f"Model expected {test_case.expected_output}"
+                    ),
+                }
+            else:
+                update = {
+                    "verification": VerificationStatus.MISMATCH,
+                    "verification_detail": format_output(result.output),
+                }
+            verification_results.inc(status=update["verification"].value)
+            verified.append(test_case.model_copy(update=update))
+
+        logger.info(
+            "Verified %s test cases against the reference solution", len(verified)
+        )
+        return verified
+
+    def _build_messages(
+        self,
+        request: TestCaseRequest,
+        category: Optional[TestCaseCategory] = None,
+    ) -> List[Dict[str, str]]:
+        """
+        Build the chat messages for a generation request
+        Args:
+            request: TestCaseRequest with problem details
+            category: Kind of test case to focus on, for sharded generation
+        Returns:
+            List of message dictionaries for the chat completion
+        """
+        system_prompt = get_system_prompt(
+            difficulty=request.difficulty.value,
+            include_edge_cases=request.include_edge_cases,
+        )
+        user_prompt = get_testcase_generation_prompt(
+            problem_description=request.problem_description,
+            problem_type=request.problem_type.value,
+            num_cases=request.num_test_cases,
+            constraints=request.constraints,
+            category=category.value if category else None,
+        )
+
+        # Static prefix first so the provider can reuse its cached prompt
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ]
+
+    def _continuation_messages(
+        self,
+        request: TestCaseRequest,
+        missing: int,
+        existing: List[Dict[str, Any]],
+        category: Optional[TestCaseCategory] = None,
+    ) -> List[Dict[str, str]]:
+        """
+        Build the messages for a follow-up call on a request
+        Args:
+            request: Original TestCaseRequest
+            missing: Number of test cases still needed
+            existing: Test cases already received, so they are not repeated
+            category: Kind of test case to focus on, if sharded
+        Returns:
+            List of message dictionaries for the chat completion
+        """
+        messages = self._build_messages(
+            request.model_copy(update={"num_test_cases": missing}), category
+        )
+        if existing:
+            covered = "\n".join(f"- {case.get('input')}" for case in existing)
+            messages[-1]["content"] += (
+                "\n\nThese inputs are already covered, so generate different ones:\n"
+                + covered
+            )
+        return messages
+
+    @staticmethod
+    def _input_key(test_input: str) -> bytes:
+        """
+        Key identifying a test case input
+        Inputs are compared with all whitespace removed, so
+        "nums = [1, 2]" and "nums=[1,2]" count as the same input.
+        Args:
+            test_input: Input of a test case
+        Returns:
+            Digest of the normalized input
+        """
+        normalized = "".join(test_input.split())
+        return hashlib.blake2b(normalized.encode(), digest_size=16).digest()
+
+    @staticmethod
+    def _response_format() -> Optional[Dict[str, Any]]:
+        """
+        Get the structured-output format to request, if enabled
+        Returns:
+            response_format for the completion, or None for free-form JSON
+        """
+        if settings.openai_structured_output:
+            return get_response_format()
+        return None
+
+    @staticmethod
+    def _validate_streamed_case(raw_case: Dict[str, Any]) -> Optional[TestCase]:
+        """
+        Validate a single streamed test case
+        Args:
+            raw_case: Test case dictionary decoded from the stream
+        Returns:
+            TestCase if valid, None otherwise
+        """
+        if not validator.validate_test_case_structure(
+            raw_case
+        ) or not validator.validate_test_case_content(raw_case):
+            logger.warning("Skipping invalid test case: %s", raw_case)
+            return None
+        try:
+            return TestCase(**raw_case)
+        except ValidationError as e:
+            logger.warning("Skipping invalid test case: %s", e)
+            return None
+
+    def _plan(
+        self, request: TestCaseRequest, messages: List[Dict[str, str]]
+    ) -> TokenPlan:
+        """
+        Size the completion budget for a request before calling upstream
+        Args:
+            request: TestCaseRequest with problem details
+            messages: Chat messages for the full request
+        Returns:
+            TokenPlan with max_tokens and the test cases per upstream call
+        Raises:
+            TokenBudgetError: If the prompt does not fit the model
+        """
+        if not settings.token_budget_enabled:
+            return TokenPlan(
+                prompt_tokens=0,
+                max_tokens=settings.openai_max_tokens,
+                shards=[request.num_test_cases],
+            )
+
+        plan = token_budget.plan(
+            messages, request.num_test_cases, request.difficulty.value
+        )
+        logger.debug(
+            "Token plan: prompt=%s max_tokens=%s shards=%s",
+            plan.prompt_tokens,
+            plan.max_tokens,
+            plan.shards,
+        )
+        return plan
+
+    def _plan_calls(self, request: TestCaseRequest) -> List["_ShardCall"]:
+        """
+        Decide the upstream calls for a request
+        Large requests are split by test case category when sharded
+        generation is enabled; any call whose output cannot fit one
+        completion is further split by count.
+        Args:
+            request: TestCaseRequest with problem details
+        Returns:
+            Calls to make concurrently
+        Raises:
+            TokenBudgetError: If the prompt does not fit the model
+        """
+        if (
+            settings.shard_generation_enabled
+            and request.num_test_cases >= settings.shard_min_cases
+        ):
+            shards = self._allocate_categories(request)
+        else:
+            shards = [(None, request.num_test_cases)]
+
+        calls = []
+        for category, num_cases in shards:
+            shard = request.model_copy(update={"num_test_cases": num_cases})
+            messages = self._build_messages(shard, category)
+            plan = self._plan(shard, messages)
+            if not plan.is_split:
+                calls.append(_ShardCall(shard, messages, plan.max_tokens, category))
+                continue
+            for count in plan.shards:
+                part = request.model_copy(update={"num_test_cases": count})
+                calls.append(
+                    _ShardCall(
+                        part,
+                        self._build_messages(part, category),
+                        plan.max_tokens,
+                        category,
+                    )
+                )
+        return calls
+
+    @staticmethod
+    def _allocate_categories(
+        request: TestCaseRequest,
+    ) -> List[Tuple[TestCaseCategory, int]]:
+        """
+        Spread the requested test cases evenly over the categories
+        Args:
+            request: TestCaseRequest with problem details
+        Returns:
+            (category, number of test cases) for every non-empty shard
+        """
+        if request.include_edge_cases:
+            categories = list(TestCaseCategory)
+        else:
+            categories = [TestCaseCategory.BASIC, TestCaseCategory.PROBLEM_SPECIFIC]
+
+        base, extra = divmod(request.num_test_cases, len(categories))
+        counts = [base + (1 if i < extra else 0) for i in range(len(categories))]
+        return [
+            (category, count) for category, count in zip(categories, counts) if count
+        ]
+
+    async def _generate(self, request: TestCaseRequest) -> TestCaseResponse:
+        """
+        Generate test cases using OpenAI
+        Requests that are sharded or whose output cannot fit one completion
+        are split into several calls made concurrently; their results are
+        merged, duplicate inputs dropped and any shortfall topped up.
+        Args:
+            request: TestCaseRequest with problem details
+        Returns:
+            TestCaseResponse with generated test cases
+        Raises:
+            TokenBudgetError: If the request cannot fit the model's limits
+            ValueError: If response parsing fails or validation fails
+            Exception: If OpenAI API call fails
+        """
+        logger.info(
+            "Generating %s test cases for %s problem",
+            request.num_test_cases,
+            request.problem_type,
+        )
+
+        started = time.perf_counter()
+        with stage_duration.time(stage="prompt_build"):
+            calls = self._plan_calls(request)
+
+        if len(calls) == 1:
+            call = calls[0]
+            result = await self._generate_single(
+                call.request, call.messages, call.max_tokens
+            )
+            generation_duration.observe(time.perf_counter() - started, mode="standard")
+            return result
+
+        logger.info(
+            "Splitting %s test cases across %s parallel calls",
+            request.num_test_cases,
+            len(calls),
+        )
+
+        outcomes = await asyncio.gather(
+            *(
+                self._generate_single(
+                    call.request, call.messages, call.max_tokens, call.category
+                )
+                for call in calls
+            ),
+            return_exceptions=True,
+        )
+        parts = [part for part in outcomes if isinstance(part, TestCaseResponse)]
+        if not parts:
+            raise outcomes[0]
+        if len(parts) < len(outcomes):
+            logger.warning(
+                "%s of %s calls failed, returning partial results",
+                len(outcomes) - len(parts),
+                len(outcomes),
+            )
+
+        test_cases = self._dedupe_test_cases(
+            [test_case for part in parts for test_case in part.test_cases]
+        )
+        for _ in range(settings.shard_max_topups):
+            missing = request.num_test_cases - len(test_cases)
+            if missing <= 0:
+                break
+            topup = await self._top_up(request, missing, test_cases)
+            if topup is None:
+                break
+            test_cases = self._dedupe_test_cases(test_cases + topup.test_cases)
+
+        mode = "sharded" if calls[0].category is not None else "split"
+        generation_duration.observe(time.perf_counter() - started, mode=mode)
+        return TestCaseResponse(
+            test_cases=test_cases,
+            problem_summary=parts[0].problem_summary,
+            generated_at=datetime.utcnow().isoformat(),
+        )
+
+    async def _generate_reusing(
+        self, request: TestCaseRequest, lookup: Optional[ReuseLookup]
+    ) -> TestCaseResponse:
+        """
+        Generate test cases, starting from those of a similar past problem
+        Reused test cases are kept only if the reference solution agrees with
+        them; the ones still missing are generated and verified.
+        Args:
+            request: TestCaseRequest with problem details
+            lookup: Result of the semantic reuse lookup, if one was made
+        Returns:
+            TestCaseResponse, with reuse set when a past problem was used
+        Raises:
+            TokenBudgetError: If the request cannot fit the model's limits
+            ValueError: If response parsing fails or validation fails
+            Exception: If OpenAI API call fails
+        """
+        reused = await self._reusable_cases(request, lookup)
+        if not reused:
+            return await self._generate(request)
+
+        started = time.perf_counter()
+        match = lookup.match
+        logger.info(
+            "Reusing %s test cases from a similar problem (similarity %.3f)",
+            len(reused),
+            match.similarity,
+        )
+
+        test_cases = list(reused)
+        missing = request.num_test_cases - len(reused)
+        if missing > 0:
+            topup = await self._top_up(request, missing, reused)
+            if topup is not None:
+                with stage_duration.time(stage="verification"):
+                    verified = await with_deadline(
+                        self._verify(request, topup.test_cases), "verification"
+                    )
+                test_cases = self._dedupe_test_cases(test_cases + verified)
+
+        generation_duration.observe(time.perf_counter() - started, mode="reused")
+        return TestCaseResponse(
+            test_cases=test_cases,
+            problem_summary=match.response.problem_summary,
+            generated_at=datetime.utcnow().isoformat(),
+            reuse=ReuseInfo(
+                similarity=match.similarity,
+                source_problem=match.problem_description,
+                reused_test_cases=len(reused),
+            ),
+        )
+
+    @staticmethod
+    def _reuse_applies(request: TestCaseRequest, cache_mode: CacheMode) -> bool:
+        """Whether to look for a similar past problem; reuse needs a reference solution"""
+        return (
+            settings.reuse_enabled
+            and cache_mode == CacheMode.USE
+            and bool(request.reference_solution)
+        )
+
+    async def _reusable_cases(
+        self, request: TestCaseRequest, lookup: Optional[ReuseLookup]
+    ) -> List[TestCase]:
+        """
+        Re-verify the test cases of a similar past problem
+        Similar descriptions can still ask for different answers (maximum vs
+        minimum subarray sum), so cases the reference solution rejects or
+        cannot run are dropped.
+        Args:
+            request: TestCaseRequest with the reference solution
+            lookup: Result of the semantic reuse lookup, if one was made
+        Returns:
+            Up to num_test_cases reused test cases, or an empty list
+        """
+        if lookup is None or lookup.match is None:
+            return []
+
+        with stage_duration.time(stage="verification"):
+            verified = await with_deadline(
+                self._verify(request, lookup.match.response.test_cases),
+                "verification",
+            )
+        reusable = [
+            test_case
+            for test_case in verified
+            if test_case.verification
+            not in (VerificationStatus.MISMATCH, VerificationStatus.ERROR)
+        ]
+        if len(reusable) < len(verified):
+            logger.info(
+                "Dropped %s reused test cases the reference solution rejected",
+                len(verified) - len(reusable),
             )
+        return reusable[: request.num_test_cases]
+
+    @staticmethod
+    def _has_new_cases(result: TestCaseResponse) -> bool:
+        """Whether a response holds test cases the reuse store has not seen"""
+        return result.reuse is None or result.reuse.reused_test_cases < len(
+            result.test_cases
+        )
+
+    async def _top_up(
+        self, request: TestCaseRequest, missing: int, existing: List[TestCase]
+    ) -> Optional[TestCaseResponse]:
+        """
+        Generate the test cases still missing after merging shards
+        Args:
+            request: Original TestCaseRequest
+            missing: Number of test cases still needed
+            existing: Test cases already generated, so they are not repeated
+        Returns:
+            TestCaseResponse with the extra test cases, or None if the call failed
+        """
+        logger.info("Topping up %s missing test cases", missing)
+        shard = request.model_copy(update={"num_test_cases": missing})
+        messages = self._continuation_messages(
+            request, missing, [test_case.model_dump() for test_case in existing]
+        )
+        try:
+            plan = self._plan(shard, messages)
+            return await self._generate_single(shard, messages, plan.max_tokens)
+        except (ValueError, UpstreamError) as e:
+            logger.warning("Top-up call failed: %s", e)
+            return None
+
+    @classmethod
+    def _dedupe_test_cases(cls, test_cases: List[TestCase]) -> List[TestCase]:
+        """
+        Drop test cases whose input repeats an earlier one
+        Args:
+            test_cases: Test cases in priority order
+        Returns:
+            First occurrence of every distinct input
+        """
+        seen = set()
+        unique = []
+        for test_case in test_cases:
+            digest = cls._input_key(test_case.input)
+            if digest in seen:
+                duplicate_cases.inc()
+                continue
+            seen.add(digest)
+            unique.append(test_case)
+        return unique
+
+    async def _generate_single(
+        self,
+        request: TestCaseRequest,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        category: Optional[TestCaseCategory] = None,
+    ) -> TestCaseResponse:
+        """
+        Generate test cases with one upstream call
+        Args:
+            request: TestCaseRequest with problem details
+            messages: Chat messages for the request
+            max_tokens: Completion token limit
+            category: Kind of test case the call focuses on, if sharded
+        Returns:
+            TestCaseResponse with generated test cases
+        Raises:
+            ValueError: If response parsing fails or validation fails
+            Exception: If OpenAI API call fails
+        """
+        try:
+            user_prompt = messages[-1]["content"]
+
+            logger.debug("Prompt length: %s characters", len(user_prompt))
+
+            # Call OpenAI
+            with stage_duration.time(stage="upstream_wait"):
+                completion = await get_llm_router().generate_completion(
+                    messages,
+                    max_tokens=max_tokens,
+                    response_format=self._response_format(),
+                )
+            response = completion.content
+
+            logger.debug("Received response of length: %s characters", len(response))
+
+            # Parse and validate response, unless the client has stopped waiting
+            check_deadline("parse")
+            with stage_duration.time(stage="parse"):
+                parsed_data = self._parse_openai_response(response)
+
+            self._observe_output(request, parsed_data, completion)
+
+            if completion.truncated:
+                parsed_data = await self._continue_truncated(
+                    request, parsed_data, category
+                )
+
+            with stage_duration.time(stage="validation"):
+                # Validate structure
+                if not validator.validate_json_structure(parsed_data):
+                    raise ValueError("Invalid JSON structure in OpenAI response")
+
+                # Validate individual test cases
+                valid_test_cases = []
+                for test_case in parsed_data["test_cases"]:
+                    if validator.validate_test_case_content(test_case):
+                        valid_test_cases.append(test_case)
+                    else:
+                        invalid_cases.inc()
+                        logger.warning("Skipping invalid test case: %s", test_case)
 
-            logger.info(f"Successfully generated {len(valid_test_cases)} test cases")
+                if not valid_test_cases:
+                    raise ValueError("No valid test cases generated")
+
+                # One validation pass over the raw dicts, in pydantic-core
+                response_data = TestCaseResponse.model_validate(
+                    {
+                        "test_cases": valid_test_cases,
+                        "problem_summary": parsed_data["problem_summary"],
+                        "generated_at": datetime.utcnow().isoformat(),
+                    }
+                )
+
+            logger.info("Successfully generated %s test cases", len(valid_test_cases))
 
             return response_data
 
         except json.JSONDecodeError as e:
-            logger.error(f"JSON parsing error: {str(e)}")
+            logger.error("JSON parsing error: %s", e)
             raise ValueError(f"Failed to parse OpenAI response as JSON: {str(e)}")
         except ValueError as e:
-            logger.error(f"Validation error: {str(e)}")
+            logger.error("Validation error: %s", e)
+            raise
+        except UpstreamError:
             raise
         except Exception as e:
-            logger.error(f"Unexpected error in generate_test_cases: {str(e)}")
+            logger.error("Unexpected error in generate_test_cases: %s", e)
             raise Exception(f"Failed to generate test cases: {str(e)}")
 
+    def _observe_output(
+        self,
+        request: TestCaseRequest,
+        parsed_data: Dict[str, Any],
+        completion: Completion,
+    ) -> None:
+        """Feed the output size of a completion into the token budget"""
+        tokens = completion.completion_tokens
+        if tokens is None:
+            tokens = token_budget.count_text(completion.content)
+        token_budget.observe(
+            request.difficulty.value, len(parsed_data.get("test_cases") or []), tokens
+        )
+
+    async def _continue_truncated(
+        self,
+        request: TestCaseRequest,
+        parsed_data: Dict[str, Any],
+        category: Optional[TestCaseCategory] = None,
+    ) -> Dict[str, Any]:
+        """
+        Top up a completion that was cut off at max_tokens
+        The test cases salvaged from the partial JSON are kept and one short
+        call asks only for the missing ones. If that call fails, the salvaged
+        cases are returned on their own.
+        Args:
+            request: Original TestCaseRequest
+            parsed_data: Document salvaged from the truncated completion
+            category: Kind of test case the original call focused on
+        Returns:
+            Document with the salvaged and the continuation test cases
+        """
+        salvaged = [
+            case
+            for case in parsed_data.get("test_cases") or []
+            if validator.validate_test_case_structure(case)
+        ]
+        missing = request.num_test_cases - len(salvaged)
+        if missing <= 0 or not settings.truncation_continuation_enabled:
+            completion_truncations.inc(outcome="salvaged")
+            return parsed_data
+
+        logger.warning(
+            "Response truncated after %s test cases, continuing for %s more",
+            len(salvaged),
+            missing,
+        )
+        max_tokens = settings.openai_max_tokens
+        if settings.token_budget_enabled:
+            max_tokens = token_budget.completion_budget(
+                missing, request.difficulty.value
+            )
+
+        try:
+            with stage_duration.time(stage="continuation"):
+                completion = await get_llm_router().generate_completion(
+                    self._continuation_messages(request, missing, salvaged, category),
+                    max_tokens=max_tokens,
+                    response_format=self._response_format(),
+                )
+                extra = self._parse_openai_response(completion.content)
+        except (ValueError, UpstreamError) as e:
+            logger.warning("Continuation failed, keeping salvaged test cases: %s", e)
+            completion_truncations.inc(outcome="salvaged")
+            return {**parsed_data, "test_cases": salvaged}
+
+        self._observe_output(request, extra, completion)
+        completion_truncations.inc(outcome="continued")
+        extra_cases = [
+            case
+            for case in extra.get("test_cases") or []
+            if validator.validate_test_case_structure(case)
+        ]
+        return {**parsed_data, "test_cases": salvaged + extra_cases[:missing]}
+
     def _parse_openai_response(self, response: str) -> Dict[str, Any]:
         """
         Parse and clean OpenAI response
@@ -105,28 +1166,38 @@ class TestCaseService:
         # Clean the response
         clean_response = validator.clean_json_response(response)
 
-        logger.debug(f"Cleaned response: {clean_response[:200]}...")
+        logger.debug("Cleaned response: %s...", clean_response[:200])
 
-        # Parse JSON
         try:
-            data = json.loads(clean_response)
-            return data
+            return json_parse.loads(clean_response)
         except json.JSONDecodeError:
-            # Try to extract JSON from response if it's wrapped in text
-            # Look for { ... } pattern
-            import re
-
-            json_match = re.search(r"\{.*\}", clean_response, re.DOTALL)
-            if json_match:
-                try:
-                    data = json.loads(json_match.group(0))
-                    logger.warning("Extracted JSON from wrapped response")
-                    return data
-                except json.JSONDecodeError:
-                    pass
+            # Recover wrapped or truncated output instead of regenerating it
+            repaired = json_parse.repair_test_case_document(clean_response)
+            if repaired is None:
+                raise
 
-            # If all else fails, raise the original error
-            raise
+        method, data = repaired
+        parse_fallbacks.inc(method=method)
+        if method == "salvage":
+            data.setdefault("problem_summary", "Generated test cases")
+            logger.warning(
+                "Salvaged %s test cases from a truncated response",
+                len(data["test_cases"]),
+            )
+        else:
+            logger.warning("Extracted JSON from wrapped response")
+        return data
 
 
 testcase_service = TestCaseService()
+
+registry.callback(
+    "testcase_singleflight_total",
+    "Generation calls executed upstream vs. coalesced onto an in-flight call",
+    "counter",
+    lambda: {
+        ("executed",): testcase_service._inflight.executions,
+        ("coalesced",): testcase_service._inflight.coalesced,
+    },
+    ["result"],
+)
@@ -30,22 +30,37 @@ class TestCaseValidator:
                 return False
 
             for idx, test_case in enumerate(data["test_cases"]):
-                if not isinstance(test_case, dict):
-                    logger.error(f"Test case {idx} is not a dictionary")
+                if not TestCaseValidator.validate_test_case_structure(test_case, idx):
                     return False
 
-                required_fields = ["input", "expected_output"]
-                for field in required_fields:
-                    if field not in test_case:
-                        logger.error(f"Test case {idx} missing '{field}' field")
-                        return False
-
             return True
 
         except Exception as e:
-            logger.error(f"Validation error: {str(e)}")
+            logger.error("Validation error: %s", e)
+            return False
+
+    @staticmethod
+    def validate_test_case_structure(test_case: Any, idx: int = 0) -> bool:
+        """
+        Validate that a single test case has the required fields
+        Args:
+            test_case: Individual test case from the parsed response
+            idx: Position of the test case, used in log messages
+        Returns:
+            True if valid, False otherwise
+        """
+        if not isinstance(test_case, dict):
+            logger.error("Test case %s is not a dictionary", idx)
             return False
 
+        required_fields = ["input", "expected_output"]
+        for field in required_fields:
+            if field not in test_case:
+                logger.error("Test case %s missing '%s' field", idx, field)
+                return False
+
+        return True
+
     @staticmethod
     def validate_test_case_content(test_case: Dict[str, Any]) -> bool:
         """
@@ -67,7 +82,7 @@ class TestCaseValidator:
             return True
 
         except Exception as e:
-            logger.error(f"Test case content validation error: {str(e)}")
+            logger.error("Test case content validation error: %s", e)
             return False
 
     @staticmethod
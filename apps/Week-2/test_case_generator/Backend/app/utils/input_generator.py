@@ -0,0 +1,187 @@
+"""
+Materialize stress inputs from generator specs (StressSpec dumped to a dict)
+
+The same spec always produces the same input within one installation.
+"""
+
+import json
+import random
+from typing import Any, Dict, Iterator, List
+
+try:
+    import numpy as np
+except ImportError:  # generated with the standard library instead
+    np = None
+
+DEFAULT_ALPHABET = "abcdefghijklmnopqrstuvwxyz"
+
+# Array elements rendered per chunk when streaming an input
+RENDER_CHUNK = 65536
+
+
+def count_values(spec: Dict[str, Any]) -> int:
+    """
+    Count the integers and characters an input spec generates
+    Args:
+        spec: Generator spec
+    Returns:
+        Total number of values over all arguments
+    """
+    return sum(
+        1 if param["kind"] == "int" else param["length"] for param in spec["params"]
+    )
+
+
+def generate_arguments(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Generate the argument values of an input spec
+    Args:
+        spec: Generator spec
+    Returns:
+        Argument name to int, list of ints or str, in call order
+    """
+    values = _generate(spec)
+    return {
+        name: (
+            value.tolist()
+            if np is not None and isinstance(value, np.ndarray)
+            else value
+        )
+        for name, value in values.items()
+    }
+
+
+def iter_input_text(spec: Dict[str, Any]) -> Iterator[str]:
+    """
+    Render an input spec as test case input text, piece by piece
+    The text has the usual form, e.g. "nums = [3,1,2], target = 5", and is
+    produced in chunks so a large input never has to be held as one string.
+    Args:
+        spec: Generator spec
+    Yields:
+        Consecutive pieces of the input text
+    """
+    for index, (name, value) in enumerate(_generate(spec).items()):
+        yield f"{', ' if index else ''}{name} = "
+        if isinstance(value, (int, str)):
+            yield json.dumps(value)
+            continue
+        yield "["
+        for start in range(0, len(value), RENDER_CHUNK):
+            chunk = value[start : start + RENDER_CHUNK]
+            if np is not None and isinstance(chunk, np.ndarray):
+                chunk = chunk.tolist()
+            yield ("," if start else "") + ",".join(map(str, chunk))
+        yield "]"
+
+
+def render_input(spec: Dict[str, Any]) -> str:
+    """Render an input spec as one test case input string"""
+    return "".join(iter_input_text(spec))
+
+
+def _generate(spec: Dict[str, Any]) -> Dict[str, Any]:
+    # One stream per spec, consumed in parameter order
+    if np is not None:
+        rng = np.random.default_rng(spec["seed"] % 2**64)
+        generate_param = _numpy_param
+    else:
+        rng = random.Random(spec["seed"])
+        generate_param = _stdlib_param
+    return {param["name"]: generate_param(param, rng) for param in spec["params"]}
+
+
+def _numpy_param(param: Dict[str, Any], rng: Any) -> Any:
+    low, high = param["min_value"], param["max_value"]
+    length = param["length"]
+    distribution = param["distribution"]
+
+    if param["kind"] == "int":
+        return int(rng.integers(low, high, endpoint=True))
+
+    if param["kind"] == "string":
+        alphabet = np.frombuffer(
+            (param.get("alphabet") or DEFAULT_ALPHABET).encode("utf-32-le"),
+            dtype=np.uint32,
+        )
+        if distribution == "distinct":
+            codes = rng.permutation(np.unique(alphabet))[:length]
+        elif distribution == "constant":
+            codes = np.full(length, rng.choice(alphabet), dtype=np.uint32)
+        else:
+            codes = alphabet[rng.integers(0, len(alphabet), size=length)]
+            if distribution == "sorted":
+                codes.sort()
+            elif distribution == "reverse_sorted":
+                codes = np.sort(codes)[::-1]
+        return codes.astype(np.uint32).tobytes().decode("utf-32-le")
+
+    if distribution == "constant":
+        return np.full(length, rng.integers(low, high, endpoint=True), dtype=np.int64)
+    if distribution == "distinct":
+        values = _numpy_distinct(rng, low, high, length)
+    else:
+        values = rng.integers(low, high, size=length, endpoint=True, dtype=np.int64)
+        if distribution == "sorted":
+            values.sort()
+        elif distribution == "reverse_sorted":
+            values = np.sort(values)[::-1]
+    return values
+
+
+def _numpy_distinct(rng: Any, low: int, high: int, length: int) -> Any:
+    span = high - low + 1
+    if span <= 4 * length:
+        # Dense range: a permutation of the range itself is cheap
+        return rng.permutation(span)[:length].astype(np.int64) + low
+
+    # Sparse range: oversample, drop repeats, and draw again if short
+    values = _sorted_unique(
+        rng.integers(low, high, size=length + length // 8 + 16, endpoint=True)
+    )
+    while len(values) < length:
+        extra = rng.integers(low, high, size=length - len(values) + 16, endpoint=True)
+        values = _sorted_unique(np.concatenate([values, extra]))
+    return rng.permutation(values)[:length]
+
+
+def _sorted_unique(values: Any) -> Any:
+    # Plain sort and compare; several times faster than np.unique here
+    values.sort()
+    keep = np.empty(len(values), dtype=bool)
+    keep[:1] = True
+    np.not_equal(values[1:], values[:-1], out=keep[1:])
+    return values[keep]
+
+
+def _stdlib_param(param: Dict[str, Any], rng: random.Random) -> Any:
+    low, high = param["min_value"], param["max_value"]
+    length = param["length"]
+    distribution = param["distribution"]
+
+    if param["kind"] == "int":
+        return rng.randint(low, high)
+
+    if param["kind"] == "string":
+        alphabet = param.get("alphabet") or DEFAULT_ALPHABET
+        if distribution == "distinct":
+            return "".join(rng.sample(sorted(set(alphabet)), length))
+        if distribution == "constant":
+            return rng.choice(alphabet) * length
+        chars = rng.choices(alphabet, k=length)
+        return "".join(_arrange(chars, distribution))
+
+    if distribution == "constant":
+        return [rng.randint(low, high)] * length
+    if distribution == "distinct":
+        # sample() picks from a range without materializing it
+        return rng.sample(range(low, high + 1), length)
+    return _arrange(rng.choices(range(low, high + 1), k=length), distribution)
+
+
+def _arrange(values: List[Any], distribution: str) -> List[Any]:
+    if distribution == "sorted":
+        values.sort()
+    elif distribution == "reverse_sorted":
+        values.sort(reverse=True)
+    return values
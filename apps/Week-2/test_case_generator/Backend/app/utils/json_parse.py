@@ -0,0 +1,78 @@
+"""
+Fast JSON encoding and decoding, and bounded repair of model output
+"""
+
+import json
+from typing import Any, Dict, Optional, Tuple
+
+from app.utils.json_stream import TestCaseStreamParser
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+_decoder = json.JSONDecoder()
+
+
+def loads(text: str) -> Any:
+    """
+    Decode a JSON document, using orjson when it is installed
+    Args:
+        text: JSON text
+    Returns:
+        Decoded value
+    Raises:
+        json.JSONDecodeError: If the text is not valid JSON (orjson's error
+            type subclasses it)
+    """
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def dumps(value: Any) -> str:
+    """
+    Encode a value as compact JSON, using orjson when it is installed
+    Args:
+        value: JSON-serializable value
+    Returns:
+        JSON text
+    """
+    if orjson is not None:
+        return orjson.dumps(value).decode("utf-8")
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def repair_test_case_document(
+    text: str, array_key: str = "test_cases"
+) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """
+    Recover a test case document that failed to decode as a whole
+    Two linear passes are tried, in order:
+      "extract": decode the first complete JSON object and ignore any text
+          before or after it (prose, a stray code fence)
+      "salvage": scan a truncated document and keep every test case object
+          that was closed, plus top-level string fields seen so far
+    Args:
+        text: Model output that is not valid JSON on its own
+        array_key: Key of the test case array
+    Returns:
+        (method, document) tuple, or None if nothing could be recovered
+    """
+    start = text.find("{")
+    if start < 0:
+        return None
+
+    try:
+        data, _ = _decoder.raw_decode(text, start)
+        if isinstance(data, dict):
+            return "extract", data
+    except json.JSONDecodeError:
+        pass
+
+    parser = TestCaseStreamParser(array_key)
+    test_cases = parser.feed(text[start:])
+    if not test_cases:
+        return None
+    return "salvage", {**parser.fields, array_key: test_cases}
@@ -0,0 +1,123 @@
+"""
+Incremental parser for streamed test case payloads
+"""
+
+import json
+from typing import Any, Dict, List, Optional
+
+
+class TestCaseStreamParser:
+    """
+    Incrementally scan a streamed ``{"test_cases": [...], ...}`` document
+
+    Chunks are fed as they arrive from the model. Every object inside the
+    top-level ``test_cases`` array is returned as soon as its closing brace
+    is seen, and top-level string values (e.g. ``problem_summary``) are
+    captured on the way. Text outside the top-level object, such as a
+    stray markdown code fence, is ignored.
+    """
+
+    def __init__(self, array_key: str = "test_cases"):
+        self.array_key = array_key
+        self.fields: Dict[str, Any] = {}
+        self.buffer = ""
+        self.complete = False
+
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = -1
+        self._last_key: Optional[str] = None
+        self._expecting_value = False
+        self._in_array = False
+        self._object_start = -1
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """
+        Consume a chunk of model output
+        Args:
+            chunk: Next piece of streamed text
+        Returns:
+            Test case dictionaries completed by this chunk, in order
+        """
+        self.buffer += chunk
+        completed: List[Dict[str, Any]] = []
+        buf = self.buffer
+
+        for i in range(self._pos, len(buf)):
+            ch = buf[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._on_string_end(i)
+                continue
+
+            if ch == '"':
+                if self._stack:
+                    self._in_string = True
+                    self._string_start = i
+            elif ch in "{[":
+                if not self._stack and ch == "[":
+                    continue
+                if self._in_array and len(self._stack) == 2 and ch == "{":
+                    self._object_start = i
+                if len(self._stack) == 1 and ch == "[" and self._is_array_value():
+                    self._in_array = True
+                self._stack.append(ch)
+            elif ch in "}]":
+                if not self._stack:
+                    continue
+                self._stack.pop()
+                depth = len(self._stack)
+                if (
+                    self._in_array
+                    and depth == 2
+                    and ch == "}"
+                    and self._object_start >= 0
+                ):
+                    item = self._decode(buf[self._object_start : i + 1])
+                    if isinstance(item, dict):
+                        completed.append(item)
+                    self._object_start = -1
+                elif self._in_array and depth == 1 and ch == "]":
+                    self._in_array = False
+                elif depth == 0:
+                    self.complete = True
+            elif len(self._stack) == 1:
+                if ch == ":":
+                    self._expecting_value = True
+                elif ch == ",":
+                    self._expecting_value = False
+                    self._last_key = None
+
+        self._pos = len(buf)
+        return completed
+
+    def _is_array_value(self) -> bool:
+        return self._expecting_value and self._last_key == self.array_key
+
+    def _on_string_end(self, end: int) -> None:
+        """Record top-level keys and string values"""
+        if len(self._stack) != 1:
+            return
+        value = self._decode(self.buffer[self._string_start : end + 1])
+        if not isinstance(value, str):
+            return
+        if self._expecting_value:
+            if self._last_key is not None:
+                self.fields[self._last_key] = value
+        else:
+            self._last_key = value
+
+    @staticmethod
+    def _decode(raw: str) -> Any:
+        try:
+            return json.loads(raw)
+        except json.JSONDecodeError:
+            return None
@@ -1,33 +1,133 @@
 """
-Logging configuration for the application
+Logging configuration for the application, written by a queue listener thread
+
+Records carry the current request (or job) id; handlers are attached by
+setup_logging(), called from the app's lifespan.
 """
 
+import atexit
+import json
 import logging
+import logging.handlers
+import queue
 import sys
+from contextvars import ContextVar
+from datetime import datetime, timezone
 from pathlib import Path
+from typing import Optional
 
-log_dir = Path("logs")
-log_dir.mkdir(exist_ok=True)
+from app.config import get_settings
 
-log_format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+log_format = "%(asctime)s - %(name)s - %(levelname)s - %(request_id)s - %(message)s"
 date_format = "%Y-%m-%d %H:%M:%S"
 
-formatter = logging.Formatter(log_format, date_format)
+logger = logging.getLogger("testcase_generator")
+logger.propagate = False
 
-console_handler = logging.StreamHandler(sys.stdout)
-console_handler.setFormatter(formatter)
-console_handler.setLevel(logging.INFO)
+_listener: Optional[logging.handlers.QueueListener] = None
 
-file_handler = logging.FileHandler(log_dir / "app.log")
-file_handler.setFormatter(formatter)
-file_handler.setLevel(logging.DEBUG)
+# Id of the request or job the current task works for; set by the request
+# context middleware and the job workers, inherited by tasks they create
+request_id: ContextVar[str] = ContextVar("request_id", default="-")
 
-logger = logging.getLogger("testcase_generator")
-logger.setLevel(logging.DEBUG)
-logger.addHandler(console_handler)
-logger.addHandler(file_handler)
 
-logger.propagate = False
+class RequestIdFilter(logging.Filter):
+    """Stamp each record with the current request id"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(
+                record.created, timezone.utc
+            ).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves handler formatting to the listener thread"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge the arguments now: the caller may mutate them once it returns
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def setup_logging() -> None:
+    """
+    Attach the queue-based handlers to the application logger
+    Safe to call more than once; only the first call has an effect.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    settings = get_settings()
+
+    if settings.log_json:
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(log_format, date_format)
+
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(formatter)
+    console_handler.setLevel(settings.log_level.upper())
+    handlers = [console_handler]
+
+    if settings.log_file:
+        log_path = Path(settings.log_file)
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_path,
+            maxBytes=settings.log_max_bytes,
+            backupCount=settings.log_backup_count,
+            encoding="utf-8",
+        )
+        file_handler.setFormatter(formatter)
+        file_handler.setLevel(settings.log_file_level.upper())
+        handlers.append(file_handler)
+
+    # Records below every handler's level are dropped before any work is done
+    logger.setLevel(min(handler.level for handler in handlers))
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+    # Handler filters run in the caller, where the request's context is current
+    queue_handler.addFilter(RequestIdFilter())
+    logger.addHandler(queue_handler)
+
+    _listener = logging.handlers.QueueListener(
+        log_queue, *handlers, respect_handler_level=True
+    )
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is None:
+        return
+
+    _listener.stop()
+    _listener = None
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
 
 
 def get_logger(name: str) -> logging.Logger:
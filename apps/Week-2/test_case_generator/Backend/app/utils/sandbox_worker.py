@@ -0,0 +1,217 @@
+"""
+Code that runs inside the sandbox worker processes
+(standard library and the input generator only)
+"""
+
+import ast
+import contextlib
+import hashlib
+import io
+import math
+import os
+import signal
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from app.utils import input_generator
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# JSON spellings accepted in inputs and expected outputs
+JSON_CONSTANTS = {"true": True, "false": False, "null": None}
+
+# Environment variables a worker keeps; everything else, API keys included,
+# is removed so a solution cannot read the server's credentials
+WORKER_ENV_KEYS = ("PATH", "LANG")
+
+# Compiled solutions, keyed by a digest of the source
+_compiled: Dict[str, Any] = {}
+_MAX_COMPILED = 64
+
+
+class CPUTimeExceeded(Exception):
+    """Raised inside a worker when a run uses up its CPU time"""
+
+
+def _on_cpu_limit(signum: int, frame: Any) -> None:
+    raise CPUTimeExceeded()
+
+
+def init_worker(memory_bytes: int) -> None:
+    """
+    Process initializer: clear the environment, apply the memory limit and
+    install the CPU timer handler
+    Args:
+        memory_bytes: Address space limit for the worker, 0 for none
+    """
+    kept = {key: os.environ[key] for key in WORKER_ENV_KEYS if key in os.environ}
+    os.environ.clear()
+    os.environ.update(kept)
+    if resource is not None and memory_bytes:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+    if hasattr(signal, "setitimer"):
+        signal.signal(signal.SIGPROF, _on_cpu_limit)
+
+
+def warm_up() -> bool:
+    """No-op task used to start every worker before the first real run"""
+    return True
+
+
+def parse_value(text: str) -> Any:
+    """
+    Parse a literal such as "[1,2]", "'abc'" or "true"
+    Args:
+        text: Literal in Python or JSON spelling
+    Returns:
+        Parsed value
+    Raises:
+        ValueError: If the text is not a literal
+    """
+    node = ast.parse(text.strip(), mode="eval").body
+    return _literal(node)
+
+
+def parse_input(text: str) -> Tuple[List[Any], Dict[str, Any]]:
+    """
+    Parse a test case input into call arguments
+    "nums = [2,7,11,15], target = 9" becomes keyword arguments and
+    "[1,2,3], 4" positional ones. Only literals are accepted; nothing in the
+    input is executed.
+    Args:
+        text: Test case input
+    Returns:
+        (args, kwargs) tuple
+    Raises:
+        ValueError: If the input is not a list of literal arguments
+    """
+    try:
+        call = ast.parse(f"f({text.strip()})", mode="eval").body
+    except SyntaxError as e:
+        raise ValueError(f"Unsupported input format: {e.msg}")
+    args = [_literal(arg) for arg in call.args]
+    kwargs = {keyword.arg: _literal(keyword.value) for keyword in call.keywords}
+    return args, kwargs
+
+
+def _literal(node: ast.AST) -> Any:
+    if isinstance(node, ast.Name) and node.id in JSON_CONSTANTS:
+        return JSON_CONSTANTS[node.id]
+    if isinstance(node, (ast.List, ast.Tuple)):
+        return [_literal(item) for item in node.elts]
+    if isinstance(node, ast.Dict):
+        return {_literal(k): _literal(v) for k, v in zip(node.keys, node.values)}
+    return ast.literal_eval(node)
+
+
+def normalize(value: Any) -> Any:
+    """Convert tuples to lists recursively so results compare like JSON"""
+    if isinstance(value, (list, tuple)):
+        return [normalize(item) for item in value]
+    if isinstance(value, dict):
+        return {key: normalize(item) for key, item in value.items()}
+    return value
+
+
+def values_equal(actual: Any, expected: Any) -> bool:
+    """Compare two normalized values, allowing float rounding"""
+    if isinstance(actual, float) or isinstance(expected, float):
+        try:
+            return math.isclose(actual, expected, rel_tol=1e-6, abs_tol=1e-9)
+        except TypeError:
+            return False
+    if isinstance(actual, list) and isinstance(expected, list):
+        return len(actual) == len(expected) and all(
+            values_equal(a, e) for a, e in zip(actual, expected)
+        )
+    return actual == expected
+
+
+def _load_solution(source: str, entry_point: Optional[str]) -> Callable:
+    """
+    Build the callable under test from the solution source
+    A fresh namespace is used for every run; only compilation is cached.
+    The entry point is a named function or Solution method, otherwise the
+    first public method of class Solution, otherwise the last function
+    defined in the source.
+    """
+    digest = hashlib.sha256(source.encode()).hexdigest()
+    code = _compiled.get(digest)
+    if code is None:
+        code = compile(source, "<solution>", "exec")
+        if len(_compiled) >= _MAX_COMPILED:
+            _compiled.clear()
+        _compiled[digest] = code
+
+    namespace: Dict[str, Any] = {"__name__": "solution"}
+    exec(code, namespace)
+
+    solution_class = namespace.get("Solution")
+    if isinstance(solution_class, type):
+        instance = solution_class()
+        if entry_point:
+            return getattr(instance, entry_point)
+        for name in vars(solution_class):
+            if not name.startswith("_") and callable(getattr(instance, name)):
+                return getattr(instance, name)
+
+    if entry_point:
+        return namespace[entry_point]
+    functions = [
+        value
+        for value in namespace.values()
+        if callable(value)
+        and getattr(getattr(value, "__code__", None), "co_filename", "") == "<solution>"
+    ]
+    if not functions:
+        raise ValueError("No function found in the reference solution")
+    return functions[-1]
+
+
+def execute(
+    source: str,
+    entry_point: Optional[str],
+    test_input: Union[str, Dict[str, Any]],
+    cpu_seconds: float,
+) -> Dict[str, Any]:
+    """
+    Run the reference solution on one test case input
+    Args:
+        source: Python source of the reference solution
+        entry_point: Function or Solution method to call, or None to detect it
+        test_input: Test case input text, or a stress input generator spec
+            (generated here, so large inputs are never rendered and parsed)
+        cpu_seconds: CPU time the run may use; generating the input is not counted
+    Returns:
+        {"ok": True, "output": value} or {"ok": False, "error": message}
+    """
+    use_timer = hasattr(signal, "setitimer")
+    try:
+        if isinstance(test_input, dict):
+            args, kwargs = [], input_generator.generate_arguments(test_input)
+        else:
+            args, kwargs = parse_input(test_input)
+        # Anything the solution prints is discarded
+        with contextlib.redirect_stdout(io.StringIO()):
+            if use_timer:
+                signal.setitimer(signal.ITIMER_PROF, cpu_seconds)
+            try:
+                output = _load_solution(source, entry_point)(*args, **kwargs)
+            finally:
+                if use_timer:
+                    signal.setitimer(signal.ITIMER_PROF, 0)
+        return {"ok": True, "output": normalize(output)}
+    except CPUTimeExceeded:
+        return {"ok": False, "error": f"CPU time limit of {cpu_seconds}s exceeded"}
+    except MemoryError:
+        return {"ok": False, "error": "Memory limit exceeded"}
+    except RecursionError:
+        return {"ok": False, "error": "Maximum recursion depth exceeded"}
+    except Exception as e:
+        return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+    except BaseException as e:
+        # sys.exit() and the like must fail the run, not the worker or the
+        # server, where the pool would re-raise them
+        return {"ok": False, "error": f"{type(e).__name__}: {e}"}
@@ -0,0 +1,22 @@
+"""
+Server-Sent Events helpers
+"""
+
+from typing import Any
+
+from app.utils.json_parse import dumps
+
+
+def format_sse(event: str, data: Any) -> str:
+    """
+    Encode a single Server-Sent Event
+
+    Args:
+        event: Event name
+        data: JSON-serializable payload, or a pre-encoded JSON string
+
+    Returns:
+        SSE frame terminated by a blank line
+    """
+    payload = data if isinstance(data, str) else dumps(data)
+    return f"event: {event}\ndata: {payload}\n\n"
@@ -0,0 +1,301 @@
+"""
+Offline load test for one worker of app.main:app
+
+Runs the mock LLM server and the app under uvicorn in background threads
+and drives /api/v1/testcases/generate at a fixed concurrency. Everything
+shares one process, so compare the numbers between revisions only.
+
+With --ollama-ttft-ms, a second mock stands in for a local Ollama server
+and the app routes between both backends; the report then includes how
+many calls each one served.
+
+Run from the Backend directory:
+    python -m benchmarks.load_test --concurrency 64 --requests 2000 --ttft-ms 300
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from benchmarks.mock_llm_server import (
+    add_mock_arguments,
+    config_from_args,
+    create_mock_app,
+)
+
+
+def free_port() -> int:
+    """Pick an unused local TCP port"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of samples"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class ServerThread(threading.Thread):
+    """Run an ASGI app under uvicorn in a background thread with its own loop"""
+
+    def __init__(self, app: Any, port: int, probe_interval: Optional[float] = None):
+        super().__init__(daemon=True)
+        import uvicorn
+
+        self.server = uvicorn.Server(
+            uvicorn.Config(
+                app, host="127.0.0.1", port=port, log_level="warning", access_log=False
+            )
+        )
+        self.probe_interval = probe_interval
+        self.lag_samples: List[float] = []
+        self._probing = False
+
+    def run(self) -> None:
+        asyncio.run(self._serve())
+
+    async def _serve(self) -> None:
+        probe = None
+        if self.probe_interval:
+            probe = asyncio.create_task(self._probe_lag())
+        await self.server.serve()
+        if probe:
+            probe.cancel()
+
+    async def _probe_lag(self) -> None:
+        """Measure how late the loop wakes up from a short sleep"""
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.probe_interval)
+            lag = time.perf_counter() - started - self.probe_interval
+            if self._probing:
+                self.lag_samples.append(max(0.0, lag))
+
+    def start_probing(self) -> None:
+        self.lag_samples.clear()
+        self._probing = True
+
+    def stop_probing(self) -> None:
+        self._probing = False
+
+    def wait_started(self, timeout: float = 30.0) -> None:
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if not self.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError("Server failed to start")
+            time.sleep(0.05)
+
+    def stop(self) -> None:
+        self.server.should_exit = True
+        self.join(timeout=10)
+
+
+def build_request(index: int, args: argparse.Namespace) -> Dict[str, Any]:
+    """Build a generation request; unique descriptions defeat cache and coalescing"""
+    suffix = f" (variant {index})" if args.unique else ""
+    return {
+        "problem_description": (
+            "Given an array of integers nums and an integer target, return indices "
+            "of the two numbers such that they add up to target." + suffix
+        ),
+        "difficulty": args.difficulty,
+        "problem_type": "array",
+        "num_test_cases": args.num_test_cases,
+        "constraints": "2 <= nums.length <= 10^4",
+        "include_edge_cases": True,
+    }
+
+
+async def drive(base_url: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Send requests from a closed loop of concurrent workers
+    Args:
+        base_url: Root URL of the app under test
+        args: Parsed command line options
+    Returns:
+        Raw latencies and status counts
+    """
+    import httpx
+
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    counter = iter(range(args.requests))
+    query = "" if args.use_cache else "?cache_mode=bypass"
+    url = f"{base_url}/api/v1/testcases/generate{query}"
+
+    limits = httpx.Limits(
+        max_connections=args.concurrency, max_keepalive_connections=args.concurrency
+    )
+    async with httpx.AsyncClient(limits=limits, timeout=args.timeout) as client:
+
+        async def worker() -> None:
+            for index in counter:
+                started = time.perf_counter()
+                try:
+                    response = await client.post(url, json=build_request(index, args))
+                    key = str(response.status_code)
+                except httpx.HTTPError as e:
+                    key = type(e).__name__
+                latencies.append(time.perf_counter() - started)
+                statuses[key] = statuses.get(key, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {"latencies": latencies, "statuses": statuses, "elapsed": elapsed}
+
+
+def summarize(result: Dict[str, Any], lag: List[float]) -> Dict[str, Any]:
+    """Reduce raw samples to the reported numbers"""
+    latencies = result["latencies"]
+    succeeded = result["statuses"].get("200", 0)
+    return {
+        "requests": len(latencies),
+        "elapsed_s": round(result["elapsed"], 3),
+        "throughput_rps": round(len(latencies) / result["elapsed"], 2),
+        "success_rps": round(succeeded / result["elapsed"], 2),
+        "statuses": result["statuses"],
+        "latency_ms": {
+            "mean": round(statistics.fmean(latencies) * 1000, 1) if latencies else 0,
+            "p50": round(percentile(latencies, 50) * 1000, 1),
+            "p95": round(percentile(latencies, 95) * 1000, 1),
+            "p99": round(percentile(latencies, 99) * 1000, 1),
+            "max": round(max(latencies, default=0) * 1000, 1),
+        },
+        "event_loop_lag_ms": {
+            "p50": round(percentile(lag, 50) * 1000, 2),
+            "p99": round(percentile(lag, 99) * 1000, 2),
+            "max": round(max(lag, default=0) * 1000, 2),
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--num-test-cases", type=int, default=5)
+    parser.add_argument("--difficulty", default="medium")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument(
+        "--unique",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="vary the problem text so every request reaches the upstream",
+    )
+    parser.add_argument(
+        "--use-cache", action="store_true", help="let the response cache serve hits"
+    )
+    parser.add_argument("--lag-interval-ms", type=float, default=10.0)
+    parser.add_argument(
+        "--app-log-level",
+        default="WARNING",
+        help="log level for the app under test (per-request INFO logs skew results)",
+    )
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument(
+        "--ollama-ttft-ms",
+        type=float,
+        default=None,
+        help="also route to a mock Ollama backend with this time to first token",
+    )
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    mock_port, app_port = free_port(), free_port()
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{mock_port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "mock-key")
+    ollama = None
+    if args.ollama_ttft_ms is not None:
+        ollama_port = free_port()
+        os.environ["OLLAMA_BASE_URL"] = f"http://127.0.0.1:{ollama_port}"
+        os.environ["LLM_BACKENDS"] = '["openai", "ollama"]'
+        ollama_config = config_from_args(args)
+        ollama_config.ttft_ms = args.ollama_ttft_ms
+        ollama_config.error_rate = 0.0
+        ollama = ServerThread(create_mock_app(ollama_config), ollama_port)
+
+    # The app's log handlers are set up in its lifespan, from these settings
+    os.environ["LOG_LEVEL"] = args.app_log_level
+    os.environ["LOG_FILE_LEVEL"] = args.app_log_level
+
+    # Import after the environment is set so Settings picks up the mock upstream
+    from app.main import create_app
+
+    mock = ServerThread(create_mock_app(config_from_args(args)), mock_port)
+    target = ServerThread(
+        create_app(), app_port, probe_interval=args.lag_interval_ms / 1000
+    )
+    mocks = [mock] + ([ollama] if ollama else [])
+    for server in mocks + [target]:
+        server.start()
+    for server in mocks + [target]:
+        server.wait_started()
+
+    base_url = f"http://127.0.0.1:{app_port}"
+    try:
+        if args.warmup:
+            warmup_args = argparse.Namespace(**{**vars(args), "requests": args.warmup})
+            asyncio.run(drive(base_url, warmup_args))
+
+        target.start_probing()
+        result = asyncio.run(drive(base_url, args))
+        target.stop_probing()
+    finally:
+        target.stop()
+        for server in mocks:
+            server.stop()
+
+    report = summarize(result, list(target.lag_samples))
+    report["config"] = {
+        "concurrency": args.concurrency,
+        "num_test_cases": args.num_test_cases,
+        "ttft_ms": args.ttft_ms,
+        "tokens_per_sec": args.tokens_per_sec,
+        "error_rate": args.error_rate,
+    }
+    if ollama:
+        report["config"]["ollama_ttft_ms"] = args.ollama_ttft_ms
+        report["upstream_calls"] = {
+            "openai": mock.server.config.app.state.stats.requests,
+            "ollama": ollama.server.config.app.state.stats.requests,
+        }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    latency, lag = report["latency_ms"], report["event_loop_lag_ms"]
+    print(
+        f"requests={report['requests']} concurrency={args.concurrency} "
+        f"elapsed={report['elapsed_s']}s"
+    )
+    print(
+        f"throughput={report['throughput_rps']} req/s "
+        f"(successful {report['success_rps']} req/s) statuses={report['statuses']}"
+    )
+    print(
+        f"latency ms: p50={latency['p50']} p95={latency['p95']} "
+        f"p99={latency['p99']} max={latency['max']}"
+    )
+    print(f"event loop lag ms: p50={lag['p50']} p99={lag['p99']} max={lag['max']}")
+    if ollama:
+        calls = report["upstream_calls"]
+        print(f"upstream calls: openai={calls['openai']} ollama={calls['ollama']}")
+
+
+if __name__ == "__main__":
+    main()
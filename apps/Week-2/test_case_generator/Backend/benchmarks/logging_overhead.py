@@ -0,0 +1,189 @@
+"""
+Per-request logging overhead: synchronous handlers vs the queue pipeline
+
+Replays the log calls of one /generate request against both setups and
+reports the time spent in the calling thread.
+
+Run from the Backend directory:
+    python -m benchmarks.logging_overhead --requests 20000 --console-level INFO
+"""
+
+import argparse
+import logging
+import logging.handlers
+import os
+import queue
+import statistics
+import tempfile
+import time
+from typing import Callable, List
+
+from app.utils.logger import DeferredQueueHandler, JsonFormatter
+
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+RESPONSE = (
+    '{"test_cases": [{"input": "nums = [2,7,11,15], target = 9", '
+    '"expected_output": "[0,1]", "explanation": "Basic case"}] }'
+) * 20
+
+
+def eager_request(log: logging.Logger, index: int) -> None:
+    """Log calls of one request, formatted up front"""
+    log.info(f"Incoming request: POST /api/v1/testcases/generate")
+    log.info(f"Generating test cases for problem type: array, difficulty: medium")
+    log.info(f"Sending request to OpenAI with {2} messages")
+    log.debug(f"Request params: model=gpt-4o-mini, temperature={0.7}, max_tokens=2000")
+    log.info(f"Successfully received response from OpenAI")
+    log.debug(f"Received response of length: {len(RESPONSE)} characters")
+    log.debug(f"Cleaned response: {RESPONSE[:200]}...")
+    log.debug(f"Successfully parsed JSON with {5} test cases")
+    log.info(f"Successfully generated {5} test cases")
+    log.info(f"Successfully generated {5} test cases (request {index})")
+    log.info(f"Completed request: POST /api/v1/testcases/generate Status: 200")
+
+
+def lazy_request(log: logging.Logger, index: int) -> None:
+    """Log calls of one request, with arguments merged only when emitted"""
+    log.info("Incoming request: %s %s", "POST", "/api/v1/testcases/generate")
+    log.info(
+        "Generating test cases for problem type: %s, difficulty: %s", "array", "medium"
+    )
+    log.info("Sending request to OpenAI with %s messages", 2)
+    log.debug(
+        "Request params: model=%s, temperature=%s, max_tokens=%s",
+        "gpt-4o-mini",
+        0.7,
+        2000,
+    )
+    log.info("Successfully received response from OpenAI")
+    log.debug("Received response of length: %s characters", len(RESPONSE))
+    log.debug("Cleaned response: %s...", RESPONSE[:200])
+    log.debug("Successfully parsed JSON with %s test cases", 5)
+    log.info("Successfully generated %s test cases", 5)
+    log.info("Successfully generated %s test cases (request %s)", 5, index)
+    log.info(
+        "Completed request: %s %s Status: %s", "POST", "/api/v1/testcases/generate", 200
+    )
+
+
+def measure(
+    log: logging.Logger,
+    request: Callable[[logging.Logger, int], None],
+    requests: int,
+) -> List[float]:
+    """Time each simulated request in the calling thread"""
+    samples = []
+    for index in range(requests):
+        started = time.perf_counter()
+        request(log, index)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def sync_logger(
+    name: str, console, log_path: str, console_level: str, file_level: str
+) -> logging.Logger:
+    log = logging.getLogger(name)
+    log.propagate = False
+    log.setLevel(logging.DEBUG)
+    formatter = logging.Formatter(LOG_FORMAT)
+
+    console_handler = logging.StreamHandler(console)
+    console_handler.setLevel(console_level)
+    console_handler.setFormatter(formatter)
+    file_handler = logging.FileHandler(log_path)
+    file_handler.setLevel(file_level)
+    file_handler.setFormatter(formatter)
+
+    log.addHandler(console_handler)
+    log.addHandler(file_handler)
+    return log
+
+
+def queue_logger(
+    name: str,
+    console,
+    log_path: str,
+    console_level: str,
+    file_level: str,
+    json_output: bool,
+) -> tuple:
+    log = logging.getLogger(name)
+    log.propagate = False
+    formatter = JsonFormatter() if json_output else logging.Formatter(LOG_FORMAT)
+
+    console_handler = logging.StreamHandler(console)
+    console_handler.setLevel(console_level)
+    console_handler.setFormatter(formatter)
+    file_handler = logging.handlers.RotatingFileHandler(
+        log_path, maxBytes=10 * 1024 * 1024, backupCount=2
+    )
+    file_handler.setLevel(file_level)
+    file_handler.setFormatter(formatter)
+    handlers = (console_handler, file_handler)
+    log.setLevel(min(handler.level for handler in handlers))
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    log.addHandler(DeferredQueueHandler(log_queue))
+    listener = logging.handlers.QueueListener(
+        log_queue, *handlers, respect_handler_level=True
+    )
+    listener.start()
+    return log, listener
+
+
+def report(label: str, samples: List[float]) -> None:
+    ordered = sorted(samples)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(
+        f"{label:<7} mean={statistics.fmean(samples) * 1e6:8.1f}us "
+        f"p50={statistics.median(samples) * 1e6:8.1f}us p99={p99 * 1e6:8.1f}us"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--console-level", default="INFO")
+    parser.add_argument("--file-level", default="DEBUG")
+    parser.add_argument("--json", action="store_true", help="JSON log lines (queue)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, open(os.devnull, "w") as console:
+        sync = sync_logger(
+            "bench.sync",
+            console,
+            os.path.join(tmp, "sync.log"),
+            args.console_level,
+            args.file_level,
+        )
+        sync_samples = measure(sync, eager_request, args.requests)
+
+        lazy, listener = queue_logger(
+            "bench.queue",
+            console,
+            os.path.join(tmp, "queue.log"),
+            args.console_level,
+            args.file_level,
+            args.json,
+        )
+        queue_samples = measure(lazy, lazy_request, args.requests)
+        returned = time.perf_counter()
+        listener.stop()
+        drained = time.perf_counter() - returned
+
+    print(
+        f"{args.requests} simulated requests, console={args.console_level} "
+        f"file={args.file_level}"
+    )
+    report("sync", sync_samples)
+    report("queue", queue_samples)
+    print(
+        f"queue listener finished writing {drained:.2f}s "
+        "after the last request returned"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Per-request overhead of the request middleware, measured on /health
+
+Compares no middleware, the previous @app.middleware("http") log_requests
+and RequestContextMiddleware, calling the ASGI app directly with logs on
+os.devnull.
+
+Run from the Backend directory:
+    python -m benchmarks.middleware_overhead --requests 20000 --sample-rate 0.1
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from typing import Any, Dict, List
+
+PATH = "/api/v1/testcases/health"
+
+
+def build_apps(sample_rate: float) -> Dict[str, Any]:
+    """The same routes under each middleware stack"""
+    from fastapi import FastAPI, Request
+
+    from app.api.middleware import RequestContextMiddleware
+    from app.api.routes import testcase
+    from app.core.metrics import http_request_duration
+    from app.utils.logger import get_logger
+
+    logger = get_logger("benchmarks.middleware_overhead")
+
+    async def log_requests(request: Request, call_next):
+        """The request logging middleware this benchmark compares against"""
+        start_time = time.time()
+        logger.info("Incoming request: %s %s", request.method, request.url.path)
+
+        response = await call_next(request)
+
+        process_time = time.time() - start_time
+        logger.info(
+            "Completed %s %s - Status: %s - Time: %.3fs",
+            request.method,
+            request.url.path,
+            response.status_code,
+            process_time,
+        )
+        response.headers["X-Process-Time"] = str(process_time)
+        route = request.scope.get("route")
+        http_request_duration.observe(
+            process_time,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=str(response.status_code),
+        )
+        return response
+
+    apps = {}
+    for name in ("none", "decorator", "asgi"):
+        app = FastAPI()
+        app.include_router(testcase.router, prefix="/api/v1")
+        if name == "decorator":
+            app.middleware("http")(log_requests)
+        elif name == "asgi":
+            app.add_middleware(RequestContextMiddleware, sample_rate=sample_rate)
+        apps[name] = app
+    return apps
+
+
+async def sequential(app: Any, requests: int) -> List[float]:
+    """Seconds per request, one request at a time"""
+    from benchmarks.serialization import call
+
+    samples = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        await call(app, PATH)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+async def concurrent(app: Any, requests: int, concurrency: int) -> float:
+    """Requests per second with `concurrency` requests in flight"""
+    from benchmarks.serialization import call
+
+    started = time.perf_counter()
+    for _ in range(requests // concurrency):
+        await asyncio.gather(*(call(app, PATH) for _ in range(concurrency)))
+    return (requests // concurrency) * concurrency / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument(
+        "--sample-rate",
+        type=float,
+        default=0.1,
+        help="access log sample rate of the asgi stack",
+    )
+    args = parser.parse_args()
+
+    os.environ["LOG_FILE"] = ""
+    os.environ["LOG_LEVEL"] = "INFO"
+    os.environ.setdefault("OPENAI_API_KEY", "mock-key")
+
+    from app.utils.logger import setup_logging, shutdown_logging
+
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    setup_logging()
+    try:
+        apps = build_apps(args.sample_rate)
+        results = {}
+        for name, app in apps.items():
+            asyncio.run(sequential(app, 200))  # warm up
+            samples = asyncio.run(sequential(app, args.requests))
+            rps = asyncio.run(concurrent(app, args.requests, args.concurrency))
+            results[name] = (samples, rps)
+    finally:
+        shutdown_logging()
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    baseline = statistics.median(results["none"][0])
+    print(
+        f"GET {PATH}: {args.requests} requests, "
+        f"access log sample rate {args.sample_rate}"
+    )
+    print(
+        f"{'stack':>10} {'p50 us':>8} {'p99 us':>8} {'overhead us':>12} "
+        f"{'req/s @' + str(args.concurrency):>12}"
+    )
+    for name, (samples, rps) in results.items():
+        ordered = sorted(samples)
+        p50 = statistics.median(ordered)
+        p99 = ordered[int(len(ordered) * 0.99) - 1]
+        print(
+            f"{name:>10} {p50 * 1e6:>8.1f} {p99 * 1e6:>8.1f} "
+            f"{(p50 - baseline) * 1e6:>12.1f} {rps:>12.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,400 @@
+"""
+Local stand-in for the OpenAI chat completions and Ollama chat APIs
+
+Serves /v1/chat/completions and Ollama's /api/chat (plain and streamed)
+plus /v1/embeddings, with configurable latency, token rate and error rate,
+answering with a valid test case payload (or, for stress input prompts,
+generator specs).
+
+Run standalone:
+    python -m benchmarks.mock_llm_server --port 9100 --ttft-ms 300 --tokens-per-sec 80
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import zlib
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+NUM_CASES_PATTERN = re.compile(r"exactly (\d+)")
+
+
+@dataclass
+class MockLLMConfig:
+    """Behaviour of the mock upstream"""
+
+    ttft_ms: float = 300.0  # median time to first token
+    ttft_sigma: float = 0.35  # lognormal spread of time to first token
+    tokens_per_sec: float = 80.0  # decode speed; 0 disables decode time
+    error_rate: float = 0.0  # fraction of requests answered with an error
+    error_codes: List[int] = field(default_factory=lambda: [429, 500, 503])
+    stream_chunk_tokens: int = 4  # tokens per streamed delta
+    seed: int = 0
+
+
+@dataclass
+class MockLLMStats:
+    """Counters for what the mock upstream has served"""
+
+    requests: int = 0
+    errors: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    by_status: Dict[int, int] = field(default_factory=dict)
+
+
+def build_payload(num_cases: int, offset: int = 0) -> str:
+    """
+    Build a test case JSON document like the one the real model returns
+    Args:
+        num_cases: Number of test cases to include
+        offset: First case number, so different prompts yield different inputs
+    Returns:
+        JSON string
+    """
+    test_cases = [
+        {
+            "input": f"nums = [{i}, {i + 7}, {i * 3}, 15], target = {2 * i + 7}",
+            "expected_output": "[0,1]",
+            "explanation": f"Mock case {i} covering a generic scenario",
+        }
+        for i in range(offset, offset + num_cases)
+    ]
+    return json.dumps(
+        {"test_cases": test_cases, "problem_summary": "Mock problem summary"}
+    )
+
+
+def build_stress_payload(num_cases: int, offset: int = 0) -> str:
+    """
+    Build a stress input spec document like the one the real model returns
+    Sizes cycle from the maximum down to an inline-sized input.
+    Args:
+        num_cases: Number of specs to include
+        offset: Seed offset, so different prompts yield different inputs
+    Returns:
+        JSON string
+    """
+    lengths = [100_000, 10_000, 500]
+    distributions = ["uniform", "sorted", "distinct"]
+    stress_cases = [
+        {
+            "params": [
+                {
+                    "name": "nums",
+                    "kind": "int_array",
+                    "length": lengths[i % len(lengths)],
+                    "min_value": -1_000_000_000,
+                    "max_value": 1_000_000_000,
+                    "alphabet": None,
+                    "distribution": distributions[i % len(distributions)],
+                },
+                {
+                    "name": "target",
+                    "kind": "int",
+                    "length": 1,
+                    "min_value": -1_000_000_000,
+                    "max_value": 1_000_000_000,
+                    "alphabet": None,
+                    "distribution": "uniform",
+                },
+            ],
+            "seed": offset + i,
+            "explanation": f"Mock stress input {i} at maximum size",
+        }
+        for i in range(num_cases)
+    ]
+    return json.dumps({"stress_cases": stress_cases})
+
+
+def create_mock_app(config: MockLLMConfig) -> FastAPI:
+    """
+    Create the mock OpenAI-compatible application
+    Args:
+        config: Latency, token rate and error behaviour
+    Returns:
+        FastAPI app exposing /v1/chat/completions, /v1/embeddings, /v1/models
+        and /api/chat
+    """
+    app = FastAPI(title="Mock LLM")
+    rng = random.Random(config.seed)
+    stats = MockLLMStats()
+    seen_prefixes = set()
+    app.state.config = config
+    app.state.stats = stats
+
+    def count(status_code: int) -> None:
+        stats.by_status[status_code] = stats.by_status.get(status_code, 0) + 1
+
+    @app.get("/v1/models")
+    async def models():
+        return {"object": "list", "data": [{"id": "mock-model", "object": "model"}]}
+
+    @app.get("/v1/models/{model}")
+    async def retrieve_model(model: str):
+        return {"id": model, "object": "model", "owned_by": "mock"}
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats.__dict__
+
+    def maybe_fail() -> Tuple[float, Optional[int]]:
+        """Draw the time to first token, or an error status to fail with"""
+        stats.requests += 1
+        ttft = rng.lognormvariate(0, config.ttft_sigma) * config.ttft_ms / 1000
+        if rng.random() < config.error_rate:
+            status_code = rng.choice(config.error_codes)
+            stats.errors += 1
+            count(status_code)
+            return ttft, status_code
+        return ttft, None
+
+    def complete(messages: List[Dict], max_tokens: Optional[int]) -> Dict:
+        """Build the answer to a prompt and account for its tokens"""
+        prompt = json.dumps(messages)
+        match = NUM_CASES_PATTERN.search(prompt)
+        build = build_stress_payload if "stress_cases" in prompt else build_payload
+        content = build(
+            int(match.group(1)) if match else 5, zlib.crc32(prompt.encode()) % 10_000
+        )
+
+        # Cut the output off at max_tokens like the real API
+        finish_reason = "stop"
+        if max_tokens and len(content) > 4 * max_tokens:
+            content = content[: 4 * max_tokens]
+            finish_reason = "length"
+
+        completion_tokens = max(1, len(content) // 4)
+        stats.completion_tokens += completion_tokens
+
+        # Prefix caching: a system prompt seen before counts as cached input
+        prefix = (messages or [{}])[0].get("content", "")
+        cached_tokens = len(prefix) // 4 if prefix in seen_prefixes else 0
+        seen_prefixes.add(prefix)
+        stats.cached_tokens += cached_tokens
+        count(200)
+
+        return {
+            "content": content,
+            "finish_reason": finish_reason,
+            "prompt_tokens": len(prompt) // 4,
+            "completion_tokens": completion_tokens,
+            "cached_tokens": cached_tokens,
+        }
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+
+        ttft, status_code = maybe_fail()
+        if status_code is not None:
+            await asyncio.sleep(ttft / 2)
+            return JSONResponse(
+                {"error": {"message": "mock upstream error", "type": "mock_error"}},
+                status_code=status_code,
+                headers={"retry-after": "0.1"} if status_code == 429 else None,
+            )
+
+        result = complete(
+            body.get("messages", []),
+            body.get("max_tokens") or body.get("max_completion_tokens"),
+        )
+        content = result["content"]
+        finish_reason = result["finish_reason"]
+        prompt_tokens = result["prompt_tokens"]
+        completion_tokens = result["completion_tokens"]
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": result["cached_tokens"]},
+        }
+
+        token_time = 1 / config.tokens_per_sec if config.tokens_per_sec else 0.0
+        created = int(time.time())
+
+        if not body.get("stream"):
+            await asyncio.sleep(ttft + completion_tokens * token_time)
+            return {
+                "id": "chatcmpl-mock",
+                "object": "chat.completion",
+                "created": created,
+                "model": body.get("model", "mock-model"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": finish_reason,
+                    }
+                ],
+                "usage": usage,
+            }
+
+        chunk_chars = 4 * config.stream_chunk_tokens
+
+        async def stream():
+            await asyncio.sleep(ttft)
+            for start in range(0, len(content), chunk_chars):
+                chunk = {
+                    "id": "chatcmpl-mock",
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": body.get("model", "mock-model"),
+                    "choices": [
+                        {
+                            "index": 0,
+                            "delta": {"content": content[start : start + chunk_chars]},
+                            "finish_reason": None,
+                        }
+                    ],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(config.stream_chunk_tokens * token_time)
+            final = {
+                "id": "chatcmpl-mock",
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": body.get("model", "mock-model"),
+                "choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}],
+                "usage": usage,
+            }
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        texts = body.get("input") or ""
+        if isinstance(texts, str):
+            texts = [texts]
+        dim = body.get("dimensions") or 256
+
+        # Bag of words: texts sharing words get similar vectors
+        data = []
+        for index, text in enumerate(texts):
+            vector = [0.0] * dim
+            for word in re.findall(r"[a-z0-9]+", text.lower()):
+                vector[zlib.crc32(word.encode()) % dim] += 1.0
+            data.append({"object": "embedding", "index": index, "embedding": vector})
+
+        count(200)
+        await asyncio.sleep(config.ttft_ms / 10_000)
+        tokens = sum(len(text) // 4 for text in texts)
+        return {
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "mock-embedding"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+    @app.post("/api/chat")
+    async def ollama_chat(request: Request):
+        body = await request.json()
+        model = body.get("model", "mock-model")
+        if not body.get("messages"):
+            # Ollama loads the model and answers at once when given no messages
+            return {
+                "model": model,
+                "message": {"role": "assistant", "content": ""},
+                "done": True,
+                "done_reason": "load",
+            }
+
+        ttft, status_code = maybe_fail()
+        if status_code is not None:
+            await asyncio.sleep(ttft / 2)
+            return JSONResponse(
+                {"error": "mock upstream error"}, status_code=status_code
+            )
+
+        options = body.get("options") or {}
+        result = complete(body.get("messages", []), options.get("num_predict"))
+        content = result["content"]
+        token_time = 1 / config.tokens_per_sec if config.tokens_per_sec else 0.0
+        final = {
+            "model": model,
+            "message": {"role": "assistant", "content": ""},
+            "done": True,
+            "done_reason": result["finish_reason"],
+            "prompt_eval_count": result["prompt_tokens"],
+            "eval_count": result["completion_tokens"],
+        }
+
+        if not body.get("stream", True):
+            await asyncio.sleep(ttft + result["completion_tokens"] * token_time)
+            final["message"]["content"] = content
+            return final
+
+        chunk_chars = 4 * config.stream_chunk_tokens
+
+        async def stream():
+            await asyncio.sleep(ttft)
+            for start in range(0, len(content), chunk_chars):
+                chunk = {
+                    "model": model,
+                    "message": {
+                        "role": "assistant",
+                        "content": content[start : start + chunk_chars],
+                    },
+                    "done": False,
+                }
+                yield json.dumps(chunk) + "\n"
+                await asyncio.sleep(config.stream_chunk_tokens * token_time)
+            yield json.dumps(final) + "\n"
+
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    return app
+
+
+def add_mock_arguments(parser: argparse.ArgumentParser) -> None:
+    """Register the mock upstream options on an argument parser"""
+    group = parser.add_argument_group("mock upstream")
+    group.add_argument("--ttft-ms", type=float, default=300.0)
+    group.add_argument("--ttft-sigma", type=float, default=0.35)
+    group.add_argument("--tokens-per-sec", type=float, default=80.0)
+    group.add_argument("--error-rate", type=float, default=0.0)
+    group.add_argument(
+        "--error-codes",
+        type=lambda v: [int(c) for c in v.split(",")],
+        default=[429, 500, 503],
+    )
+    group.add_argument("--seed", type=int, default=0)
+
+
+def config_from_args(args: argparse.Namespace) -> MockLLMConfig:
+    """Build a MockLLMConfig from parsed arguments"""
+    return MockLLMConfig(
+        ttft_ms=args.ttft_ms,
+        ttft_sigma=args.ttft_sigma,
+        tokens_per_sec=args.tokens_per_sec,
+        error_rate=args.error_rate,
+        error_codes=args.error_codes,
+        seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    uvicorn.run(
+        create_mock_app(config_from_args(args)),
+        host=args.host,
+        port=args.port,
+        log_level="warning",
+    )
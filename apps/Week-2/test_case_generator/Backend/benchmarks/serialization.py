@@ -0,0 +1,215 @@
+"""
+Response building, serialization and compression cost per request
+
+Times building TestCaseResponse, the FastAPI response_model route against
+ModelJSONResponse, and gzip/brotli compression, calling the ASGI apps
+directly so only the work inside the app is measured.
+
+Run from the Backend directory:
+    python -m benchmarks.serialization --cases 1 5 20 --stress-values 0 100000 400000
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi import FastAPI
+
+from app.api import middleware
+from app.api.middleware import CompressionMiddleware
+from app.api.responses import ModelJSONResponse
+from app.models.schemas import TestCase, TestCaseResponse
+from app.utils import input_generator
+from benchmarks.stress_inputs import make_spec
+
+
+def make_output(cases: int, stress_values: int) -> Dict[str, Any]:
+    """Parsed model output with the given number of cases, plus stress cases"""
+    test_cases = [
+        {
+            "input": f"nums = [{','.join(str(i * 7 + n) for i in range(12))}], "
+            f"target = {n * 3}",
+            "expected_output": f"[{n % 12},{(n + 5) % 12}]",
+            "explanation": f"Case {n}: the pair at these indices adds up to target",
+        }
+        for n in range(cases)
+    ]
+    stress_cases = []
+    for seed, distribution in enumerate(("uniform", "sorted")):
+        if not stress_values:
+            break
+        spec = make_spec(stress_values, distribution).model_dump(mode="json")
+        spec["seed"] = seed
+        stress_cases.append(
+            {
+                "generator": spec,
+                "input": input_generator.render_input(spec),
+                "input_values": stress_values + 1,
+            }
+        )
+    return {
+        "test_cases": test_cases,
+        "stress_cases": stress_cases,
+        "problem_summary": "Two Sum - find indices of two numbers adding to target",
+    }
+
+
+def build_per_case(output: Dict[str, Any]) -> TestCaseResponse:
+    return TestCaseResponse(
+        test_cases=[TestCase(**tc) for tc in output["test_cases"]],
+        stress_cases=output["stress_cases"],
+        problem_summary=output["problem_summary"],
+        generated_at=datetime.utcnow().isoformat(),
+    )
+
+
+def build_validated(output: Dict[str, Any]) -> TestCaseResponse:
+    return TestCaseResponse.model_validate(
+        {**output, "generated_at": datetime.utcnow().isoformat()}
+    )
+
+
+def make_apps(response: TestCaseResponse) -> Dict[str, Any]:
+    """ASGI apps serving the response through each path"""
+    fastapi_app = FastAPI()
+
+    @fastapi_app.get("/", response_model=TestCaseResponse)
+    async def via_response_model():
+        return response
+
+    model_app = FastAPI(default_response_class=ModelJSONResponse)
+
+    @model_app.get("/", response_model=TestCaseResponse)
+    async def via_model_response():
+        return ModelJSONResponse(response)
+
+    return {
+        "fastapi": fastapi_app,
+        "model": model_app,
+        "compressed": CompressionMiddleware(model_app),
+    }
+
+
+async def call(
+    app: Any, path: str = "/", accept_encoding: Optional[str] = None
+) -> bytes:
+    """Send one GET request to an ASGI app and return the response body"""
+    headers = [(b"host", b"bench")]
+    if accept_encoding:
+        headers.append((b"accept-encoding", accept_encoding.encode()))
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": headers,
+        "client": ("127.0.0.1", 1),
+        "server": ("bench", 80),
+    }
+    chunks: List[bytes] = []
+
+    async def receive() -> Dict[str, Any]:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: Dict[str, Any]) -> None:
+        if message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return b"".join(chunks)
+
+
+def time_sync(fn: Callable[[], Any], repeat: int) -> float:
+    """Median seconds per call"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+async def time_call(app: Any, repeat: int, accept_encoding: Optional[str] = None):
+    """Median seconds per request and the size of the last body"""
+    samples, body = [], b""
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = await call(app, accept_encoding=accept_encoding)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples), len(body)
+
+
+async def measure(cases: int, stress_values: int, repeat: int) -> Dict[str, Any]:
+    output = make_output(cases, stress_values)
+    response = build_validated(output)
+    apps = make_apps(response)
+    row = {
+        "cases": cases,
+        "stress_values": stress_values,
+        "build_per_case": time_sync(lambda: build_per_case(output), repeat),
+        "build_validated": time_sync(lambda: build_validated(output), repeat),
+    }
+    row["fastapi"], row["json_bytes"] = await time_call(apps["fastapi"], repeat)
+    row["model"], _ = await time_call(apps["model"], repeat)
+    codings = ["gzip"] + (["br"] if middleware.brotli is not None else [])
+    for coding in codings:
+        seconds, size = await time_call(apps["compressed"], repeat, coding)
+        row[coding] = seconds
+        row[f"{coding}_ratio"] = size / row["json_bytes"]
+    return row
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--cases", type=int, nargs="+", default=[1, 5, 10, 20])
+    parser.add_argument(
+        "--stress-values",
+        type=int,
+        nargs="+",
+        default=[0, 100_000, 400_000],
+        help="integers per inlined stress input (two stress cases when nonzero)",
+    )
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = []
+    for stress_values in args.stress_values:
+        for cases in args.cases:
+            repeat = args.repeat if not stress_values else max(3, args.repeat // 4)
+            rows.append(asyncio.run(measure(cases, stress_values, repeat)))
+
+    codings = ["gzip"] + (["br"] if middleware.brotli is not None else [])
+    print(
+        "median ms per request" + ("" if "br" in codings else " (brotli not installed)")
+    )
+    header = (
+        f"{'cases':>5} {'stress':>7} {'json':>9} {'build/case':>10} "
+        f"{'build/once':>10} {'fastapi':>9} {'model':>9} {'speedup':>7}"
+    )
+    for coding in codings:
+        header += f" {coding:>9} {coding + ' size':>8}"
+    print(header)
+    for row in rows:
+        line = (
+            f"{row['cases']:>5} {row['stress_values']:>7} "
+            f"{row['json_bytes'] / 1024:>7.0f}KB "
+            f"{row['build_per_case'] * 1000:>10.3f} "
+            f"{row['build_validated'] * 1000:>10.3f} "
+            f"{row['fastapi'] * 1000:>9.3f} {row['model'] * 1000:>9.3f} "
+            f"{row['fastapi'] / row['model']:>6.1f}x"
+        )
+        for coding in codings:
+            line += f" {row[coding] * 1000:>9.3f} {row[coding + '_ratio']:>8.1%}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
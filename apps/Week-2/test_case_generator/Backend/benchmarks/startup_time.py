@@ -0,0 +1,140 @@
+"""
+Startup time of one worker: import, app creation, lifespan and first requests
+
+Each sample runs in a fresh interpreter against the mock LLM server,
+alternating WARMUP_ENABLED=false and true.
+
+Run from the Backend directory:
+    python -m benchmarks.startup_time --runs 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REQUEST = {
+    "problem_description": "Given an array of integers nums and an integer target, "
+    "return indices of the two numbers such that they add up to target.",
+    "difficulty": "easy",
+    "problem_type": "array",
+    "num_test_cases": 3,
+}
+
+
+def child() -> None:
+    """Measure one cold start and print the timings as JSON"""
+    timings = {}
+
+    started = time.perf_counter()
+    import app.main
+
+    timings["import_s"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    application = app.main.create_app()
+    timings["create_app_s"] = time.perf_counter() - started
+
+    import asyncio
+
+    import httpx
+
+    async def run() -> None:
+        started = time.perf_counter()
+        async with application.router.lifespan_context(application):
+            timings["lifespan_startup_s"] = time.perf_counter() - started
+            transport = httpx.ASGITransport(app=application)
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://app", timeout=60
+            ) as client:
+                for name, variant in (("first", 1), ("second", 2)):
+                    body = {
+                        **REQUEST,
+                        "problem_description": f"{REQUEST['problem_description']} "
+                        f"(variant {variant})",
+                    }
+                    started = time.perf_counter()
+                    response = await client.post(
+                        "/api/v1/testcases/generate", json=body
+                    )
+                    timings[f"{name}_request_s"] = time.perf_counter() - started
+                    response.raise_for_status()
+
+    asyncio.run(run())
+    print(json.dumps(timings))
+
+
+def sample(env: dict) -> dict:
+    """Run one child process and return its timings"""
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup_time", "--child"],
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"startup sample failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5, help="samples per setting")
+    parser.add_argument("--ttft-ms", type=float, default=50.0)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child()
+        return
+
+    from benchmarks.load_test import ServerThread, free_port
+    from benchmarks.mock_llm_server import MockLLMConfig, create_mock_app
+
+    port = free_port()
+    mock = ServerThread(
+        create_mock_app(MockLLMConfig(ttft_ms=args.ttft_ms, tokens_per_sec=0)), port
+    )
+    mock.start()
+    mock.wait_started()
+
+    base_env = {
+        **os.environ,
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{port}/v1",
+        "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "mock-key"),
+        "CACHE_ENABLED": "false",
+        "LOG_LEVEL": "WARNING",
+        "LOG_FILE": "",
+        "PYTHONPATH": os.getcwd(),
+    }
+
+    results = {"false": [], "true": []}
+    try:
+        for _ in range(args.runs):
+            for warmup in results:
+                results[warmup].append(sample({**base_env, "WARMUP_ENABLED": warmup}))
+    finally:
+        mock.stop()
+
+    keys = [
+        "import_s",
+        "create_app_s",
+        "lifespan_startup_s",
+        "first_request_s",
+        "second_request_s",
+    ]
+    print(f"median of {args.runs} cold starts, upstream ttft={args.ttft_ms:.0f}ms")
+    print(f"{'warm-up':>8} " + " ".join(f"{key[:-2]:>18}" for key in keys))
+    for warmup, samples in results.items():
+        medians = [statistics.median(s[key] for s in samples) for key in keys]
+        print(
+            f"{warmup:>8} " + " ".join(f"{value * 1000:>16.1f}ms" for value in medians)
+        )
+
+
+if __name__ == "__main__":
+    main()
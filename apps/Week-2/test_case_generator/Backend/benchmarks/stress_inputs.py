@@ -0,0 +1,98 @@
+"""
+Stress inputs: model-written literals vs server-generated specs
+
+Compares, per input size, the output tokens and decode time of having the
+model print the input with the cost of a spec plus server-side generation.
+
+Run from the Backend directory:
+    python -m benchmarks.stress_inputs --sizes 1000 100000 1000000
+"""
+
+import argparse
+import statistics
+import time
+from typing import Dict, List
+
+from app.core.tokens import token_budget
+from app.models.schemas import StressSpec
+from app.utils import input_generator
+
+
+def make_spec(size: int, distribution: str) -> StressSpec:
+    """Two-sum style spec: nums of the given size and a target"""
+    return StressSpec(
+        params=[
+            {
+                "name": "nums",
+                "kind": "int_array",
+                "length": size,
+                "min_value": -(10**9),
+                "max_value": 10**9,
+                "distribution": distribution,
+            },
+            {
+                "name": "target",
+                "kind": "int",
+                "min_value": -(10**9),
+                "max_value": 10**9,
+            },
+        ],
+        seed=42,
+        explanation="Largest input allowed by the constraints",
+    )
+
+
+def time_render(spec: Dict, repeat: int) -> List[float]:
+    """Seconds to generate and render the input text, per run"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in input_generator.iter_input_text(spec):
+            pass
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument(
+        "--distribution",
+        default="uniform",
+        choices=["uniform", "sorted", "reverse_sorted", "distinct", "constant"],
+    )
+    parser.add_argument("--tokens-per-sec", type=float, default=80.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    token_budget.load()
+    backend = "numpy" if input_generator.np is not None else "stdlib"
+    print(
+        f"distribution={args.distribution} generator={backend} "
+        f"tokens={'tiktoken' if token_budget.exact else 'estimated'} "
+        f"decode={args.tokens_per_sec:.0f} tok/s"
+    )
+    print(
+        f"{'size':>10} {'literal tok':>12} {'decode s':>10} "
+        f"{'spec tok':>9} {'spec decode s':>14} {'generate s':>11} {'text MB':>8}"
+    )
+
+    for size in args.sizes:
+        spec = make_spec(size, args.distribution)
+        raw = spec.model_dump(mode="json")
+        text = input_generator.render_input(raw)
+        literal_tokens = token_budget.count_text(text)
+        spec_tokens = token_budget.count_text(spec.model_dump_json())
+        generate = statistics.median(time_render(raw, args.repeat))
+        print(
+            f"{size:>10,} {literal_tokens:>12,} "
+            f"{literal_tokens / args.tokens_per_sec:>10.1f} {spec_tokens:>9,} "
+            f"{spec_tokens / args.tokens_per_sec:>14.2f} {generate:>11.3f} "
+            f"{len(text) / 1e6:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import asyncio
+
+from app.models.schemas import TestCaseRequest, TestCaseResponse
+from app.services.testcase_service import TestCaseService
+
+
+def make_request(num_test_cases):
+    return TestCaseRequest(
+        problem_description="Return the indices of two numbers adding to target.",
+        difficulty="easy",
+        problem_type="array",
+        num_test_cases=num_test_cases,
+    )
+
+
+def make_response():
+    return TestCaseResponse(
+        test_cases=[{"input": "nums = [2,7], target = 9", "expected_output": "[0,1]"}],
+        problem_summary="Two Sum",
+    )
+
+
+def test_batch_bounds_concurrency_and_isolates_failures(monkeypatch):
+    service = TestCaseService()
+    running = peak = 0
+
+    async def generate(request, cache_mode):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        if request.num_test_cases == 3:
+            raise ValueError("No valid test cases generated")
+        return make_response()
+
+    monkeypatch.setattr(service, "generate_test_cases", generate)
+
+    async def scenario():
+        requests = [make_request(n) for n in (1, 2, 3, 4, 5, 6)]
+        return [item async for item in service.generate_batch(requests, 2)]
+
+    items = sorted(asyncio.run(scenario()), key=lambda item: item.index)
+    assert peak == 2
+    assert [item.status for item in items] == ["ok", "ok", "error", "ok", "ok", "ok"]
+    assert items[2].error_type == "ValueError"
+
+
+def test_closing_the_batch_cancels_outstanding_items(monkeypatch):
+    service = TestCaseService()
+    cancelled = 0
+
+    async def generate(request, cache_mode):
+        nonlocal cancelled
+        if request.num_test_cases == 1:
+            return make_response()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled += 1
+            raise
+
+    monkeypatch.setattr(service, "generate_test_cases", generate)
+
+    async def scenario():
+        results = service.generate_batch([make_request(n) for n in (1, 2, 3)])
+        first = await results.__anext__()
+        await results.aclose()
+        await asyncio.sleep(0)
+        return first
+
+    assert asyncio.run(scenario()).status == "ok"
+    assert cancelled == 2
@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+
+from app.models.schemas import TestCaseRequest, TestCaseResponse
+from app.services import cache as cache_module
+from app.services.cache import ResponseCache
+
+
+def make_request(**overrides):
+    fields = {
+        "problem_description": "Return the indices of two numbers adding to target.",
+        "difficulty": "easy",
+        "problem_type": "array",
+        "num_test_cases": 3,
+    }
+    fields.update(overrides)
+    return TestCaseRequest(**fields)
+
+
+def make_response(summary="Two Sum"):
+    return TestCaseResponse(
+        test_cases=[{"input": "nums = [2,7], target = 9", "expected_output": "[0,1]"}],
+        problem_summary=summary,
+    )
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    instance = Clock()
+    monkeypatch.setattr(cache_module.time, "time", instance.time)
+    return instance
+
+
+def test_key_ignores_whitespace_but_not_fields():
+    key = ResponseCache.make_key(make_request())
+    reworded = make_request(
+        problem_description="Return the indices of  two numbers\nadding to target."
+    )
+    assert ResponseCache.make_key(reworded) == key
+    assert ResponseCache.make_key(make_request(num_test_cases=4)) != key
+    assert ResponseCache.make_key(make_request(difficulty="hard")) != key
+
+
+def test_memory_entries_expire_after_ttl(clock):
+    cache = ResponseCache(max_entries=10, ttl_seconds=60)
+    asyncio.run(cache.set("k", make_response()))
+
+    clock.now += 59
+    assert asyncio.run(cache.get("k")) is not None
+    clock.now += 2
+    assert asyncio.run(cache.get("k")) is None
+    assert cache.hits_memory == 1 and cache.misses == 1
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = ResponseCache(max_entries=2, ttl_seconds=60)
+
+    async def scenario():
+        await cache.set("a", make_response("a"))
+        await cache.set("b", make_response("b"))
+        await cache.get("a")  # "b" is now the least recently used
+        await cache.set("c", make_response("c"))
+        return [await cache.get(key) for key in ("a", "b", "c")]
+
+    a, b, c = asyncio.run(scenario())
+    assert a.problem_summary == "a" and c.problem_summary == "c"
+    assert b is None
+
+
+def test_sqlite_tier_is_shared_between_instances(tmp_path, clock):
+    path = str(tmp_path / "responses.sqlite3")
+    writer = ResponseCache(max_entries=10, ttl_seconds=60, sqlite_path=path)
+    reader = ResponseCache(max_entries=10, ttl_seconds=60, sqlite_path=path)
+    try:
+        asyncio.run(writer.set("k", make_response()))
+
+        value = asyncio.run(reader.get("k"))
+        assert value.problem_summary == "Two Sum"
+        assert reader.hits_disk == 1
+
+        # Promoted to the reader's memory tier
+        asyncio.run(reader.get("k"))
+        assert reader.hits_memory == 1
+    finally:
+        writer.close()
+        reader.close()
+
+
+def test_expired_sqlite_rows_are_misses(tmp_path, clock):
+    path = str(tmp_path / "responses.sqlite3")
+    writer = ResponseCache(max_entries=10, ttl_seconds=60, sqlite_path=path)
+    reader = ResponseCache(max_entries=10, ttl_seconds=60, sqlite_path=path)
+    try:
+        asyncio.run(writer.set("k", make_response()))
+        clock.now += 61
+        assert asyncio.run(reader.get("k")) is None
+        assert reader.misses == 1
+    finally:
+        writer.close()
+        reader.close()
@@ -0,0 +1,125 @@
+import asyncio
+import gzip
+import json
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+
+from app.api import middleware
+from app.api.middleware import CompressionMiddleware, negotiate_encoding
+from app.api.responses import ModelJSONResponse
+from app.core.metrics import stage_duration
+from app.models.schemas import TestCase, TestCaseResponse
+
+LARGE = TestCaseResponse(
+    test_cases=[
+        TestCase(input=f"nums = {list(range(200))}", expected_output=str(i))
+        for i in range(20)
+    ],
+    problem_summary="Large",
+)
+
+
+def make_app():
+    app = FastAPI(default_response_class=ModelJSONResponse)
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+    @app.get("/large")
+    async def large():
+        return ModelJSONResponse(LARGE)
+
+    @app.get("/small")
+    async def small():
+        return {"ok": True}
+
+    @app.get("/ndjson")
+    async def ndjson():
+        async def lines():
+            for i in range(3):
+                yield json.dumps({"line": i}) + "\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    @app.get("/sse")
+    async def sse():
+        async def events():
+            yield "event: done\ndata: " + "x" * 4096 + "\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def get(path, accept_encoding="gzip"):
+    async def run():
+        transport = httpx.ASGITransport(app=make_app())
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            return await client.get(path, headers={"Accept-Encoding": accept_encoding})
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ("gzip, deflate", "gzip"),
+        ("gzip;q=0", None),
+        ("identity", None),
+        ("*", "br" if middleware.brotli is not None else "gzip"),
+        ("", None),
+    ],
+)
+def test_negotiate_encoding(header, expected):
+    assert negotiate_encoding(header) == expected
+
+
+def test_large_body_is_gzipped():
+    response = get("/large")
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert int(response.headers["content-length"]) < len(LARGE.model_dump_json())
+    assert TestCaseResponse.model_validate_json(response.content) == LARGE
+
+
+def test_small_body_and_unaccepted_coding_are_sent_as_is():
+    assert "content-encoding" not in get("/small").headers
+    assert "content-encoding" not in get("/large", accept_encoding="identity").headers
+
+
+def test_stream_is_compressed_chunk_by_chunk():
+    response = get("/ndjson")
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines == [{"line": 0}, {"line": 1}, {"line": 2}]
+
+
+def test_server_sent_events_are_never_compressed():
+    response = get("/sse")
+    assert "content-encoding" not in response.headers
+    assert response.text.startswith("event: done")
+
+
+def test_brotli_when_installed():
+    pytest.importorskip("brotli")
+    response = get("/large", accept_encoding="br, gzip;q=0.5")
+    assert response.headers["content-encoding"] == "br"
+    assert TestCaseResponse.model_validate_json(response.content) == LARGE
+
+
+def test_model_response_renders_once_and_is_timed():
+    def observed():
+        counts = stage_duration._counts.get(("serialization",))
+        return sum(counts) if counts else 0
+
+    before = observed()
+    body = ModelJSONResponse(LARGE).body
+    assert body == LARGE.model_dump_json().encode()
+    assert observed() == before + 1
+    # Plain dicts still render as JSON
+    assert json.loads(ModelJSONResponse({"a": 1}).body) == {"a": 1}
+    assert gzip.decompress(gzip.compress(body)) == body
@@ -0,0 +1,146 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.api.routes import testcase as testcase_routes
+from app.core.backends.base import Completion, LLMBackend
+from app.core.backends.router import BackendRouter, get_llm_router
+from app.core.deadline import (
+    cap_timeout,
+    deadline_scope,
+    iter_with_deadline,
+    time_remaining,
+    with_deadline,
+)
+from app.core.exceptions import DeadlineExceededError
+from app.core.metrics import deadline_exceeded
+
+llm_router = get_llm_router()
+
+MESSAGES = [{"role": "user", "content": "Generate exactly 3 test cases."}]
+
+
+class SlowBackend(LLMBackend):
+    def __init__(self, name, delay):
+        self.name = name
+        self.delay = delay
+        self.calls = 0
+
+    async def startup(self):
+        pass
+
+    async def aclose(self):
+        pass
+
+    async def generate_completion(self, messages, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return Completion(content="{}", finish_reason="stop", backend=self.name)
+
+    async def stream_completion(self, messages, **kwargs):
+        self.calls += 1
+        while True:
+            await asyncio.sleep(self.delay)
+            yield "{"
+
+
+def test_scope_only_ever_shortens_the_deadline():
+    assert time_remaining() is None and cap_timeout(30.0) == 30.0
+    with deadline_scope(1.0):
+        with deadline_scope(60.0):
+            assert time_remaining() <= 1.0
+        assert cap_timeout(30.0) <= 1.0
+    assert time_remaining() is None
+
+
+def test_work_is_cancelled_when_the_deadline_passes():
+    cancelled = False
+    before = deadline_exceeded.get(stage="verification")
+
+    async def work():
+        nonlocal cancelled
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+
+    async def scenario():
+        with deadline_scope(0.05):
+            await with_deadline(work(), "verification")
+
+    with pytest.raises(DeadlineExceededError) as info:
+        asyncio.run(scenario())
+    assert info.value.status_code == 504
+    assert cancelled
+    assert deadline_exceeded.get(stage="verification") == before + 1
+
+
+def test_trickling_stream_is_cut_off_at_the_deadline():
+    async def trickle():
+        while True:
+            await asyncio.sleep(0.01)
+            yield "x"
+
+    async def scenario():
+        received = []
+        with deadline_scope(0.1):
+            async for item in iter_with_deadline(trickle(), "upstream_stream"):
+                received.append(item)
+        return received
+
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceededError):
+        asyncio.run(scenario())
+    assert time.monotonic() - started < 1.0
+
+
+def test_router_does_not_fail_over_or_degrade_when_out_of_time():
+    slow, spare = SlowBackend("slow", 10.0), SlowBackend("spare", 0.0)
+    router = BackendRouter([slow, spare], error_threshold=0.1, probe_rate=0.0)
+
+    async def scenario():
+        with deadline_scope(0.05):
+            await router.generate_completion(MESSAGES)
+
+    with pytest.raises(DeadlineExceededError):
+        asyncio.run(scenario())
+    assert spare.calls == 0
+    assert router.health["slow"].error_rate == 0.0
+    assert router.health["slow"].in_flight == 0
+
+
+def test_request_timeout_header_bounds_the_route(monkeypatch):
+    async def hang(messages, **kwargs):
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(llm_router, "generate_completion", hang)
+    app = FastAPI()
+    app.include_router(testcase_routes.router)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            return await client.post(
+                "/testcases/generate",
+                params={"cache_mode": "bypass"},
+                headers={"X-Request-Timeout": "0.2"},
+                json={
+                    "problem_description": "Return the indices of two numbers "
+                    "adding to target.",
+                    "difficulty": "easy",
+                    "problem_type": "array",
+                    "num_test_cases": 3,
+                },
+            )
+
+    started = time.monotonic()
+    response = asyncio.run(scenario())
+    assert response.status_code == 504
+    assert "deadline" in response.json()["detail"]
+    assert time.monotonic() - started < 2.0
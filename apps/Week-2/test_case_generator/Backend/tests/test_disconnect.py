@@ -0,0 +1,144 @@
+import asyncio
+
+from fastapi import FastAPI, Request
+from fastapi.responses import Response
+
+from app.api.disconnect import (
+    CLIENT_CLOSED_REQUEST,
+    ClientDisconnectedError,
+    run_until_disconnect,
+)
+from app.api.middleware import RequestContextMiddleware
+from app.core.backends.base import Completion, LLMBackend
+from app.core.backends.router import BackendRouter
+from app.core.metrics import backend_calls, client_disconnects
+
+MESSAGES = [{"role": "user", "content": "Generate exactly 3 test cases."}]
+
+
+class HangingBackend(LLMBackend):
+    """Backend whose completion only ends when it is cancelled"""
+
+    def __init__(self, name):
+        self.name = name
+        self.started = asyncio.Event()
+        self.cancelled = False
+
+    async def startup(self):
+        pass
+
+    async def aclose(self):
+        pass
+
+    async def generate_completion(self, messages, **kwargs):
+        self.started.set()
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return Completion(content="{}", finish_reason="stop", backend=self.name)
+
+    async def stream_completion(self, messages, **kwargs):
+        yield "{"
+        await asyncio.Event().wait()
+
+
+def make_app(router):
+    app = FastAPI()
+    app.add_middleware(RequestContextMiddleware, sample_rate=0.0)
+
+    @app.post("/generate")
+    async def generate(http_request: Request):
+        try:
+            completion = await run_until_disconnect(
+                http_request, router.generate_completion(MESSAGES)
+            )
+        except ClientDisconnectedError:
+            return Response(status_code=CLIENT_CLOSED_REQUEST)
+        return {"backend": completion.backend}
+
+    return app
+
+
+def test_disconnect_cancels_the_upstream_call_and_records_499():
+    backend = HangingBackend("slow")
+    router = BackendRouter([backend], probe_rate=0.0)
+    route = "/generate"
+    before = client_disconnects.get(route=route)
+
+    async def scenario():
+        disconnected = asyncio.Event()
+        messages = [{"type": "http.request", "body": b"", "more_body": False}]
+        sent = []
+
+        async def receive():
+            if messages:
+                return messages.pop(0)
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "POST",
+            "scheme": "http",
+            "path": route,
+            "raw_path": route.encode(),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [],
+            "client": ("127.0.0.1", 1234),
+            "server": ("test", 80),
+        }
+        app_task = asyncio.create_task(make_app(router)(scope, receive, send))
+        await asyncio.wait_for(backend.started.wait(), 5.0)
+        disconnected.set()
+        await asyncio.wait_for(app_task, 5.0)
+        return sent
+
+    sent = asyncio.run(scenario())
+    assert sent[0]["status"] == CLIENT_CLOSED_REQUEST
+    assert backend.cancelled
+    assert client_disconnects.get(route=route) == before + 1
+    assert router.health["slow"].in_flight == 0
+
+
+def test_cancelled_completion_is_not_held_against_the_backend():
+    backend = HangingBackend("cancel-generate")
+    router = BackendRouter([backend], probe_rate=0.0)
+
+    async def scenario():
+        task = asyncio.create_task(router.generate_completion(MESSAGES))
+        await backend.started.wait()
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(scenario())
+    health = router.health["cancel-generate"]
+    assert backend.cancelled
+    assert backend_calls.get(backend="cancel-generate", outcome="cancelled") == 1
+    assert health.error_rate == 0.0 and health.in_flight == 0
+
+
+def test_closed_stream_is_counted_as_cancelled():
+    router = BackendRouter([HangingBackend("cancel-stream")], probe_rate=0.0)
+
+    async def scenario():
+        stream = router.stream_completion(MESSAGES)
+        first = await stream.__anext__()
+        # A consumer that stops reading closes the generator
+        await stream.aclose()
+        return first
+
+    assert asyncio.run(scenario()) == "{"
+    health = router.health["cancel-stream"]
+    assert backend_calls.get(backend="cancel-stream", outcome="cancelled") == 1
+    assert health.error_rate == 0.0 and health.in_flight == 0
@@ -0,0 +1,55 @@
+import pytest
+from pydantic import ValidationError
+
+from app.models.schemas import StressSpec
+from app.utils.input_generator import generate_arguments, iter_input_text, render_input
+
+
+def make_spec(distribution="uniform", length=50, seed=7, **param):
+    fields = {
+        "name": "nums",
+        "kind": "int_array",
+        "length": length,
+        "min_value": -1000,
+        "max_value": 1000,
+        "distribution": distribution,
+    }
+    fields.update(param)
+    spec = StressSpec(params=[fields, {"name": "k", "kind": "int"}], seed=seed)
+    return spec.model_dump(mode="json")
+
+
+@pytest.mark.parametrize("seed", [-1, 2**63])
+def test_seed_must_fit_a_signed_64_bit_integer(seed):
+    with pytest.raises(ValidationError):
+        make_spec(seed=seed)
+
+
+def test_same_spec_gives_the_same_input():
+    assert render_input(make_spec()) == render_input(make_spec())
+    assert render_input(make_spec()) != render_input(make_spec(seed=8))
+
+
+@pytest.mark.parametrize(
+    "distribution, check",
+    [
+        ("sorted", lambda nums: nums == sorted(nums)),
+        ("reverse_sorted", lambda nums: nums == sorted(nums, reverse=True)),
+        ("distinct", lambda nums: len(set(nums)) == len(nums)),
+        ("constant", lambda nums: len(set(nums)) == 1),
+    ],
+)
+def test_distributions_hold(distribution, check):
+    nums = generate_arguments(make_spec(distribution))["nums"]
+    assert len(nums) == 50
+    assert all(-1000 <= value <= 1000 for value in nums)
+    assert check(nums)
+
+
+def test_rendered_text_matches_the_arguments():
+    spec = make_spec(length=5)
+    arguments = generate_arguments(spec)
+    expected = "nums = [{}], k = {}".format(
+        ",".join(map(str, arguments["nums"])), arguments["k"]
+    )
+    assert "".join(iter_input_text(spec)) == expected
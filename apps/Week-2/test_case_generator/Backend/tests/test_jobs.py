@@ -0,0 +1,160 @@
+import asyncio
+import time
+
+import pytest
+
+from app.models.schemas import (
+    JobStatus,
+    TestCase,
+    TestCaseRequest,
+    TestCaseResponse,
+)
+from app.services import jobs as jobs_module
+from app.services.jobs import JobQueue
+
+REQUEST = TestCaseRequest(
+    problem_description="Return the indices of two numbers adding to target.",
+    difficulty="easy",
+    problem_type="array",
+    num_test_cases=1,
+)
+
+RESPONSE = TestCaseResponse(
+    test_cases=[TestCase(input="nums=[2,7], target=9", expected_output="[0,1]")],
+    problem_summary="Two Sum",
+)
+
+
+@pytest.fixture
+def make_queue(tmp_path):
+    queues = []
+
+    def make(owner, **options):
+        queue = JobQueue(str(tmp_path / "jobs.sqlite3"), **options)
+        queue.owner = owner
+        queues.append(queue)
+        return queue
+
+    yield make
+    for queue in queues:
+        asyncio.run(queue.stop())
+
+
+def expire_lease(queue, job_id):
+    # What a worker that died without renewing leaves behind
+    with queue._lock:
+        queue._connect().execute(
+            "UPDATE jobs SET lease_expires = ? WHERE id = ?",
+            (time.time() - 1, job_id),
+        )
+
+
+def test_expired_lease_is_reclaimed_by_another_worker(make_queue):
+    dead, alive = make_queue("dead"), make_queue("alive")
+    job_id = asyncio.run(dead.submit(REQUEST)).job_id
+
+    assert dead._claim().id == job_id
+    assert alive._claim() is None  # the lease is still held
+
+    expire_lease(dead, job_id)
+    job = alive._claim()
+    assert job.id == job_id and job.attempts == 2
+
+    alive._succeed(job_id, RESPONSE)
+    # The dead worker's late outcome is discarded
+    dead._fail(job_id, RuntimeError("late"), 500)
+    stored = asyncio.run(alive.get(job_id))
+    assert stored.status == JobStatus.SUCCEEDED
+    assert stored.result.test_cases == RESPONSE.test_cases
+
+
+def test_job_is_abandoned_after_max_attempts(make_queue):
+    queue = make_queue("worker", max_attempts=2)
+    job_id = asyncio.run(queue.submit(REQUEST)).job_id
+
+    for attempt in (1, 2):
+        assert queue._claim().attempts == attempt
+        expire_lease(queue, job_id)
+
+    assert queue._claim() is None
+    stored = asyncio.run(queue.get(job_id))
+    assert stored.status == JobStatus.FAILED
+    assert stored.error_type == "JobAbandoned"
+    assert stored.status_code == 500
+    assert queue.abandoned == 1
+
+
+def test_undecodable_request_fails_the_job_with_422(make_queue):
+    queue = make_queue("worker")
+    queue._insert("broken", '{"difficulty": "easy"}', "use", time.time())
+
+    assert queue._claim() is None
+    stored = asyncio.run(queue.get("broken"))
+    assert stored.status == JobStatus.FAILED
+    assert stored.status_code == 422
+    assert stored.error_type == "ValidationError"
+    # Failed in the claim's transaction, so nothing is left running
+    assert queue._claim() is None and queue.failed == 1
+
+
+def test_wait_wakes_up_when_the_job_finishes(make_queue, monkeypatch):
+    # Polling alone would only notice the job after 30s
+    queue = make_queue("worker", workers=1, poll_interval=30.0)
+    release = asyncio.Event()
+
+    async def fake_generate(request, cache_mode):
+        await release.wait()
+        return RESPONSE
+
+    monkeypatch.setattr(
+        jobs_module.testcase_service, "generate_test_cases", fake_generate
+    )
+
+    async def scenario():
+        await queue.start()
+        job_id = (await queue.submit(REQUEST)).job_id
+        waiter = asyncio.create_task(queue.wait(job_id, timeout=10.0))
+        await asyncio.sleep(0.2)
+        assert not waiter.done()
+        release.set()
+        started = time.perf_counter()
+        job = await waiter
+        waited = time.perf_counter() - started
+        await queue.stop()
+        return job, waited
+
+    job, waited = asyncio.run(scenario())
+    assert job.status == JobStatus.SUCCEEDED
+    assert waited < 2.0
+
+
+def test_worker_survives_an_unexpected_error(make_queue, monkeypatch):
+    queue = make_queue("worker", workers=1, poll_interval=0.05)
+    real_run = queue._run
+    errors = []
+
+    async def fake_generate(request, cache_mode):
+        return RESPONSE
+
+    async def run_failing_once(job):
+        if not errors:
+            errors.append(job.id)
+            raise RuntimeError("boom")
+        await real_run(job)
+
+    monkeypatch.setattr(
+        jobs_module.testcase_service, "generate_test_cases", fake_generate
+    )
+    monkeypatch.setattr(queue, "_run", run_failing_once)
+
+    async def scenario():
+        await queue.start()
+        await queue.submit(REQUEST)
+        second = (await queue.submit(REQUEST)).job_id
+        job = await queue.wait(second, timeout=5.0)
+        await queue.stop()
+        return job
+
+    job = asyncio.run(scenario())
+    assert job.status == JobStatus.SUCCEEDED
+    assert queue.succeeded == 1
@@ -0,0 +1,38 @@
+import json
+
+import pytest
+
+from app.utils.json_parse import loads, repair_test_case_document
+
+
+def test_loads_errors_are_json_decode_errors():
+    assert loads('{"a": [1, 2]}') == {"a": [1, 2]}
+    with pytest.raises(json.JSONDecodeError):
+        loads('{"a": ')
+
+
+def test_repair_extracts_the_object_from_surrounding_text():
+    text = 'Here you go:\n```json\n{"problem_summary": "Sum", "test_cases": []}\n```'
+    assert repair_test_case_document(text) == (
+        "extract",
+        {"problem_summary": "Sum", "test_cases": []},
+    )
+
+
+def test_repair_salvages_closed_cases_of_a_truncated_document():
+    text = (
+        '{"problem_summary": "Sum", "test_cases": ['
+        '{"input": "1 2", "expected_output": "3"}, '
+        '{"input": "4 5", "expec'
+    )
+    method, document = repair_test_case_document(text)
+    assert method == "salvage"
+    assert document == {
+        "problem_summary": "Sum",
+        "test_cases": [{"input": "1 2", "expected_output": "3"}],
+    }
+
+
+@pytest.mark.parametrize("text", ["no json here", '{"test_cases": [{"input": '])
+def test_repair_gives_up_when_nothing_is_recoverable(text):
+    assert repair_test_case_document(text) is None
@@ -0,0 +1,40 @@
+import json
+
+from app.utils.json_stream import TestCaseStreamParser
+from app.utils.sse import format_sse
+
+DOCUMENT = json.dumps(
+    {
+        "test_cases": [
+            {"input": 's = "{["', "expected_output": "false"},
+            {"input": 's = "()"', "expected_output": "true", "explanation": "}"},
+        ],
+        "problem_summary": "Valid Parentheses",
+    }
+)
+
+
+def test_cases_are_emitted_as_they_close():
+    parser = TestCaseStreamParser()
+    emitted = []
+    for position, ch in enumerate("```json\n" + DOCUMENT + "\n```"):
+        for item in parser.feed(ch):
+            emitted.append((position, item))
+
+    assert [item for _, item in emitted] == json.loads(DOCUMENT)["test_cases"]
+    # The first case is emitted long before the document ends
+    assert emitted[0][0] < len(DOCUMENT) // 2
+    assert parser.fields == {"problem_summary": "Valid Parentheses"}
+    assert parser.complete
+
+
+def test_truncated_stream_keeps_completed_cases():
+    parser = TestCaseStreamParser()
+    items = parser.feed(DOCUMENT[: DOCUMENT.index("()")])
+    assert len(items) == 1
+    assert not parser.complete
+
+
+def test_format_sse_frames_json_payloads():
+    assert format_sse("done", {"count": 2}) == 'event: done\ndata: {"count":2}\n\n'
+    assert format_sse("error", '{"a":1}') == 'event: error\ndata: {"a":1}\n\n'
@@ -0,0 +1,38 @@
+import logging
+import queue
+
+from app.utils.logger import DeferredQueueHandler
+
+
+def make_logger(name):
+    log_queue = queue.SimpleQueue()
+    test_logger = logging.getLogger(f"tests.{name}")
+    test_logger.propagate = False
+    test_logger.setLevel(logging.DEBUG)
+    test_logger.addHandler(DeferredQueueHandler(log_queue))
+    return test_logger, log_queue
+
+
+def test_arguments_are_merged_before_the_record_is_queued():
+    test_logger, log_queue = make_logger("merge")
+    cases = ["a"]
+
+    test_logger.info("Cases: %s", cases)
+    cases.append("b")
+
+    record = log_queue.get_nowait()
+    assert record.getMessage() == "Cases: ['a']"
+    assert record.args is None
+
+
+def test_traceback_is_left_for_the_listener_to_format():
+    test_logger, log_queue = make_logger("traceback")
+
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        test_logger.exception("Failed")
+
+    record = log_queue.get_nowait()
+    assert record.exc_info[0] is ValueError
+    assert record.exc_text is None
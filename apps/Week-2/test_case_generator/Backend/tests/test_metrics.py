@@ -0,0 +1,89 @@
+import asyncio
+import json
+
+from app.core.metrics import MetricsRegistry, stage_duration
+from app.core.backends.base import Completion
+from app.core.backends.router import get_llm_router
+from app.models.schemas import TestCaseRequest
+from app.services.testcase_service import testcase_service
+
+llm_router = get_llm_router()
+
+
+def test_counter_renders_labelled_samples():
+    registry = MetricsRegistry()
+    counter = registry.counter("calls_total", "Calls", ["outcome"])
+    counter.inc(outcome="success")
+    counter.inc(2, outcome='say "hi"')
+
+    text = registry.render()
+
+    assert "# TYPE calls_total counter" in text
+    assert 'calls_total{outcome="success"} 1' in text
+    assert 'calls_total{outcome="say \\"hi\\""} 2' in text
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("wait_seconds", "Wait", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value)
+
+    lines = registry.render().splitlines()
+
+    assert 'wait_seconds_bucket{le="0.1"} 1' in lines
+    assert 'wait_seconds_bucket{le="1.0"} 2' in lines
+    assert 'wait_seconds_bucket{le="+Inf"} 3' in lines
+    assert "wait_seconds_sum 5.55" in lines
+    assert "wait_seconds_count 3" in lines
+
+
+def test_callback_metric_is_read_at_scrape_time():
+    registry = MetricsRegistry()
+    depth = {"value": 1}
+    registry.callback("depth", "Depth", "gauge", lambda: {(): depth["value"]})
+
+    depth["value"] = 4
+
+    assert "depth 4" in registry.render().splitlines()
+
+
+def stage_count(stage):
+    counts = stage_duration._counts.get((stage,))
+    return sum(counts) if counts else 0
+
+
+def test_generation_records_each_stage(monkeypatch):
+    async def fake_completion(messages, **kwargs):
+        content = json.dumps(
+            {
+                "problem_summary": "Sum two numbers",
+                "test_cases": [
+                    {"input": "1 2", "expected_output": "3"},
+                    {"input": "", "expected_output": ""},
+                ],
+            }
+        )
+        return Completion(content=content, finish_reason="stop")
+
+    monkeypatch.setattr(llm_router, "generate_completion", fake_completion)
+    request = TestCaseRequest(
+        problem_description="Read two integers and print their sum.",
+        difficulty="easy",
+        problem_type="array",
+        num_test_cases=1,
+    )
+    stages = ["prompt_build", "upstream_wait", "parse", "validation", "serialization"]
+    before = {stage: stage_count(stage) for stage in stages}
+
+    result = asyncio.run(testcase_service._generate(request))
+
+    assert len(result.test_cases) == 1
+    after = {stage: stage_count(stage) for stage in stages}
+    assert {stage: after[stage] - before[stage] for stage in stages} == {
+        "prompt_build": 1,
+        "upstream_wait": 1,
+        "parse": 1,
+        "validation": 1,
+        "serialization": 0,
+    }
@@ -0,0 +1,89 @@
+import asyncio
+import json
+
+import pytest
+
+from app.core.backends import openai_backend as backend_module
+from app.core.backends.openai_backend import OpenAIBackend
+from app.core.metrics import llm_tokens, stage_duration
+from benchmarks.load_test import ServerThread, free_port
+from benchmarks.mock_llm_server import MockLLMConfig, create_mock_app
+
+MESSAGES = [{"role": "user", "content": "Generate exactly 3 test cases."}]
+
+
+@pytest.fixture(scope="module")
+def mock_url():
+    port = free_port()
+    server = ServerThread(
+        create_mock_app(MockLLMConfig(ttft_ms=1, tokens_per_sec=0)), port
+    )
+    server.start()
+    server.wait_started()
+    yield f"http://127.0.0.1:{port}/v1"
+    server.server.should_exit = True
+    server.join()
+
+
+@pytest.fixture
+def backend(mock_url, monkeypatch):
+    monkeypatch.setattr(backend_module.settings, "openai_base_url", mock_url)
+    return OpenAIBackend()
+
+
+def test_backend_completes_against_the_mock(backend):
+    async def scenario():
+        try:
+            return await backend.generate_completion(MESSAGES)
+        finally:
+            await backend.aclose()
+
+    completion = asyncio.run(scenario())
+    assert completion.finish_reason == "stop"
+    payload = json.loads(completion.content)
+    assert len(payload["test_cases"]) == 3
+
+
+def test_backend_streams_from_the_mock(backend):
+    async def scenario():
+        try:
+            return "".join(
+                [delta async for delta in backend.stream_completion(MESSAGES)]
+            )
+        finally:
+            await backend.aclose()
+
+    payload = json.loads(asyncio.run(scenario()))
+    assert len(payload["test_cases"]) == 3
+
+
+def test_backend_records_time_to_first_byte(backend):
+    def observed():
+        counts = stage_duration._counts.get(("time_to_first_byte",))
+        return sum(counts) if counts else 0
+
+    async def scenario():
+        try:
+            await backend.generate_completion(MESSAGES)
+            [delta async for delta in backend.stream_completion(MESSAGES)]
+        finally:
+            await backend.aclose()
+
+    before = observed()
+    asyncio.run(scenario())
+    # Only the non-stream call; streams record time_to_first_token instead
+    assert observed() == before + 1
+
+
+def test_backend_counts_cached_prompt_tokens(backend):
+    async def scenario():
+        try:
+            for _ in range(2):
+                await backend.generate_completion(MESSAGES)
+        finally:
+            await backend.aclose()
+
+    before = llm_tokens.get(kind="prompt_cached")
+    asyncio.run(scenario())
+    # The mock reports a repeated first message as a cached prefix
+    assert llm_tokens.get(kind="prompt_cached") > before
@@ -0,0 +1,162 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from openai import APIConnectionError, APIStatusError, APITimeoutError, RateLimitError
+
+from app.core.backends import openai_backend as backend_module
+from app.core.exceptions import UpstreamError
+from app.core.backends.openai_backend import OpenAIBackend
+
+REQUEST = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+MESSAGES = [{"role": "user", "content": "x"}]
+
+
+def status_error(status_code, headers=None, error_class=APIStatusError):
+    response = httpx.Response(status_code, request=REQUEST, headers=headers)
+    return error_class(f"HTTP {status_code}", response=response, body=None)
+
+
+def make_response(content, refusal=None):
+    message = SimpleNamespace(content=content, refusal=refusal)
+    choice = SimpleNamespace(message=message, finish_reason="stop")
+    return SimpleNamespace(choices=[choice], usage=None)
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    instance = OpenAIBackend()
+    instance.client = object()  # never used; _create is replaced
+    monkeypatch.setattr(backend_module.settings, "openai_retry_backoff", 0.001)
+    monkeypatch.setattr(backend_module.settings, "openai_max_retries", 3)
+    return instance
+
+
+@pytest.mark.parametrize(
+    "error, retryable",
+    [
+        (APITimeoutError(request=REQUEST), True),
+        (APIConnectionError(request=REQUEST), True),
+        (status_error(408), True),
+        (status_error(409), True),
+        (status_error(429, error_class=RateLimitError), True),
+        (status_error(500), True),
+        (status_error(503), True),
+        (status_error(400), False),
+        (status_error(401), False),
+        (status_error(404), False),
+        (ValueError("bad"), False),
+    ],
+)
+def test_only_transient_errors_are_retryable(error, retryable):
+    assert OpenAIBackend._is_retryable(error) is retryable
+
+
+def test_final_errors_map_to_api_status_codes(backend):
+    rate_limited = status_error(429, {"retry-after": "7"}, RateLimitError)
+    error = backend._to_upstream_error(rate_limited)
+    assert (error.status_code, error.retry_after) == (503, 7.0)
+    assert (
+        backend._to_upstream_error(APITimeoutError(request=REQUEST)).status_code == 504
+    )
+    assert backend._to_upstream_error(status_error(400)).status_code == 502
+
+
+def test_transient_errors_are_retried(backend, monkeypatch):
+    outcomes = [status_error(503), APITimeoutError(request=REQUEST)]
+    attempts = 0
+
+    async def create(deadline, **params):
+        nonlocal attempts
+        attempts += 1
+        if outcomes:
+            raise outcomes.pop(0)
+        return make_response("ok"), None
+
+    monkeypatch.setattr(backend, "_create", create)
+    assert asyncio.run(backend.generate_completion(MESSAGES)).content == "ok"
+    assert attempts == 3
+
+
+def test_permanent_errors_are_not_retried(backend, monkeypatch):
+    attempts = 0
+
+    async def create(deadline, **params):
+        nonlocal attempts
+        attempts += 1
+        raise status_error(400)
+
+    monkeypatch.setattr(backend, "_create", create)
+    with pytest.raises(UpstreamError) as error:
+        asyncio.run(backend.generate_completion(MESSAGES))
+    assert error.value.status_code == 502
+    assert attempts == 1
+
+
+def test_retry_waits_at_least_retry_after(backend, monkeypatch):
+    outcomes = [status_error(429, {"retry-after": "0.2"}, RateLimitError)]
+
+    async def create(deadline, **params):
+        if outcomes:
+            raise outcomes.pop(0)
+        return make_response("ok"), None
+
+    monkeypatch.setattr(backend, "_create", create)
+
+    async def timed():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await backend.generate_completion(MESSAGES)
+        return loop.time() - started
+
+    assert asyncio.run(timed()) >= 0.2
+
+
+def test_slow_attempt_is_hedged_and_the_faster_one_wins(backend, monkeypatch):
+    monkeypatch.setattr(backend, "_hedge_delay", lambda: 0.01)
+    delays = [0.5, 0.01]
+    cancelled = False
+
+    async def create(deadline, **params):
+        nonlocal cancelled
+        delay = delays.pop(0)
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        return make_response(f"after {delay}"), None
+
+    monkeypatch.setattr(backend, "_create", create)
+    assert asyncio.run(backend.generate_completion(MESSAGES)).content == "after 0.01"
+    assert cancelled
+
+
+def test_hedge_skips_an_empty_response(backend, monkeypatch):
+    monkeypatch.setattr(backend, "_hedge_delay", lambda: 0.01)
+    responses = [(0.05, "ok"), (0.02, "")]
+
+    async def create(deadline, **params):
+        delay, content = responses.pop(0)
+        await asyncio.sleep(delay)
+        return make_response(content), None
+
+    monkeypatch.setattr(backend, "_create", create)
+    assert asyncio.run(backend.generate_completion(MESSAGES)).content == "ok"
+
+
+def test_hedged_refusal_is_not_retried(backend, monkeypatch):
+    monkeypatch.setattr(backend, "_hedge_delay", lambda: 0.01)
+    calls = []
+
+    async def create(deadline, **params):
+        calls.append(params)
+        await asyncio.sleep(0.05)
+        return make_response(None, refusal="I can't help with that"), None
+
+    monkeypatch.setattr(backend, "_create", create)
+    with pytest.raises(ValueError, match="refused"):
+        asyncio.run(backend.generate_completion(MESSAGES))
+    # The primary attempt and its hedge, and no retry
+    assert len(calls) == 2
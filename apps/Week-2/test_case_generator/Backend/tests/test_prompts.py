@@ -0,0 +1,72 @@
+from typing import Any, Iterator
+
+import pytest
+
+from app.core.prompts import get_response_format, get_stress_response_format
+from app.models.schemas import TestCaseRequest
+from app.services.testcase_service import testcase_service
+
+
+def walk(node: Any) -> Iterator[dict]:
+    if isinstance(node, list):
+        for item in node:
+            yield from walk(item)
+    elif isinstance(node, dict):
+        yield node
+        for value in node.values():
+            yield from walk(value)
+
+
+def test_response_schema_leaves_out_server_fields():
+    schema = get_response_format()["json_schema"]["schema"]
+    assert list(schema["properties"]) == ["test_cases", "problem_summary"]
+
+
+@pytest.mark.parametrize(
+    "response_format", [get_response_format(), get_stress_response_format()]
+)
+def test_strict_schema_has_no_ref_siblings(response_format):
+    schema = response_format["json_schema"]["schema"]
+    refs = [node for node in walk(schema) if "$ref" in node]
+    assert refs, "expected the schema to use $defs"
+    for node in refs:
+        assert list(node) == ["$ref"]
+
+
+@pytest.mark.parametrize(
+    "response_format", [get_response_format(), get_stress_response_format()]
+)
+def test_strict_schema_objects_are_closed(response_format):
+    schema = response_format["json_schema"]["schema"]
+    for node in walk(schema):
+        if node.get("type") == "object" and "properties" in node:
+            assert node["additionalProperties"] is False
+            assert node["required"] == list(node["properties"])
+
+
+def test_optional_fields_stay_nullable():
+    schema = get_response_format()["json_schema"]["schema"]
+    explanation = schema["$defs"]["TestCase"]["properties"]["explanation"]
+    assert {"type": "null"} in explanation["anyOf"]
+    assert not any("default" in node or "title" in node for node in walk(schema))
+
+
+def test_system_prompt_is_shared_by_different_problems():
+    first, second = (
+        testcase_service._build_messages(
+            TestCaseRequest(
+                problem_description=description,
+                difficulty="medium",
+                problem_type="array",
+                num_test_cases=5,
+            )
+        )
+        for description in (
+            "Return the indices of two numbers adding to target.",
+            "Return the length of the longest increasing subsequence.",
+        )
+    )
+    assert first[0] == second[0]
+    assert first[1] != second[1]
+    assert "two numbers" not in first[0]["content"]
+    assert "exactly 5 test cases" in first[1]["content"]
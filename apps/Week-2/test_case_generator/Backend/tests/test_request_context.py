@@ -0,0 +1,113 @@
+import asyncio
+import logging
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.api import middleware
+from app.api.middleware import RequestContextMiddleware
+from app.core.metrics import http_request_duration
+from app.utils.logger import RequestIdFilter, request_id
+
+
+def make_app(**options):
+    app = FastAPI()
+    app.add_middleware(RequestContextMiddleware, **options)
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        return {"request_id": request_id.get()}
+
+    @app.get("/boom")
+    async def boom():
+        raise RuntimeError("boom")
+
+    return app
+
+
+def get(app, path, headers=None):
+    async def run():
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            return await client.get(path, headers=headers)
+
+    return asyncio.run(run())
+
+
+@pytest.fixture
+def access_log(monkeypatch):
+    lines = []
+    monkeypatch.setattr(
+        middleware.logger,
+        "info",
+        lambda message, *args: lines.append((message % args, request_id.get())),
+    )
+    return lines
+
+
+def test_client_request_id_is_used_and_echoed(access_log):
+    response = get(
+        make_app(sample_rate=1.0), "/items/1", headers={"X-Request-ID": "abc-123"}
+    )
+    assert response.json() == {"request_id": "abc-123"}
+    assert response.headers["x-request-id"] == "abc-123"
+    assert float(response.headers["x-process-time"]) >= 0
+    # The access log line is written while the id is still set
+    ((line, logged_id),) = access_log
+    assert line.startswith("GET /items/1 200 ") and logged_id == "abc-123"
+    assert request_id.get() == "-"
+
+
+def test_invalid_request_id_is_replaced():
+    response = get(make_app(), "/items/1", headers={"X-Request-ID": "bad id\n"})
+    generated = response.headers["x-request-id"]
+    assert generated != "bad id\n" and len(generated) == 32
+    assert response.json() == {"request_id": generated}
+
+
+def test_fast_successes_are_sampled_and_errors_always_logged(access_log):
+    app = make_app(sample_rate=0.0, slow_seconds=60.0)
+    get(app, "/items/1")
+    assert access_log == []
+
+    response = get(app, "/items/x")
+    assert response.status_code == 422
+    assert access_log[-1][0].startswith("GET /items/x 422")
+
+
+def test_duration_is_labelled_by_route_template():
+    def count(**labels):
+        counts = http_request_duration._counts.get(
+            tuple(labels[name] for name in ("method", "route", "status"))
+        )
+        return sum(counts) if counts else 0
+
+    labels = {"method": "GET", "route": "/items/{item_id}", "status": "200"}
+    before = count(**labels)
+    get(make_app(), "/items/7")
+    assert count(**labels) == before + 1
+
+
+def test_unhandled_error_is_logged_with_the_request_id(monkeypatch):
+    errors = []
+    monkeypatch.setattr(
+        middleware.logger,
+        "error",
+        lambda message, *args, **kwargs: errors.append(request_id.get()),
+    )
+    response = get(make_app(), "/boom", headers={"X-Request-ID": "req-9"})
+    assert response.status_code == 500
+    assert errors == ["req-9"]
+
+
+def test_filter_stamps_records_with_the_current_id():
+    record = logging.LogRecord("t", logging.INFO, __file__, 1, "msg", None, None)
+    token = request_id.set("req-1")
+    try:
+        assert RequestIdFilter().filter(record)
+    finally:
+        request_id.reset(token)
+    assert record.request_id == "req-1"
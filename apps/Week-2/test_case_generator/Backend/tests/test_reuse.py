@@ -0,0 +1,177 @@
+import asyncio
+import json
+
+import pytest
+
+from app.core.backends.base import Completion
+from app.core.backends.router import get_llm_router
+from app.core.tokens import TokenPlan
+from app.models.schemas import (
+    CacheMode,
+    TestCase,
+    TestCaseRequest,
+    TestCaseResponse,
+    VerificationStatus,
+)
+from app.services import testcase_service as service_module
+from app.services.reuse import SemanticStore
+from app.services.sandbox import ExecutionSandbox
+from app.services.testcase_service import testcase_service
+
+llm_router = get_llm_router()
+
+MAX_SUBARRAY = (
+    "Given an integer array nums, return the maximum sum of any non-empty "
+    "contiguous subarray."
+)
+MIN_SUBARRAY = MAX_SUBARRAY.replace("maximum", "minimum")
+
+MIN_SOLUTION = """
+def minSubArray(nums):
+    best = current = nums[0]
+    for value in nums[1:]:
+        current = min(value, current + value)
+        best = min(best, current)
+    return best
+"""
+
+# Answers to the maximum problem; only the single-element case holds for minimum
+MAX_CASES = [("nums = [1, -2, 3]", "3"), ("nums = [-1]", "-1"), ("nums = [2, 3]", "5")]
+
+
+def make_request(**overrides):
+    fields = {
+        "problem_description": MIN_SUBARRAY,
+        "difficulty": "easy",
+        "problem_type": "array",
+        "num_test_cases": 3,
+        "reference_solution": MIN_SOLUTION,
+        "entry_point": "minSubArray",
+    }
+    fields.update(overrides)
+    return TestCaseRequest(**fields)
+
+
+def document(cases):
+    return json.dumps(
+        {
+            "problem_summary": "Minimum subarray sum",
+            "test_cases": [
+                {"input": test_input, "expected_output": expected}
+                for test_input, expected in cases
+            ],
+        }
+    )
+
+
+def collect(events):
+    async def run():
+        return [event async for event in events]
+
+    return asyncio.run(run())
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    instance = SemanticStore(str(tmp_path / "reuse.sqlite3"), threshold=0.85)
+    asyncio.run(instance.startup())
+    asyncio.run(
+        instance.record(
+            make_request(problem_description=MAX_SUBARRAY, reference_solution=None),
+            TestCaseResponse(
+                test_cases=[
+                    TestCase(input=test_input, expected_output=expected)
+                    for test_input, expected in MAX_CASES
+                ],
+                problem_summary="Maximum subarray sum",
+            ),
+        )
+    )
+    monkeypatch.setattr(service_module, "semantic_store", instance)
+    monkeypatch.setattr(service_module.settings, "reuse_enabled", True)
+    monkeypatch.setattr(service_module.settings, "cache_enabled", False)
+    yield instance
+    asyncio.run(instance.aclose())
+
+
+@pytest.fixture
+def sandbox(monkeypatch):
+    instance = ExecutionSandbox(workers=1, cpu_seconds=1.0, wall_timeout=10.0)
+    instance.start()
+    monkeypatch.setattr(service_module, "sandbox", instance)
+    monkeypatch.setattr(service_module.settings, "sandbox_enabled", True)
+    yield instance
+    instance.close()
+
+
+def test_near_duplicate_keeps_only_cases_the_solution_confirms(
+    store, sandbox, monkeypatch
+):
+    lookup = asyncio.run(store.lookup(make_request()))
+    assert lookup.match is not None and lookup.match.similarity > 0.85
+
+    prompts = []
+
+    async def fake_completion(messages, **kwargs):
+        prompts.append(messages[-1]["content"])
+        return Completion(
+            document([("nums = [4, -5]", "-5"), ("nums = [0]", "0")]),
+            finish_reason="stop",
+        )
+
+    monkeypatch.setattr(llm_router, "generate_completion", fake_completion)
+    result = asyncio.run(testcase_service.generate_test_cases(make_request()))
+
+    assert [case.input for case in result.test_cases] == [
+        "nums = [-1]",
+        "nums = [4, -5]",
+        "nums = [0]",
+    ]
+    assert all(
+        case.verification == VerificationStatus.PASSED for case in result.test_cases
+    )
+    assert result.reuse.reused_test_cases == 1
+    assert len(prompts) == 1
+    assert "- nums = [-1]" in prompts[0]
+    assert "nums = [1, -2, 3]" not in prompts[0]
+
+
+def test_stream_shards_are_told_about_reused_cases(store, sandbox, monkeypatch):
+    def plan(request, messages):
+        return TokenPlan(prompt_tokens=100, max_tokens=500, shards=[1, 1])
+
+    outputs = [[("nums = [4, -5]", "-5")], [("nums = [0]", "0")]]
+    prompts = []
+
+    async def fake_stream(messages, **kwargs):
+        prompts.append(messages[-1]["content"])
+        yield document(outputs.pop(0))
+
+    monkeypatch.setattr(testcase_service, "_plan", plan)
+    monkeypatch.setattr(llm_router, "stream_completion", fake_stream)
+    events = collect(testcase_service.stream_test_cases(make_request()))
+
+    inputs = [
+        data["test_case"]["input"] for name, data in events if name == "test_case"
+    ]
+    assert inputs == ["nums = [-1]", "nums = [4, -5]", "nums = [0]"]
+    assert all("- nums = [-1]" in prompt for prompt in prompts)
+    assert "- nums = [4, -5]" in prompts[1]
+    assert events[-1][1]["reused"] == 1
+
+
+def test_reuse_needs_a_reference_solution(store, monkeypatch):
+    async def fail_lookup(request):
+        raise AssertionError("lookup without a reference solution")
+
+    async def fake_completion(messages, **kwargs):
+        return Completion(document(MAX_CASES), finish_reason="stop")
+
+    monkeypatch.setattr(store, "lookup", fail_lookup)
+    monkeypatch.setattr(llm_router, "generate_completion", fake_completion)
+    result = asyncio.run(
+        testcase_service.generate_test_cases(make_request(reference_solution=None))
+    )
+
+    assert result.reuse is None
+    assert len(result.test_cases) == 3
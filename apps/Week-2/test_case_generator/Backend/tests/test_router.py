@@ -0,0 +1,163 @@
+import asyncio
+import json
+
+import pytest
+
+from app.core.backends import ollama_backend, openai_backend
+from app.core.backends.base import Completion, LLMBackend
+from app.core.backends.ollama_backend import OllamaBackend
+from app.core.backends.openai_backend import OpenAIBackend
+from app.core.backends.router import BackendRouter
+from app.core.exceptions import UpstreamError, UpstreamOverloadedError
+from app.core.metrics import stage_duration
+from benchmarks.load_test import ServerThread, free_port
+from benchmarks.mock_llm_server import MockLLMConfig, create_mock_app
+
+MESSAGES = [{"role": "user", "content": "Generate exactly 3 test cases."}]
+
+
+class FakeBackend(LLMBackend):
+    def __init__(self, name, error=None):
+        self.name = name
+        self.error = error
+        self.calls = 0
+
+    async def startup(self):
+        pass
+
+    async def aclose(self):
+        pass
+
+    async def generate_completion(self, messages, **kwargs):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return Completion(content="{}", finish_reason="stop", backend=self.name)
+
+    async def stream_completion(self, messages, **kwargs):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        yield "{}"
+
+
+def serve(config):
+    port = free_port()
+    server = ServerThread(create_mock_app(config), port)
+    server.start()
+    server.wait_started()
+    return server, f"http://127.0.0.1:{port}"
+
+
+@pytest.fixture(scope="module")
+def mock_urls():
+    # OpenAI stand-in that always answers 503, Ollama stand-in that works
+    failing, failing_url = serve(
+        MockLLMConfig(ttft_ms=1, tokens_per_sec=0, error_rate=1.0, error_codes=[503])
+    )
+    healthy, healthy_url = serve(MockLLMConfig(ttft_ms=1, tokens_per_sec=0))
+    yield f"{failing_url}/v1", healthy_url
+    for server in (failing, healthy):
+        server.stop()
+
+
+@pytest.fixture
+def router(mock_urls, monkeypatch):
+    openai_url, ollama_url = mock_urls
+    monkeypatch.setattr(openai_backend.settings, "openai_base_url", openai_url)
+    monkeypatch.setattr(openai_backend.settings, "openai_max_retries", 0)
+    monkeypatch.setattr(ollama_backend.settings, "ollama_base_url", ollama_url)
+    return BackendRouter([OpenAIBackend(), OllamaBackend()], probe_rate=0.0)
+
+
+def test_router_fails_over_to_ollama(router):
+    async def scenario():
+        try:
+            return await router.generate_completion(MESSAGES)
+        finally:
+            await router.aclose()
+
+    completion = asyncio.run(scenario())
+    assert completion.backend == "ollama"
+    assert len(json.loads(completion.content)["test_cases"]) == 3
+    assert router.health["openai"].error_rate > 0
+    assert router.health["ollama"].latency is not None
+
+
+def test_router_stream_fails_over_to_ollama(router):
+    async def scenario():
+        try:
+            return "".join(
+                [delta async for delta in router.stream_completion(MESSAGES)]
+            )
+        finally:
+            await router.aclose()
+
+    payload = json.loads(asyncio.run(scenario()))
+    assert len(payload["test_cases"]) == 3
+    assert router.health["openai"].error_rate > 0
+
+
+def test_ollama_backend_records_time_to_first_byte(router):
+    def observed():
+        counts = stage_duration._counts.get(("time_to_first_byte",))
+        return sum(counts) if counts else 0
+
+    async def scenario():
+        try:
+            return await router.backends[1].generate_completion(MESSAGES)
+        finally:
+            await router.aclose()
+
+    before = observed()
+    completion = asyncio.run(scenario())
+    assert completion.usage.completion_tokens > 0
+    assert observed() == before + 1
+
+
+def test_overload_fails_over_without_degrading_the_backend():
+    shedding = FakeBackend(
+        "openai", UpstreamOverloadedError("queue full", retry_after=1.0)
+    )
+    router = BackendRouter(
+        [shedding, FakeBackend("ollama")], error_threshold=0.1, probe_rate=0.0
+    )
+
+    for _ in range(3):
+        completion = asyncio.run(router.generate_completion(MESSAGES))
+        assert completion.backend == "ollama"
+
+    health = router.health["openai"]
+    assert shedding.calls == 3
+    assert health.error_rate == 0.0
+    assert not health.degraded(0.0) and health.degraded_until == 0.0
+
+
+def test_overload_on_every_backend_is_raised():
+    router = BackendRouter(
+        [
+            FakeBackend("a", UpstreamOverloadedError("queue full", retry_after=2.0)),
+            FakeBackend("b", UpstreamOverloadedError("queue full", retry_after=2.0)),
+        ],
+        probe_rate=0.0,
+    )
+
+    async def scenario():
+        return [delta async for delta in router.stream_completion(MESSAGES)]
+
+    with pytest.raises(UpstreamOverloadedError):
+        asyncio.run(scenario())
+    assert all(h.error_rate == 0.0 for h in router.health.values())
+
+
+def test_client_errors_are_not_failed_over():
+    second = FakeBackend("b")
+    router = BackendRouter(
+        [FakeBackend("a", UpstreamError("bad request", status_code=400)), second],
+        probe_rate=0.0,
+    )
+
+    with pytest.raises(UpstreamError):
+        asyncio.run(router.generate_completion(MESSAGES))
+    assert second.calls == 0
+    assert router.health["a"].error_rate > 0
@@ -0,0 +1,64 @@
+import asyncio
+import os
+
+import pytest
+
+from app.services.sandbox import ExecutionSandbox
+from app.utils import sandbox_worker
+
+EXIT_SOLUTION = """
+import sys
+
+def twoSum(nums, target):
+    sys.exit(3)
+"""
+
+ENV_SOLUTION = """
+import os
+
+def twoSum(nums, target):
+    return os.environ.get("OPENAI_API_KEY")
+"""
+
+ADD_SOLUTION = """
+def add(a, b):
+    return a + b
+"""
+
+
+@pytest.mark.parametrize("statement", ["sys.exit(0)", "raise KeyboardInterrupt"])
+def test_execute_contains_base_exceptions(statement):
+    source = f"import sys\n\ndef f(x):\n    {statement}\n"
+    outcome = sandbox_worker.execute(source, None, "x = 1", 1.0)
+    assert outcome["ok"] is False
+    assert outcome["error"].split(":")[0] in ("SystemExit", "KeyboardInterrupt")
+
+
+@pytest.fixture
+def sandbox(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-secret")
+    instance = ExecutionSandbox(workers=1, cpu_seconds=1.0, wall_timeout=10.0)
+    instance.start()
+    yield instance
+    instance.close()
+
+
+def run(sandbox, source, inputs):
+    return asyncio.run(sandbox.run_many(source, None, inputs))
+
+
+def test_sys_exit_fails_the_run_not_the_server(sandbox):
+    (result,) = run(sandbox, EXIT_SOLUTION, ["nums = [2,7], target = 9"])
+    assert not result.ok
+    assert result.error.startswith("SystemExit")
+
+    # The pool is still usable afterwards
+    (result,) = run(sandbox, ADD_SOLUTION, ["a = 1, b = 2"])
+    assert result.ok and result.output == 3
+
+
+def test_solution_cannot_read_server_environment(sandbox):
+    assert os.environ["OPENAI_API_KEY"] == "sk-secret"
+    (result,) = run(sandbox, ENV_SOLUTION, ["nums = [2,7], target = 9"])
+    assert result.ok
+    assert result.output is None
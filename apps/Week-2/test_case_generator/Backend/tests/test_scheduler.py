@@ -0,0 +1,119 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core.exceptions import UpstreamOverloadedError
+from app.core.scheduler import Priority, UpstreamScheduler
+
+
+def make_scheduler(**overrides):
+    options = {
+        "enabled": True,
+        "max_requests": 1,
+        "max_tokens": 1000,
+        "period": 0.2,
+        "max_queue": 10,
+        "max_wait": 5.0,
+    }
+    options.update(overrides)
+    return UpstreamScheduler(**options)
+
+
+def test_calls_within_budget_are_admitted_at_once():
+    scheduler = make_scheduler(max_requests=3)
+
+    async def scenario():
+        started = time.monotonic()
+        for _ in range(3):
+            await scheduler.acquire(100)
+        return time.monotonic() - started
+
+    assert asyncio.run(scenario()) < 0.05
+    assert scheduler.admitted == 3 and scheduler.queued == 0
+
+
+def test_queued_calls_are_admitted_by_priority():
+    scheduler = make_scheduler()
+    order = []
+
+    async def call(name, priority):
+        await scheduler.acquire(100, priority=priority)
+        order.append(name)
+
+    async def scenario():
+        await scheduler.acquire(100)  # fills the window
+        batch = asyncio.create_task(call("batch", Priority.BATCH))
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(call("interactive", Priority.INTERACTIVE))
+        await asyncio.gather(batch, interactive)
+
+    asyncio.run(scenario())
+    assert order == ["interactive", "batch"]
+    assert scheduler.queued == 2
+
+
+def test_full_queue_is_shed_with_retry_after():
+    scheduler = make_scheduler(max_queue=1)
+
+    async def scenario():
+        await scheduler.acquire(100)
+        queued = asyncio.create_task(scheduler.acquire(100))
+        await asyncio.sleep(0)
+        with pytest.raises(UpstreamOverloadedError) as error:
+            await scheduler.acquire(100)
+        await queued
+        return error.value
+
+    error = asyncio.run(scenario())
+    assert str(error) == "Upstream queue is full"
+    assert 0 < error.retry_after <= 0.2
+    assert scheduler.shed == 1
+
+
+def test_call_that_cannot_make_its_deadline_is_shed_at_once():
+    scheduler = make_scheduler()
+
+    async def scenario():
+        await scheduler.acquire(100)
+        started = time.monotonic()
+        with pytest.raises(UpstreamOverloadedError):
+            await scheduler.acquire(100, deadline=started + 0.05)
+        return time.monotonic() - started
+
+    assert asyncio.run(scenario()) < 0.05
+    assert scheduler.queue_depth == 0
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    scheduler = make_scheduler()
+
+    async def scenario():
+        await scheduler.acquire(100)
+        cancelled = asyncio.create_task(scheduler.acquire(100))
+        waiting = asyncio.create_task(scheduler.acquire(100, priority=Priority.BATCH))
+        await asyncio.sleep(0)
+        assert scheduler.queue_depth == 2
+
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        assert scheduler.queue_depth == 1
+        await waiting
+
+    asyncio.run(scenario())
+    assert scheduler.admitted == 2
+
+
+def test_reconcile_returns_unused_tokens_to_the_window():
+    scheduler = make_scheduler(max_requests=10, max_tokens=1000)
+
+    async def scenario():
+        grant = await scheduler.acquire(900)
+        assert scheduler.stats()["window_tokens"] == 900
+        grant.reconcile(300)
+        assert scheduler.stats()["window_tokens"] == 300
+        await scheduler.acquire(200)
+
+    asyncio.run(scenario())
+    assert scheduler.queued == 0
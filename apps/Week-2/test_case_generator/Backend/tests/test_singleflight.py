@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+
+from app.models.schemas import CacheMode, TestCaseRequest, TestCaseResponse
+from app.services.singleflight import SingleFlight
+from app.services.testcase_service import TestCaseService
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def scenario():
+        return await asyncio.gather(*(flight.do("k", work) for _ in range(5)))
+
+    assert asyncio.run(scenario()) == ["result"] * 5
+    assert calls == 1
+    assert flight.executions == 1 and flight.coalesced == 4
+    assert flight.in_flight == 0
+
+
+def test_cancelled_waiter_does_not_cancel_the_others():
+    flight = SingleFlight()
+    release = None
+
+    async def work():
+        await release.wait()
+        return "result"
+
+    async def scenario():
+        nonlocal release
+        release = asyncio.Event()
+        first = asyncio.create_task(flight.do("k", work))
+        second = asyncio.create_task(flight.do("k", work))
+        await asyncio.sleep(0)
+
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()) == "result"
+
+
+def test_call_is_cancelled_when_every_waiter_leaves():
+    flight = SingleFlight()
+    cancelled = False
+
+    async def work():
+        nonlocal cancelled
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+
+    async def scenario():
+        waiter = asyncio.create_task(flight.do("k", work))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    assert cancelled
+    assert flight.in_flight == 0
+
+
+def test_cache_modes_do_not_share_a_flight(monkeypatch):
+    service = TestCaseService()
+    request = TestCaseRequest(
+        problem_description="Return the indices of two numbers adding to target.",
+        difficulty="easy",
+        problem_type="array",
+        num_test_cases=1,
+    )
+    calls = 0
+
+    async def generate(request):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return TestCaseResponse(
+            test_cases=[
+                {"input": "nums = [2,7], target = 9", "expected_output": "[0,1]"}
+            ],
+            problem_summary="Two Sum",
+        )
+
+    monkeypatch.setattr(service, "_generate", generate)
+    monkeypatch.setattr("app.services.testcase_service.settings.cache_enabled", False)
+
+    async def scenario():
+        await asyncio.gather(
+            service.generate_test_cases(request, CacheMode.USE),
+            service.generate_test_cases(request, CacheMode.USE),
+            service.generate_test_cases(request, CacheMode.BYPASS),
+            service.generate_test_cases(request, CacheMode.REFRESH),
+        )
+
+    asyncio.run(scenario())
+    assert calls == 3
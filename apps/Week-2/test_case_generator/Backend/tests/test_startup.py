@@ -0,0 +1,87 @@
+import asyncio
+import subprocess
+import sys
+from pathlib import Path
+
+from app.core.backends import ollama_backend, openai_backend
+from app.core.backends import router as router_module
+from app.core.backends.ollama_backend import OllamaBackend
+from app.core.backends.openai_backend import OpenAIBackend
+from app.core.backends.router import BackendRouter
+from benchmarks.load_test import ServerThread, free_port
+from benchmarks.mock_llm_server import MockLLMConfig, create_mock_app
+
+IMPORT_CHECK = """
+import os, sys
+import app.main
+assert "openai" not in sys.modules, "openai imported"
+assert not os.path.exists("logs"), "logs/ created"
+app.main.create_app()
+assert "openai" not in sys.modules, "openai imported by create_app()"
+"""
+
+
+def test_importing_the_app_builds_no_clients_or_log_files(tmp_path):
+    backend_dir = str(Path(__file__).resolve().parents[1])
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_CHECK],
+        cwd=tmp_path,
+        env={"PYTHONPATH": backend_dir, "OPENAI_API_KEY": "test-key"},
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+
+
+def record_warnings(monkeypatch):
+    warnings = []
+    monkeypatch.setattr(
+        router_module.logger, "warning", lambda *args: warnings.append(args)
+    )
+    return warnings
+
+
+def test_backends_warm_up_against_the_mock(monkeypatch):
+    warnings = record_warnings(monkeypatch)
+    port = free_port()
+    server = ServerThread(
+        create_mock_app(MockLLMConfig(ttft_ms=1, tokens_per_sec=0)), port
+    )
+    server.start()
+    server.wait_started()
+    url = f"http://127.0.0.1:{port}"
+    monkeypatch.setattr(openai_backend.settings, "openai_base_url", f"{url}/v1")
+    monkeypatch.setattr(ollama_backend.settings, "ollama_base_url", url)
+    router = BackendRouter([OpenAIBackend(), OllamaBackend()])
+
+    async def scenario():
+        try:
+            await router.warm_up(timeout=5.0)
+        finally:
+            await router.aclose()
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        server.stop()
+    assert warnings == []
+    # Warm-up calls are not completions
+    assert server.server.config.app.state.stats.requests == 0
+
+
+def test_failed_warm_up_is_only_logged(monkeypatch):
+    warnings = record_warnings(monkeypatch)
+    # Nothing listens on this port
+    monkeypatch.setattr(
+        ollama_backend.settings, "ollama_base_url", f"http://127.0.0.1:{free_port()}"
+    )
+    router = BackendRouter([OllamaBackend()])
+
+    async def scenario():
+        try:
+            await router.warm_up(timeout=5.0)
+        finally:
+            await router.aclose()
+
+    asyncio.run(scenario())
+    assert len(warnings) == 1 and warnings[0][1] == "ollama"
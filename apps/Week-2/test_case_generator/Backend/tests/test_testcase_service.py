@@ -0,0 +1,198 @@
+import asyncio
+import json
+
+import pytest
+
+from app.core.exceptions import UpstreamError
+from app.core.backends.base import Completion
+from app.core.backends.router import get_llm_router
+from app.core.tokens import TokenPlan
+from app.models.schemas import CacheMode, TestCase, TestCaseCategory, TestCaseRequest
+from app.services import testcase_service as service_module
+from app.services.testcase_service import testcase_service
+
+llm_router = get_llm_router()
+
+
+def make_request(**overrides):
+    fields = {
+        "problem_description": "Return the indices of two numbers adding to target.",
+        "difficulty": "easy",
+        "problem_type": "array",
+        "num_test_cases": 4,
+    }
+    fields.update(overrides)
+    return TestCaseRequest(**fields)
+
+
+def document(inputs):
+    return json.dumps(
+        {
+            "problem_summary": "Two Sum",
+            "test_cases": [
+                {"input": test_input, "expected_output": "[0,1]"}
+                for test_input in inputs
+            ],
+        }
+    )
+
+
+@pytest.fixture
+def split_plan(monkeypatch):
+    def plan(request, messages):
+        return TokenPlan(prompt_tokens=100, max_tokens=500, shards=[2, 2])
+
+    monkeypatch.setattr(testcase_service, "_plan", plan)
+
+
+def collect(events):
+    async def run():
+        return [event async for event in events]
+
+    return asyncio.run(run())
+
+
+def test_stream_shards_get_earlier_inputs_and_skip_repeats(split_plan, monkeypatch):
+    outputs = [["nums=[2,7]", "nums=[3,3]"], ["nums = [3, 3]", "nums=[1,5]"]]
+    prompts = []
+
+    async def fake_stream(messages, **kwargs):
+        prompts.append(messages[-1]["content"])
+        yield document(outputs.pop(0))
+
+    monkeypatch.setattr(llm_router, "stream_completion", fake_stream)
+    events = collect(
+        testcase_service.stream_test_cases(make_request(), CacheMode.BYPASS)
+    )
+
+    inputs = [
+        data["test_case"]["input"] for name, data in events if name == "test_case"
+    ]
+    assert inputs == ["nums=[2,7]", "nums=[3,3]", "nums=[1,5]"]
+    assert "already covered" not in prompts[0]
+    assert "- nums=[2,7]\n- nums=[3,3]" in prompts[1]
+    assert events[-1][1]["count"] == 3
+
+
+def truncated(inputs):
+    # Cut inside the case after the closed ones, as at max_tokens
+    return document(inputs + ["cut"]).rsplit('"cut"', 1)[0]
+
+
+def test_truncated_completion_is_topped_up(monkeypatch):
+    outputs = [
+        Completion(truncated(["nums=[2,7]", "nums=[3,3]"]), finish_reason="length"),
+        Completion(document(["nums=[1,5]", "nums=[0,4]"]), finish_reason="stop"),
+    ]
+    calls = []
+
+    async def fake_completion(messages, **kwargs):
+        calls.append((messages[-1]["content"], kwargs["max_tokens"]))
+        return outputs.pop(0)
+
+    monkeypatch.setattr(llm_router, "generate_completion", fake_completion)
+    result = asyncio.run(testcase_service._generate(make_request()))
+
+    assert [case.input for case in result.test_cases] == [
+        "nums=[2,7]",
+        "nums=[3,3]",
+        "nums=[1,5]",
+        "nums=[0,4]",
+    ]
+    prompt, max_tokens = calls[1]
+    assert "exactly 2 test cases" in prompt
+    assert "- nums=[2,7]\n- nums=[3,3]" in prompt
+    assert max_tokens < calls[0][1]
+
+
+def test_failed_top_up_keeps_the_salvaged_cases(monkeypatch):
+    async def fake_completion(messages, **kwargs):
+        if "already covered" in messages[-1]["content"]:
+            raise UpstreamError("Upstream unavailable", status_code=503)
+        return Completion(truncated(["nums=[2,7]"]), finish_reason="length")
+
+    monkeypatch.setattr(llm_router, "generate_completion", fake_completion)
+    result = asyncio.run(testcase_service._generate(make_request()))
+
+    assert [case.input for case in result.test_cases] == ["nums=[2,7]"]
+
+
+def test_cut_off_stream_is_topped_up_once(monkeypatch):
+    outputs = [
+        truncated(["nums=[2,7]"]),
+        truncated(["nums=[3,3]"]),
+        document(["nums=[1,5]"]),
+    ]
+    prompts = []
+
+    async def fake_stream(messages, **kwargs):
+        prompts.append(messages[-1]["content"])
+        yield outputs.pop(0)
+
+    monkeypatch.setattr(llm_router, "stream_completion", fake_stream)
+    events = collect(
+        testcase_service.stream_test_cases(make_request(), CacheMode.BYPASS)
+    )
+
+    inputs = [
+        data["test_case"]["input"] for name, data in events if name == "test_case"
+    ]
+    assert inputs == ["nums=[2,7]", "nums=[3,3]"]
+    assert len(prompts) == 2
+    assert "exactly 3 test cases" in prompts[1]
+    assert "- nums=[2,7]" in prompts[1]
+
+
+def test_categories_share_the_cases_evenly():
+    allocate = testcase_service._allocate_categories
+    assert allocate(make_request(num_test_cases=10)) == [
+        (TestCaseCategory.BASIC, 3),
+        (TestCaseCategory.EDGE, 3),
+        (TestCaseCategory.BOUNDARY, 2),
+        (TestCaseCategory.PROBLEM_SPECIFIC, 2),
+    ]
+    assert allocate(make_request(num_test_cases=3, include_edge_cases=False)) == [
+        (TestCaseCategory.BASIC, 2),
+        (TestCaseCategory.PROBLEM_SPECIFIC, 1),
+    ]
+
+
+def test_dedupe_ignores_whitespace_and_keeps_the_first():
+    cases = [
+        TestCase(input=test_input, expected_output=output)
+        for test_input, output in [
+            ("nums = [1, 2]", "a"),
+            ("nums=[1,2]", "b"),
+            ("x", "c"),
+        ]
+    ]
+    unique = testcase_service._dedupe_test_cases(cases)
+    assert [case.expected_output for case in unique] == ["a", "c"]
+
+
+def test_shards_are_merged_deduped_and_topped_up(monkeypatch):
+    monkeypatch.setattr(service_module.settings, "shard_generation_enabled", True)
+    monkeypatch.setattr(service_module.settings, "shard_min_cases", 4)
+    monkeypatch.setattr(service_module.settings, "shard_max_topups", 1)
+    outputs = {
+        "typical inputs": ["a", "b"],
+        "edge cases": ["a ", "c"],
+        "boundary": ["d", "e"],
+        "corner cases": ["f", "g"],
+    }
+    prompts = []
+
+    async def fake_completion(messages, **kwargs):
+        prompt = messages[-1]["content"]
+        prompts.append(prompt)
+        if "already covered" in prompt:
+            return Completion(document(["h"]), finish_reason="stop")
+        focus = next(focus for focus in outputs if focus in prompt)
+        return Completion(document(outputs[focus]), finish_reason="stop")
+
+    monkeypatch.setattr(llm_router, "generate_completion", fake_completion)
+    result = asyncio.run(testcase_service._generate(make_request(num_test_cases=8)))
+
+    assert sorted(case.input for case in result.test_cases) == list("abcdefgh")
+    assert len(prompts) == 5
+    assert "exactly 1 test cases" in prompts[-1]
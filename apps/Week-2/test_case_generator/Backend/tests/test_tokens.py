@@ -0,0 +1,49 @@
+import pytest
+
+from app.core.exceptions import TokenBudgetError
+from app.core.tokens import RESPONSE_OVERHEAD_TOKENS, TokenBudget
+
+MESSAGES = [{"role": "user", "content": "x" * 400}]
+
+
+def make_budget(**overrides):
+    options = {
+        "model": "gpt-4o-mini",
+        "context_window": 128_000,
+        "max_output_tokens": 16_384,
+        "headroom": 1.5,
+        "ewma_alpha": 0.5,
+    }
+    options.update(overrides)
+    return TokenBudget(**options)
+
+
+def test_max_tokens_scales_with_the_number_of_cases():
+    budget = make_budget()
+    small = budget.plan(MESSAGES, 2, "medium")
+    large = budget.plan(MESSAGES, 10, "medium")
+    assert small.shards == [2] and large.shards == [10]
+    assert small.max_tokens == RESPONSE_OVERHEAD_TOKENS + 2 * 80 * 1.5
+    assert large.max_tokens == RESPONSE_OVERHEAD_TOKENS + 10 * 80 * 1.5
+
+
+def test_oversized_requests_split_into_even_shards():
+    # Room for (1000 - 60) // 120 = 7 medium cases per call
+    plan = make_budget(max_output_tokens=1000).plan(MESSAGES, 20, "medium")
+    assert plan.is_split
+    assert plan.shards == [7, 7, 6]
+    assert plan.max_tokens <= 1000
+
+
+def test_prompt_without_room_for_output_is_rejected():
+    budget = make_budget(context_window=150)
+    with pytest.raises(TokenBudgetError):
+        budget.plan(MESSAGES, 1, "easy")
+
+
+def test_observed_output_moves_the_estimate():
+    budget = make_budget()
+    budget.observe("easy", 4, RESPONSE_OVERHEAD_TOKENS + 4 * 100)
+    assert budget.tokens_per_case("easy") == pytest.approx(80.0)
+    budget.observe("easy", 0, 500)
+    assert budget.tokens_per_case("easy") == pytest.approx(80.0)